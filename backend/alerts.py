@@ -0,0 +1,574 @@
+# backend/alerts.py
+"""
+Indexed price-drop alerts, evaluated after every price write
+
+An alert fires when a product's price drops to target_price or below, or
+percent_off_high percent or more below its highest_price. Scanning every
+alert per write doesn't scale to millions of alerts, so each product
+keeps its alerts in arrays sorted by target price and by percent-off
+threshold, and remembers the last price it evaluated. The alerts a write
+can fire or re-arm are the ones whose threshold lies between the last
+and the new price, found with two bisects per array: O(log n + k) for k
+alerts that change state.
+
+Dedup and cooldown: a fired alert is disarmed and only re-armed once a
+later write no longer meets its condition, so a price sitting below the
+target notifies once, not on every check. An armed alert also won't fire
+again within its cooldown (ALERT_COOLDOWN_SECONDS unless set per alert).
+
+Fired alerts go to the configured sinks (ALERT_SINKS, comma-separated):
+"log" logs them, "memory" keeps the latest in a bounded list (for tests
+and local use), "webhook" POSTs them as JSON to ALERT_WEBHOOK_URL from a
+background thread. Other sinks implement AlertSink.deliver and are added
+with AlertEngine.add_sink.
+
+Evaluation is deferred off the write path: the crud write listener only
+queues the written product ids, and an evaluator thread picks up
+everything queued since its last pass, reads those products' current
+prices in one query and saves changed alert state in one commit. In-memory
+state only moves forward once that commit succeeds; after a failed save it
+is put back, so the next write evaluates the alerts again.
+
+The index lives in each API process and is loaded from the price_alerts
+table on first use; alerts created through another process are picked up
+when this one restarts.
+"""
+import bisect
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ALERTS_ENABLED = os.getenv("ALERTS_ENABLED", "true").lower() in ("1", "true", "yes")
+ALERT_COOLDOWN_SECONDS = int(os.getenv("ALERT_COOLDOWN_SECONDS", "3600"))
+ALERT_SINKS = os.getenv("ALERT_SINKS", "log")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+ALERT_WEBHOOK_TIMEOUT = float(os.getenv("ALERT_WEBHOOK_TIMEOUT", "5"))
+# Events kept by the memory sink
+ALERT_MEMORY_SINK_SIZE = int(os.getenv("ALERT_MEMORY_SINK_SIZE", "1000"))
+
+# Guards percent-off comparisons against float rounding (15% off 100.00 is 85.00)
+_PERCENT_EPSILON = 1e-9
+
+
+class AlertEvent(NamedTuple):
+    alert_id: int
+    product_id: int
+    price: float
+    highest_price: Optional[float]
+    target_price: Optional[float]
+    percent_off_high: Optional[float]
+    fired_at: datetime
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self._asdict(), "fired_at": self.fired_at.isoformat()}
+
+
+class AlertSink:
+    """Delivery target for fired alerts"""
+
+    def deliver(self, events: List[AlertEvent]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LogSink(AlertSink):
+    def deliver(self, events: List[AlertEvent]) -> None:
+        for event in events:
+            logger.info(
+                f"Alert {event.alert_id} fired: product {event.product_id} at {event.price} "
+                f"(target {event.target_price}, {event.percent_off_high}% off high {event.highest_price})"
+            )
+
+
+class MemorySink(AlertSink):
+    """Keeps the latest events in memory, for tests and local use"""
+
+    def __init__(self, size: int = ALERT_MEMORY_SINK_SIZE):
+        self.events: Deque[AlertEvent] = deque(maxlen=size)
+
+    def deliver(self, events: List[AlertEvent]) -> None:
+        self.events.extend(events)
+
+
+class WebhookSink(AlertSink):
+    """POSTs each batch of events as JSON, off the write path"""
+
+    def __init__(self, url: str, timeout: float = ALERT_WEBHOOK_TIMEOUT):
+        self.url = url
+        self.client = httpx.Client(timeout=timeout)
+        # One thread keeps deliveries in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-webhook")
+
+    def deliver(self, events: List[AlertEvent]) -> None:
+        self._executor.submit(self._post, [event.as_dict() for event in events])
+
+    def _post(self, payload: List[Dict[str, Any]]) -> None:
+        try:
+            self.client.post(self.url, json={"alerts": payload}).raise_for_status()
+        except Exception as e:
+            logger.error(f"Alert webhook delivery of {len(payload)} events failed: {str(e)}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+
+def build_sinks(names: str = ALERT_SINKS) -> List[AlertSink]:
+    """Sinks named in a comma-separated list"""
+    sinks: List[AlertSink] = []
+    for name in filter(None, (part.strip() for part in names.split(","))):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "memory":
+            sinks.append(MemorySink())
+        elif name == "webhook":
+            if not ALERT_WEBHOOK_URL:
+                logger.warning("ALERT_SINKS includes webhook but ALERT_WEBHOOK_URL is not set")
+                continue
+            sinks.append(WebhookSink(ALERT_WEBHOOK_URL))
+        else:
+            raise ValueError(f"Unknown alert sink: {name}")
+    return sinks
+
+
+def percent_off(price: float, highest_price: Optional[float]) -> float:
+    """How far price is below highest_price, in percent"""
+    if not highest_price or highest_price <= 0:
+        return 0.0
+    return (1 - price / highest_price) * 100
+
+
+class Alert:
+    """In-memory state of one alert"""
+
+    __slots__ = (
+        "id", "product_id", "target_price", "percent_off_high", "cooldown",
+        "armed", "last_fired_at", "last_fired_price",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        product_id: int,
+        target_price: Optional[float],
+        percent_off_high: Optional[float],
+        cooldown: timedelta,
+        armed: bool = True,
+        last_fired_at: Optional[datetime] = None,
+        last_fired_price: Optional[float] = None,
+    ):
+        self.id = id
+        self.product_id = product_id
+        self.target_price = target_price
+        self.percent_off_high = percent_off_high
+        self.cooldown = cooldown
+        self.armed = armed
+        self.last_fired_at = last_fired_at
+        self.last_fired_price = last_fired_price
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "armed": self.armed,
+            "last_fired_at": self.last_fired_at,
+            "last_fired_price": self.last_fired_price,
+        }
+
+
+def _meets(alert: Alert, price: float, drop: float) -> bool:
+    """Whether a price, drop percent below the product's high, meets the alert"""
+    if alert.target_price is not None and price <= alert.target_price:
+        return True
+    return alert.percent_off_high is not None and drop + _PERCENT_EPSILON >= alert.percent_off_high
+
+
+class ThresholdIndex:
+    """Alert ids sorted by one threshold, for range lookups by bisect"""
+
+    __slots__ = ("keys", "ids")
+
+    def __init__(self):
+        # Parallel arrays: thresholds ascending, alert ids in the same order
+        self.keys: List[float] = []
+        self.ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def insert(self, key: float, alert_id: int) -> None:
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.ids.insert(i, alert_id)
+
+    def delete(self, key: float, alert_id: int) -> None:
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == alert_id:
+                del self.keys[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def from_low(self, low: float, high: float) -> List[int]:
+        """Ids with low <= key < high"""
+        return self.ids[bisect.bisect_left(self.keys, low):bisect.bisect_left(self.keys, high)]
+
+    def to_high(self, low: float, high: float) -> List[int]:
+        """Ids with low < key <= high"""
+        return self.ids[bisect.bisect_right(self.keys, low):bisect.bisect_right(self.keys, high)]
+
+
+class ProductAlerts:
+    """
+    One product's alerts sorted by threshold, plus the last price evaluated
+
+    Outside `pending`, an alert is armed exactly when the last price did
+    not meet it. So a write only has to look at the alerts with a
+    threshold between the last price (or drop) and the new one: the ones
+    whose condition flipped. Alerts that don't follow that rule yet, new
+    ones and ones held back by their cooldown, wait in `pending` and are
+    checked on every write.
+    """
+
+    __slots__ = ("targets", "percents", "pending", "last_price", "last_drop")
+
+    def __init__(self):
+        self.targets = ThresholdIndex()
+        self.percents = ThresholdIndex()
+        self.pending: Set[int] = set()
+        self.last_price: Optional[float] = None
+        self.last_drop: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.targets) or bool(self.percents)
+
+    def add(self, alert: Alert) -> None:
+        if alert.target_price is not None:
+            self.targets.insert(alert.target_price, alert.id)
+        if alert.percent_off_high is not None:
+            self.percents.insert(alert.percent_off_high, alert.id)
+        self.pending.add(alert.id)
+
+    def remove(self, alert: Alert) -> None:
+        if alert.target_price is not None:
+            self.targets.delete(alert.target_price, alert.id)
+        if alert.percent_off_high is not None:
+            self.percents.delete(alert.percent_off_high, alert.id)
+        self.pending.discard(alert.id)
+
+    def ids(self) -> Set[int]:
+        return {*self.targets.ids, *self.percents.ids}
+
+    def flipped(self, price: float, drop: float) -> Set[int]:
+        """Alerts with a condition met by one of the last and the new price, not both"""
+        if self.last_price is None:
+            return set()
+        # A target is met when price <= target_price
+        ids = set(self.targets.from_low(min(price, self.last_price), max(price, self.last_price)))
+        # A percent-off threshold is met when percent_off_high <= drop
+        if self.percents:
+            low, high = sorted((drop + _PERCENT_EPSILON, self.last_drop + _PERCENT_EPSILON))
+            ids.update(self.percents.to_high(low, high))
+        return ids
+
+
+class AlertEngine:
+    """Per-product alert index plus firing, dedup and delivery"""
+
+    def __init__(
+        self,
+        sinks: Optional[List[AlertSink]] = None,
+        cooldown_seconds: int = ALERT_COOLDOWN_SECONDS,
+        session_factory: Optional[Callable[[], Session]] = SessionLocal,
+    ):
+        self.sinks = list(sinks or [])
+        self.default_cooldown = timedelta(seconds=cooldown_seconds)
+        # None keeps state in memory only (benchmarks)
+        self.session_factory = session_factory
+        self.alerts: Dict[int, Alert] = {}
+        self.products: Dict[int, ProductAlerts] = {}
+        self.stats = {"evaluations": 0, "candidates": 0, "fired": 0, "suppressed": 0, "rearmed": 0, "failed": 0}
+        self._lock = threading.Lock()
+        # Products written since the evaluator thread's last pass
+        self._queued: Set[int] = set()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add_sink(self, sink: AlertSink) -> None:
+        self.sinks.append(sink)
+
+    def add(
+        self,
+        alert_id: int,
+        product_id: int,
+        target_price: Optional[float] = None,
+        percent_off_high: Optional[float] = None,
+        cooldown_seconds: Optional[int] = None,
+        armed: bool = True,
+        last_fired_at: Optional[datetime] = None,
+        last_fired_price: Optional[float] = None,
+    ) -> None:
+        """Index an alert (replacing one with the same id)"""
+        cooldown = self.default_cooldown if cooldown_seconds is None else timedelta(seconds=cooldown_seconds)
+        alert = Alert(
+            alert_id, product_id, target_price, percent_off_high, cooldown,
+            armed, last_fired_at, last_fired_price
+        )
+        with self._lock:
+            self._remove(alert_id)
+            self.alerts[alert_id] = alert
+            index = self.products.get(product_id)
+            if index is None:
+                index = self.products[product_id] = ProductAlerts()
+            index.add(alert)
+
+    def load(self, rows: Iterable[Tuple]) -> int:
+        """Index rows in the column order of crud.iter_alert_rows"""
+        count = 0
+        for row in rows:
+            self.add(*row)
+            count += 1
+        return count
+
+    def remove(self, alert_id: int) -> None:
+        with self._lock:
+            self._remove(alert_id)
+
+    def _remove(self, alert_id: int) -> None:
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        index = self.products.get(alert.product_id)
+        if index is not None:
+            index.remove(alert)
+            if not index:
+                del self.products[alert.product_id]
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            index = self.products.pop(product_id, None)
+            if index is None:
+                return
+            for alert_id in index.ids():
+                self.alerts.pop(alert_id, None)
+
+    def has_alerts(self, product_id: int) -> bool:
+        return product_id in self.products
+
+    def evaluate(
+        self,
+        product_id: int,
+        price: float,
+        highest_price: Optional[float],
+        now: Optional[datetime] = None,
+        changed: Optional[List[Alert]] = None,
+        undo: Optional[List[Tuple[Any, Tuple]]] = None,
+    ) -> List[AlertEvent]:
+        """
+        Fire the alerts a new price triggers
+
+        Args:
+            changed: collects alerts whose armed state changed, to persist
+            undo: collects the state this call replaces, for restore()
+
+        Returns:
+            Events for the alerts that fired
+        """
+        now = now or datetime.utcnow()
+        drop = percent_off(price, highest_price)
+        events = []
+        with self._lock:
+            index = self.products.get(product_id)
+            if index is None:
+                return events
+            self.stats["evaluations"] += 1
+            checked = index.pending | index.flipped(price, drop)
+            self.stats["candidates"] += len(checked)
+            if undo is not None:
+                undo.append((index, (index.pending, index.last_price, index.last_drop)))
+            index.pending = set()
+            index.last_price, index.last_drop = price, drop
+
+            for alert_id in checked:
+                alert = self.alerts[alert_id]
+                if not _meets(alert, price, drop):
+                    # Condition cleared: a fired alert can fire again
+                    if not alert.armed:
+                        if undo is not None:
+                            undo.append((alert, (alert.armed, alert.last_fired_at, alert.last_fired_price)))
+                        alert.armed = True
+                        self.stats["rearmed"] += 1
+                        if changed is not None:
+                            changed.append(alert)
+                    continue
+                if not alert.armed:
+                    continue
+                if alert.last_fired_at is not None and now - alert.last_fired_at < alert.cooldown:
+                    self.stats["suppressed"] += 1
+                    index.pending.add(alert_id)
+                    continue
+                if undo is not None:
+                    undo.append((alert, (alert.armed, alert.last_fired_at, alert.last_fired_price)))
+                alert.armed = False
+                alert.last_fired_at = now
+                alert.last_fired_price = price
+                if changed is not None:
+                    changed.append(alert)
+                events.append(AlertEvent(
+                    alert_id, product_id, price, highest_price,
+                    alert.target_price, alert.percent_off_high, now
+                ))
+            self.stats["fired"] += len(events)
+        return events
+
+    def restore(self, undo: List[Tuple[Any, Tuple]]) -> None:
+        """Put back the state evaluate(undo=...) replaced, e.g. when saving it failed"""
+        with self._lock:
+            for target, state in reversed(undo):
+                if isinstance(target, ProductAlerts):
+                    pending, target.last_price, target.last_drop = state
+                    # Keep alerts added since: pending ones are only checked again
+                    target.pending |= pending
+                else:
+                    target.armed, target.last_fired_at, target.last_fired_price = state
+
+    def deliver(self, events: List[AlertEvent]) -> None:
+        for sink in self.sinks:
+            try:
+                sink.deliver(events)
+            except Exception as e:
+                logger.error(f"Alert sink {type(sink).__name__} failed for {len(events)} events: {str(e)}")
+
+    def on_write(self, action: str, product_ids: List[int]) -> None:
+        """crud write listener: queue the products whose price was written"""
+        if action == "deleted":
+            for product_id in product_ids:
+                self.remove_product(product_id)
+            return
+        if action not in ("created", "updated") or self.session_factory is None:
+            return
+        watched = [product_id for product_id in product_ids if self.has_alerts(product_id)]
+        if not watched:
+            return
+        if self._thread is None:
+            self.evaluate_products(watched)
+            return
+        with self._wakeup:
+            self._queued.update(watched)
+            self._wakeup.notify()
+
+    def evaluate_products(self, product_ids: List[int]) -> None:
+        """Evaluate products at their current prices, save alert state, then deliver"""
+        db = self.session_factory()
+        undo: List[Tuple[Any, Tuple]] = []
+        try:
+            changed: List[Alert] = []
+            events: List[AlertEvent] = []
+            now = datetime.utcnow()
+            for product_id, price, highest_price in crud.get_alert_prices(db, product_ids):
+                events.extend(self.evaluate(product_id, price, highest_price, now, changed, undo))
+            crud.save_alert_states(db, [alert.state() for alert in changed])
+        except Exception as e:
+            db.rollback()
+            self.restore(undo)
+            self.stats["failed"] += 1
+            logger.error(f"Alert evaluation failed for {len(product_ids)} products, state kept: {str(e)}")
+            return
+        finally:
+            db.close()
+        if events:
+            self.deliver(events)
+
+    # ---- evaluator thread ----
+
+    def start(self) -> None:
+        """Evaluate writes on a background thread instead of the writing one"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="alert-evaluator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Evaluate what is queued, then stop the evaluator thread"""
+        if self._thread is None:
+            return
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._queued and not self._stopping:
+                    self._wakeup.wait()
+                if not self._queued:
+                    return
+                product_ids, self._queued = list(self._queued), set()
+            try:
+                self.evaluate_products(product_ids)
+            except Exception as e:
+                logger.error(f"Alert evaluator failed: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus index size, for the stats endpoint"""
+        return {
+            **self.stats,
+            "queued": len(self._queued),
+            "alerts": len(self.alerts),
+            "products": len(self.products),
+            "sinks": [type(sink).__name__ for sink in self.sinks],
+        }
+
+    def close(self) -> None:
+        crud.remove_write_listener(self.on_write)
+        self.stop()
+        for sink in self.sinks:
+            sink.close()
+
+
+_shared_engine: Optional[AlertEngine] = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_alert_engine() -> AlertEngine:
+    """Process-wide alert engine, loaded from the database on first use"""
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            engine = AlertEngine(build_sinks())
+            db = SessionLocal()
+            try:
+                loaded = engine.load(crud.iter_alert_rows(db))
+            finally:
+                db.close()
+            if loaded:
+                logger.info(f"Alert index loaded: {loaded} alerts on {len(engine.products)} products")
+            if ALERTS_ENABLED:
+                engine.start()
+                crud.add_write_listener(engine.on_write)
+            _shared_engine = engine
+        return _shared_engine
+
+
+def close_alert_engine() -> None:
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is not None:
+            _shared_engine.close()
+            _shared_engine = None
@@ -0,0 +1,463 @@
+# backend/analytics.py
+"""
+Price analytics for every tracked product, computed with NumPy
+
+Loads the price history inside the longest analytics window into
+columnar arrays (product id, price, interval start) ordered by product,
+and computes each metric for all products at once with grouped
+reductions (np.bincount, np.minimum.reduceat) instead of a Python loop
+per product:
+
+- moving averages: time-weighted mean price over each ANALYTICS_MA_DAYS window
+- volatility: time-weighted standard deviation of the price over
+  ANALYTICS_VOLATILITY_DAYS, as a percent of its mean
+- percent_off_high: how far the current price is below highest_price
+- lowest_in_days: whether the current price is the lowest (or tied) seen in
+  each ANALYTICS_LOW_DAYS window
+
+History rows are runs of one price (see models.PriceHistory), so a price
+counts from its first_seen_at until the next row starts, and the latest
+row until now. A product with no row in the window has held its current
+price throughout.
+
+Served at GET /api/analytics. Results are cached between writes: a crud
+write listener marks the written products stale and the next read
+recomputes only those. Everything is recomputed when more than
+ANALYTICS_PARTIAL_MAX products are stale, or when the results are older
+than ANALYTICS_MAX_AGE_SECONDS, since the windows move with time.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _days(value: str) -> Tuple[int, ...]:
+    return tuple(sorted({int(days) for days in value.split(",") if days.strip()}))
+
+
+ANALYTICS_MA_DAYS = _days(os.getenv("ANALYTICS_MA_DAYS", "7,30"))
+ANALYTICS_VOLATILITY_DAYS = int(os.getenv("ANALYTICS_VOLATILITY_DAYS", "30"))
+ANALYTICS_LOW_DAYS = _days(os.getenv("ANALYTICS_LOW_DAYS", "30,90"))
+ANALYTICS_MAX_AGE_SECONDS = int(os.getenv("ANALYTICS_MAX_AGE_SECONDS", "300"))
+# Stale products recomputed on their own; more than this rebuilds everything
+ANALYTICS_PARTIAL_MAX = int(os.getenv("ANALYTICS_PARTIAL_MAX", "1000"))
+# History rows per vectorized pass, bounds the temporary arrays
+ANALYTICS_CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "1000000"))
+ANALYTICS_BATCH_ROWS = int(os.getenv("ANALYTICS_BATCH_ROWS", "50000"))
+
+DAY_SECONDS = 86400
+
+
+class ProductColumns(NamedTuple):
+    """Products ordered by id"""
+    product_ids: np.ndarray  # int64
+    currencies: np.ndarray  # object
+    current_prices: np.ndarray  # float64, NaN when unknown
+    highest_prices: np.ndarray  # float64, NaN when unknown
+
+
+class HistoryColumns(NamedTuple):
+    """History intervals ordered by product id, then start"""
+    product_ids: np.ndarray  # int64
+    prices: np.ndarray  # float64
+    starts: np.ndarray  # int64 epoch seconds (UTC)
+
+
+def epoch_seconds(moment: datetime) -> int:
+    """Naive UTC datetime as epoch seconds"""
+    return int(np.datetime64(moment, "s").astype(np.int64))
+
+
+def product_columns(rows: Sequence[Sequence[Any]]) -> ProductColumns:
+    """Columns from (id, currency, current_price, highest_price) rows"""
+    ids, currencies, current, highest = zip(*rows) if rows else ((), (), (), ())
+    return ProductColumns(
+        np.fromiter(ids, dtype=np.int64, count=len(ids)),
+        np.array(currencies, dtype=object),
+        np.array(current, dtype=np.float64),
+        np.array(highest, dtype=np.float64),
+    )
+
+
+def history_columns(batches: Iterator[Sequence[Sequence[Any]]]) -> HistoryColumns:
+    """Columns from batches of (product_id, price, first_seen_at epoch seconds) rows"""
+    ids, prices, starts = [], [], []
+    for batch in batches:
+        if not batch:
+            continue
+        batch_ids, batch_prices, batch_starts = zip(*batch)
+        ids.append(np.fromiter(batch_ids, dtype=np.int64, count=len(batch)))
+        prices.append(np.fromiter(batch_prices, dtype=np.float64, count=len(batch)))
+        starts.append(np.fromiter(batch_starts, dtype=np.int64, count=len(batch)))
+    if not ids:
+        return HistoryColumns(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int64))
+    return HistoryColumns(np.concatenate(ids), np.concatenate(prices), np.concatenate(starts))
+
+
+def lookback_days(
+    ma_days: Sequence[int] = ANALYTICS_MA_DAYS,
+    volatility_days: int = ANALYTICS_VOLATILITY_DAYS,
+    low_days: Sequence[int] = ANALYTICS_LOW_DAYS
+) -> int:
+    """History needed: the longest window"""
+    return max([volatility_days, *ma_days, *low_days])
+
+
+def _chunk_bounds(product_ids: np.ndarray, chunk_rows: int) -> Iterator[Tuple[int, int]]:
+    """[lo, hi) row ranges of about chunk_rows rows that don't split a product"""
+    total = len(product_ids)
+    lo = 0
+    while lo < total:
+        hi = min(lo + chunk_rows, total)
+        if hi < total:
+            hi = int(np.searchsorted(product_ids, product_ids[hi], "left"))
+            if hi <= lo:
+                # One product larger than a chunk
+                hi = int(np.searchsorted(product_ids, product_ids[lo], "right"))
+        yield lo, hi
+        lo = hi
+
+
+def _group_starts(product_ids: np.ndarray) -> np.ndarray:
+    """Index of each product's first row"""
+    first = np.empty(len(product_ids), dtype=bool)
+    first[0] = True
+    np.not_equal(product_ids[1:], product_ids[:-1], out=first[1:])
+    return np.flatnonzero(first)
+
+
+def _compute_chunk(
+    table: Dict[str, np.ndarray],
+    owners: np.ndarray,
+    group_starts: np.ndarray,
+    prices: np.ndarray,
+    starts: np.ndarray,
+    now: int,
+    ma_days: Sequence[int],
+    volatility_days: int,
+    low_days: Sequence[int]
+) -> None:
+    """
+    Fill the windowed columns for the products of one chunk of rows
+
+    Rows of a product are contiguous: group_starts[i] is the first row of
+    the product at table position owners[i].
+    """
+    rows = len(prices)
+    group_ends = np.append(group_starts[1:], rows)
+    last_rows = group_ends - 1
+
+    # Each price holds until the product's next row starts, the latest until now
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:]
+    ends[last_rows] = now
+
+    latest = prices[last_rows]
+    # Offsets from the latest price keep the variance sums well conditioned
+    offsets = prices - np.repeat(latest, group_ends - group_starts)
+
+    sums: Dict[int, List[np.ndarray]] = {}
+
+    def window_sums(days: int) -> List[np.ndarray]:
+        """Seconds held, and sums of offset (and offset squared for the volatility window) x seconds"""
+        if days not in sums:
+            since = now - days * DAY_SECONDS
+            held = np.clip(ends, since, now) - np.clip(starts, since, now)
+            weighted = held * offsets
+            sums[days] = [np.add.reduceat(held, group_starts), np.add.reduceat(weighted, group_starts)]
+            if days == volatility_days:
+                sums[days].append(np.add.reduceat(weighted * offsets, group_starts))
+        return sums[days]
+
+    def per_second(total: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        # A product seen only just now held no price yet: count it at its latest price
+        return np.divide(total, seconds, out=np.zeros_like(total), where=seconds > 0)
+
+    for days in ma_days:
+        seconds, first_moment = window_sums(days)[:2]
+        table[f"ma_{days}"][owners] = latest + per_second(first_moment, seconds)
+
+    seconds, first_moment, second_moment = window_sums(volatility_days)
+    mean_offset = per_second(first_moment, seconds)
+    variance = np.maximum(per_second(second_moment, seconds) - mean_offset * mean_offset, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["volatility"][owners] = np.sqrt(variance) / (latest + mean_offset) * 100
+
+    for days in low_days:
+        # Rows that ended before the window don't count; the latest row always does
+        in_window = np.where(ends > now - days * DAY_SECONDS, prices, np.inf)
+        table[f"low_{days}"][owners] = latest <= np.minimum.reduceat(in_window, group_starts)
+
+
+def compute(
+    products: ProductColumns,
+    history: HistoryColumns,
+    now: int,
+    ma_days: Sequence[int] = ANALYTICS_MA_DAYS,
+    volatility_days: int = ANALYTICS_VOLATILITY_DAYS,
+    low_days: Sequence[int] = ANALYTICS_LOW_DAYS,
+    chunk_rows: int = ANALYTICS_CHUNK_ROWS
+) -> Dict[str, np.ndarray]:
+    """
+    Analytics for every product, one vectorized pass per chunk of history
+
+    Args:
+        products: Products to compute, ordered by id
+        history: Their history rows seen within the longest window, ordered
+            by product then start (rows of other products are ignored)
+        now: Epoch seconds the windows end at
+
+    Returns:
+        Columns aligned with products: product_id, currency, current_price,
+        highest_price, percent_off_high, volatility, ma_<days>, low_<days>.
+        Windowed values are NaN where a product has no price.
+    """
+    count = len(products.product_ids)
+    current = products.current_prices
+    highest = products.highest_prices
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_off_high = np.where(highest > 0, np.maximum(highest - current, 0) / highest * 100, np.nan)
+    table = {
+        "product_id": products.product_ids,
+        "currency": products.currencies,
+        "current_price": current,
+        "highest_price": highest,
+        "percent_off_high": percent_off_high,
+        "volatility": np.full(count, np.nan),
+    }
+    for days in ma_days:
+        table[f"ma_{days}"] = np.full(count, np.nan)
+    for days in low_days:
+        table[f"low_{days}"] = np.zeros(count, dtype=bool)
+    if not count:
+        return table
+
+    has_rows = np.zeros(count, dtype=bool)
+    for lo, hi in _chunk_bounds(history.product_ids, chunk_rows):
+        chunk_ids = history.product_ids[lo:hi]
+        prices, starts = history.prices[lo:hi], history.starts[lo:hi]
+        group_starts = _group_starts(chunk_ids)
+        # Table position of each product; rows of products not in the table are dropped
+        group_ids = chunk_ids[group_starts]
+        owners = np.searchsorted(products.product_ids, group_ids)
+        known = products.product_ids[np.minimum(owners, count - 1)] == group_ids
+        if not known.all():
+            if not known.any():
+                continue
+            rows = np.repeat(known, np.diff(np.append(group_starts, len(chunk_ids))))
+            prices, starts = prices[rows], starts[rows]
+            group_starts = _group_starts(chunk_ids[rows])
+            owners = owners[known]
+        has_rows[owners] = True
+        _compute_chunk(table, owners, group_starts, prices, starts, now, ma_days, volatility_days, low_days)
+
+    # Products without a row in the window held their current price all along
+    held = np.flatnonzero(~has_rows & ~np.isnan(current))
+    if held.size:
+        since = now - lookback_days(ma_days, volatility_days, low_days) * DAY_SECONDS
+        _compute_chunk(
+            table, held, np.arange(held.size), current[held], np.full(held.size, since, dtype=np.int64),
+            now, ma_days, volatility_days, low_days
+        )
+    return table
+
+
+def merge(table: Dict[str, np.ndarray], product_ids: np.ndarray, updates: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """table with the rows of product_ids replaced by updates (deleted ones dropped), still ordered by id"""
+    keep = ~np.isin(table["product_id"], product_ids)
+    merged = {name: np.concatenate([column[keep], updates[name]]) for name, column in table.items()}
+    order = np.argsort(merged["product_id"], kind="stable")
+    return {name: column[order] for name, column in merged.items()}
+
+
+def load(
+    db: Session,
+    now: datetime,
+    product_ids: Optional[List[int]] = None,
+    days: int = lookback_days(),
+    batch_rows: int = ANALYTICS_BATCH_ROWS
+) -> Tuple[ProductColumns, HistoryColumns]:
+    """Product and history columns for all products, or the given ones"""
+    products = product_columns(crud.get_analytics_products(db, product_ids))
+    history = history_columns(
+        crud.iter_analytics_history(db, now - timedelta(days=days), product_ids, batch_rows=batch_rows)
+    )
+    return products, history
+
+
+def _value(value: Any) -> Any:
+    return None if value != value else round(value, 4)
+
+
+class AnalyticsCache:
+    """Analytics for every product, recomputed for the products written since"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_age_seconds: int = ANALYTICS_MAX_AGE_SECONDS,
+        partial_max: int = ANALYTICS_PARTIAL_MAX
+    ):
+        self.session_factory = session_factory
+        self.max_age_seconds = max_age_seconds
+        self.partial_max = partial_max
+        self.table: Optional[Dict[str, np.ndarray]] = None
+        self.computed_at: Optional[datetime] = None
+        self._stale: Set[int] = set()
+        self._rebuild = False
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self.stats = {"hits": 0, "partial": 0, "full": 0}
+
+    def on_write(self, action: str, product_ids: List[int]) -> None:
+        """crud write listener: the written products need recomputing"""
+        with self._lock:
+            if self._rebuild:
+                return
+            self._stale.update(product_ids)
+            if len(self._stale) > self.partial_max:
+                self._rebuild = True
+                self._stale = set()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._rebuild = True
+            self._stale = set()
+
+    def get(self) -> Tuple[Dict[str, np.ndarray], datetime]:
+        """Current analytics table and when it was computed, refreshed if needed"""
+        with self._compute_lock:
+            with self._lock:
+                stale, rebuild = self._stale, self._rebuild
+                self._stale, self._rebuild = set(), False
+            now = datetime.utcnow()
+            expired = (
+                self.table is None
+                or (now - self.computed_at).total_seconds() > self.max_age_seconds
+            )
+            try:
+                if expired or rebuild:
+                    self._compute(now)
+                    self.stats["full"] += 1
+                elif stale:
+                    self._compute(now, sorted(stale))
+                    self.stats["partial"] += 1
+                else:
+                    self.stats["hits"] += 1
+            except Exception:
+                self.invalidate()
+                raise
+            return self.table, self.computed_at
+
+    def _compute(self, now: datetime, product_ids: Optional[List[int]] = None) -> None:
+        started = time.perf_counter()
+        with self.session_factory() as db:
+            products, history = load(db, now, product_ids)
+        loaded = time.perf_counter()
+        table = compute(products, history, epoch_seconds(now))
+        if product_ids is None:
+            self.table = table
+            self.computed_at = now
+        else:
+            self.table = merge(self.table, np.array(product_ids, dtype=np.int64), table)
+        logger.info(
+            f"Analytics for {len(products.product_ids)} products from {len(history.product_ids)} history rows: "
+            f"load {(loaded - started) * 1000:.0f} ms, compute {(time.perf_counter() - loaded) * 1000:.0f} ms"
+        )
+
+    def query(
+        self,
+        product_ids: Optional[List[int]] = None,
+        lowest_in: Optional[int] = None,
+        min_percent_off: Optional[float] = None,
+        sort: str = "product_id",
+        skip: int = 0,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        One page of analytics, filtered and sorted with array operations
+
+        Args:
+            product_ids: Only these products
+            lowest_in: Only products at their lowest price in this many days
+                (one of ANALYTICS_LOW_DAYS)
+            min_percent_off: Only products at least this far below their high
+            sort: product_id (ascending), or percent_off_high or volatility
+                (descending, unknown values last)
+        """
+        table, computed_at = self.get()
+        selected = np.ones(len(table["product_id"]), dtype=bool)
+        if product_ids:
+            selected &= np.isin(table["product_id"], product_ids)
+        if lowest_in is not None:
+            selected &= table[f"low_{lowest_in}"]
+        if min_percent_off is not None:
+            selected &= table["percent_off_high"] >= min_percent_off
+        rows = np.flatnonzero(selected)
+        if sort != "product_id":
+            values = table[sort][rows]
+            rows = rows[np.argsort(np.where(np.isnan(values), -np.inf, -values), kind="stable")]
+        page = rows[skip:skip + limit]
+
+        columns = {name: column[page].tolist() for name, column in table.items()}
+        items = []
+        for i in range(len(page)):
+            items.append({
+                "product_id": columns["product_id"][i],
+                "currency": columns["currency"][i],
+                "current_price": _value(columns["current_price"][i]),
+                "highest_price": _value(columns["highest_price"][i]),
+                "percent_off_high": _value(columns["percent_off_high"][i]),
+                "volatility": _value(columns["volatility"][i]),
+                "moving_averages": {str(days): _value(columns[f"ma_{days}"][i]) for days in ANALYTICS_MA_DAYS},
+                "lowest_in_days": {str(days): columns[f"low_{days}"][i] for days in ANALYTICS_LOW_DAYS},
+            })
+        return {
+            "computed_at": computed_at.isoformat(),
+            "volatility_days": ANALYTICS_VOLATILITY_DAYS,
+            "total": int(len(rows)),
+            "items": items,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stale = len(self._stale)
+        return {
+            **self.stats,
+            "stale": stale,
+            "products": 0 if self.table is None else int(len(self.table["product_id"])),
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None,
+        }
+
+
+_cache: Optional[AnalyticsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = AnalyticsCache()
+                crud.add_write_listener(cache.on_write)
+                _cache = cache
+    return _cache
+
+
+def close_analytics_cache() -> None:
+    global _cache
+    if _cache is not None:
+        crud.remove_write_listener(_cache.on_write)
+        _cache = None
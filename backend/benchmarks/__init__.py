@@ -0,0 +1,7 @@
+# backend/benchmarks/__init__.py
+"""
+Offline benchmarks and load tests.
+
+Run from the backend directory, e.g.:
+    python -m benchmarks.load_track --requests 500 --delay 1.0
+"""
@@ -0,0 +1,149 @@
+# backend/benchmarks/bench_alerts.py
+"""
+Alert engine throughput with a large number of registered alerts.
+
+Registers --alerts alerts over --products products (a mix of target
+price, percent-off-high and combined alerts, thresholds below each
+product's base price), then replays --writes price writes (a random
+walk of +-2% steps per product, 5% of writes jumping anywhere between 40%
+and 105% of the base price) through
+AlertEngine.evaluate and reports evaluations/second, fires and re-arms
+per write, index build time and resident memory. A sample of the
+writes is checked against a full scan of every alert, and the scan is
+timed for comparison. Cooldown is 0, so only dedup (fire once, re-arm
+when the condition clears) limits firing.
+
+A second run puts --hot-alerts alerts on a single product (--hot-writes
+writes). Its
+thresholds are dense, so every step crosses many of them: the cost per
+write follows k, the alerts that fire or re-arm, not n, the alerts on
+the product.
+
+Usage:
+    python -m benchmarks.bench_alerts
+    python -m benchmarks.bench_alerts --alerts 1000000 --products 100000 --writes 200000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from alerts import AlertEngine, percent_off  # noqa: E402
+from benchmarks.bench_export import rss_mb  # noqa: E402
+
+
+def make_alerts(count, products, rng, base_prices, first_product=0):
+    """(id, product_id, target_price, percent_off_high) tuples"""
+    alerts = []
+    for alert_id in range(count):
+        product_id = first_product + alert_id % products
+        base = base_prices[product_id]
+        kind = rng.random()
+        target = round(base * rng.uniform(0.5, 0.95), 2) if kind < 0.7 else None
+        percent = round(rng.uniform(5, 50), 1) if kind >= 0.5 else None
+        alerts.append((alert_id, product_id, target, percent))
+    return alerts
+
+
+def scan_evaluate(alerts, fired, product_id, price, highest_price):
+    """Reference: check every alert on every write, same fire/re-arm rules (no cooldown)"""
+    drop = percent_off(price, highest_price)
+    firing = set()
+    for alert_id, alert_product, target, percent in alerts:
+        if alert_product != product_id:
+            continue
+        meets = (target is not None and price <= target) or (percent is not None and drop + 1e-9 >= percent)
+        if not meets:
+            fired.discard(alert_id)
+        elif alert_id not in fired:
+            fired.add(alert_id)
+            firing.add(alert_id)
+    return firing
+
+
+def run(label, alerts, writes, rng, base_prices, check):
+    engine = AlertEngine(cooldown_seconds=0, session_factory=None)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    for alert_id, product_id, target, percent in alerts:
+        engine.add(alert_id, product_id, target, percent)
+    build = time.perf_counter() - started
+    rss_after = rss_mb()
+
+    now = datetime(2026, 1, 1)
+    products = list(engine.products)
+    prices = {product_id: base_prices[product_id] for product_id in products}
+    highs = dict(prices)
+    plan = []
+    for _ in range(writes):
+        product_id = rng.choice(products)
+        base = base_prices[product_id]
+        # Mostly small moves from the last price, sometimes a jump (sale or its end)
+        if rng.random() < 0.05:
+            price = base * rng.uniform(0.4, 1.05)
+        else:
+            price = min(max(prices[product_id] * rng.uniform(0.98, 1.02), base * 0.4), base * 1.05)
+        prices[product_id] = price = round(price, 2)
+        highs[product_id] = max(highs[product_id], price)
+        plan.append((product_id, price, highs[product_id]))
+
+    # The first writes fire the same alerts as a full scan; time the scan too
+    sample, plan = plan[:check], plan[check:]
+    fired_reference = set()
+    scan = 0.0
+    for i, (product_id, price, high) in enumerate(sample):
+        scan_started = time.perf_counter()
+        expected = scan_evaluate(alerts, fired_reference, product_id, price, high)
+        scan += time.perf_counter() - scan_started
+        events = engine.evaluate(product_id, price, high, now + timedelta(seconds=i))
+        assert {event.alert_id for event in events} == expected, (product_id, price)
+    scan /= max(len(sample), 1)
+
+    stats_before = dict(engine.stats)
+    started = time.perf_counter()
+    for i, (product_id, price, high) in enumerate(plan, start=check):
+        engine.evaluate(product_id, price, high, now + timedelta(seconds=i))
+    elapsed = time.perf_counter() - started
+    writes = len(plan)
+    fired = engine.stats["fired"] - stats_before["fired"]
+    rearmed = engine.stats["rearmed"] - stats_before["rearmed"]
+
+    print(f"{label}")
+    print(f"  index build      {build:8.2f} s   {len(alerts) / build:12,.0f} alerts/s   "
+          f"+{rss_after - rss_before:,.0f} MB RSS")
+    print(f"  indexed          {writes / elapsed:12,.0f} evaluations/s   "
+          f"{elapsed / writes * 1e6:8.2f} us/write   "
+          f"{fired / writes:6.2f} fired/write   {rearmed / writes:5.2f} re-armed/write")
+    print(f"  full scan        {1 / scan:12,.1f} evaluations/s   {scan * 1e6:8.0f} us/write   "
+          f"({len(sample)} writes, same results)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=200_000)
+    parser.add_argument("--hot-alerts", type=int, default=100_000, help="alerts on the single hot product")
+    parser.add_argument("--hot-writes", type=int, default=20_000, help="writes to the hot product")
+    parser.add_argument("--check", type=int, default=20, help="writes verified against a full scan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base_prices = [round(rng.uniform(5, 2000), 2) for _ in range(args.products + 1)]
+
+    spread = make_alerts(args.alerts, args.products, rng, base_prices)
+    run(f"{args.alerts:,} alerts over {args.products:,} products, {args.writes:,} writes",
+        spread, args.writes, rng, base_prices, args.check)
+
+    hot_product = args.products
+    hot = make_alerts(args.hot_alerts, 1, rng, base_prices, first_product=hot_product)
+    run(f"{args.hot_alerts:,} alerts on one product, {args.hot_writes:,} writes",
+        hot, args.hot_writes, rng, base_prices, args.check)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# backend/benchmarks/bench_analytics.py
+"""
+Vectorized price analytics over a large price history.
+
+Builds --products products with --points history intervals each as
+columns (an observation every 30-90 minutes, a random walk of prices) and
+times analytics.compute over all of them. A Python loop per product (the
+math done over per-product /history results) runs on --check products,
+is checked against the vectorized results and extrapolated to the whole
+set. Also times the partial refresh after --stale products are written
+(analytics.merge).
+
+Finally seeds --db-products products into SQLite and times
+GET /api/analytics: a cold read (load and full compute), a cached read,
+and a read after writes to --stale of them (partial recompute).
+
+Usage:
+    python -m benchmarks.bench_analytics
+    python -m benchmarks.bench_analytics --products 10000 --points 1000 --db-products 500
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+def synthetic(analytics, products, points, now, seed):
+    """ProductColumns and HistoryColumns for products x points intervals"""
+    rng = np.random.default_rng(seed)
+    total = products * points
+    ids = np.repeat(np.arange(1, products + 1, dtype=np.int64), points)
+    prices = np.empty(total)
+    starts = np.empty(total, dtype=np.int64)
+    base = rng.uniform(5, 2000, products)
+    block = max(1, 5_000_000 // points)
+    for lo in range(0, products, block):
+        hi = min(lo + block, products)
+        walk = np.exp(np.cumsum(rng.normal(0, 0.01, (hi - lo, points)), axis=1))
+        prices[lo * points:hi * points] = np.round(base[lo:hi, None] * walk, 2).ravel()
+        gaps = rng.integers(1800, 5400, (hi - lo, points))
+        offsets = np.cumsum(gaps, axis=1)
+        starts[lo * points:hi * points] = (now - offsets[:, -1:] + offsets - gaps).ravel()
+    current = prices[points - 1::points].copy()
+    highest = np.maximum(current, np.maximum.reduceat(prices, np.arange(0, total, points)))
+    product_columns = analytics.ProductColumns(
+        np.arange(1, products + 1, dtype=np.int64), np.full(products, "USD", dtype=object), current, highest
+    )
+    return product_columns, analytics.HistoryColumns(ids, prices, starts)
+
+
+def python_analytics(analytics, current, highest, rows, now):
+    """One product the loop way: rows are (start, price) oldest first"""
+    day = analytics.DAY_SECONDS
+    if not rows and not math.isnan(current):
+        rows = [(now - analytics.lookback_days() * day, current)]
+    ends = [start for start, _ in rows[1:]] + [now]
+    result = {"percent_off_high": max(highest - current, 0) / highest * 100 if highest > 0 else math.nan}
+
+    def weighted(days):
+        since = now - days * day
+        spans = [
+            (min(max(end, since), now) - min(max(start, since), now), price)
+            for (start, price), end in zip(rows, ends)
+        ]
+        seconds = sum(held for held, _ in spans)
+        if not rows:
+            return math.nan, math.nan
+        if not seconds:
+            return rows[-1][1], 0.0
+        mean = sum(held * price for held, price in spans) / seconds
+        variance = sum(held * (price - mean) ** 2 for held, price in spans) / seconds
+        return mean, math.sqrt(variance) / mean * 100
+
+    for days in analytics.ANALYTICS_MA_DAYS:
+        result[f"ma_{days}"] = weighted(days)[0]
+    result["volatility"] = weighted(analytics.ANALYTICS_VOLATILITY_DAYS)[1]
+    for days in analytics.ANALYTICS_LOW_DAYS:
+        since = now - days * day
+        window = [price for (_, price), end in zip(rows, ends) if end > since]
+        result[f"low_{days}"] = bool(rows) and rows[-1][1] <= min(window)
+    return result
+
+
+def check_and_time_loop(analytics, table, products, history, now, check):
+    """Seconds per product for the Python loop; asserts it matches table"""
+    bounds = np.searchsorted(history.product_ids, products.product_ids[:check + 1])
+    loop = 0.0
+    for i in range(min(check, len(products.product_ids))):
+        lo, hi = bounds[i], bounds[i + 1] if i + 1 < len(bounds) else len(history.product_ids)
+        rows = list(zip(history.starts[lo:hi].tolist(), history.prices[lo:hi].tolist()))
+        started = time.perf_counter()
+        expected = python_analytics(
+            analytics, float(products.current_prices[i]), float(products.highest_prices[i]), rows, now
+        )
+        loop += time.perf_counter() - started
+        for name, value in expected.items():
+            got = table[name][i]
+            if isinstance(value, bool):
+                assert bool(got) == value, (i, name, got, value)
+            else:
+                assert (math.isnan(value) and math.isnan(got)) or math.isclose(got, value, rel_tol=1e-7, abs_tol=1e-6), (
+                    i, name, got, value
+                )
+    return loop / max(check, 1)
+
+
+def bench_api(args):
+    """Cold, cached and partial GET /api/analytics over a seeded SQLite database"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    import crud
+    import database
+    import main as app_module
+    from models import Product, PriceHistory
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    rng = np.random.default_rng(args.seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    with database.SessionLocal() as db:
+        for product_id in range(1, args.db_products + 1):
+            gaps = rng.integers(1800, 5400, args.points)
+            offsets = np.cumsum(gaps)
+            seen = [now - timedelta(seconds=int(offsets[-1] - offset)) for offset in offsets]
+            prices = np.round(rng.uniform(5, 2000) * np.exp(np.cumsum(rng.normal(0, 0.01, args.points))), 2)
+            db.execute(insert(Product), [{
+                "id": product_id, "url": f"https://www.amazon.com/dp/B{product_id:09d}",
+                "marketplace": "amazon.com", "asin": f"B{product_id:09d}", "name": f"Product {product_id}",
+                "current_price": float(prices[-1]), "lowest_price": float(prices.min()),
+                "highest_price": float(prices.max()), "currency": "USD", "retailer": "Amazon",
+                "created_at": seen[0], "updated_at": now, "last_checked_at": now, "next_check_at": now,
+                "unchanged_checks": 0,
+            }])
+            db.execute(insert(PriceHistory), [
+                {"product_id": product_id, "price": float(price), "currency": "USD",
+                 "first_seen_at": first_seen, "last_seen_at": first_seen}
+                for price, first_seen in zip(prices, seen)
+            ])
+        db.commit()
+    seed_seconds = time.perf_counter() - started
+
+    client = TestClient(app_module.app)
+
+    def timed(params=None):
+        started = time.perf_counter()
+        response = client.get("/api/analytics", params=params)
+        assert response.status_code == 200, response.text
+        return time.perf_counter() - started, response.json()
+
+    cold, body = timed()
+    assert body["total"] == args.db_products, body["total"]
+    cached, _ = timed()
+    stale = list(range(1, min(args.stale, args.db_products) + 1))
+    crud.notify_write("history", stale)
+    partial, _ = timed()
+    filtered, body = timed({"lowest_in": 30, "sort": "percent_off_high", "limit": 1000})
+    stats = client.get("/api/analytics/stats").json()
+    assert stats["full"] == 1 and stats["partial"] == 1, stats
+
+    rows = args.db_products * args.points
+    print(f"GET /api/analytics, {args.db_products:,} products x {args.points:,} points in SQLite "
+          f"(seeded in {seed_seconds:.1f} s)")
+    print(f"  cold (load + compute)   {cold * 1000:9.1f} ms   {rows / cold:12,.0f} rows/s")
+    print(f"  cached                  {cached * 1000:9.1f} ms")
+    print(f"  after {len(stale):,} writes        {partial * 1000:9.1f} ms   (partial recompute)")
+    print(f"  lowest_in=30, by % off  {filtered * 1000:9.1f} ms   {body['total']:,} matches")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--points", type=int, default=1000, help="history intervals per product")
+    parser.add_argument("--check", type=int, default=200, help="products run through the Python loop")
+    parser.add_argument("--stale", type=int, default=1000, help="products written before a partial refresh")
+    parser.add_argument("--db-products", type=int, default=500, help="products seeded for the API run, 0 skips it")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'analytics.db')}"
+    import analytics
+    from benchmarks.bench_export import PeakRSS, rss_mb
+
+    now = analytics.epoch_seconds(datetime.utcnow())
+    started = time.perf_counter()
+    products, history = synthetic(analytics, args.products, args.points, now, args.seed)
+    generate = time.perf_counter() - started
+    rows = len(history.product_ids)
+    input_mb = sum(column.nbytes for column in history) / 2**20
+
+    with PeakRSS() as peak:
+        before = rss_mb()
+        started = time.perf_counter()
+        table = analytics.compute(products, history, now)
+        elapsed = time.perf_counter() - started
+
+    loop = check_and_time_loop(analytics, table, products, history, now, args.check)
+
+    stale = np.sort(np.random.default_rng(args.seed).choice(products.product_ids, args.stale, replace=False))
+    positions = np.searchsorted(products.product_ids, stale)
+    updates = {name: column[positions] for name, column in table.items()}
+    started = time.perf_counter()
+    merged = analytics.merge(table, stale, updates)
+    merge_seconds = time.perf_counter() - started
+    assert np.array_equal(merged["product_id"], table["product_id"])
+
+    print(f"{args.products:,} products x {args.points:,} points = {rows:,} history rows "
+          f"({input_mb:,.0f} MB of columns, generated in {generate:.1f} s)")
+    print(f"  vectorized compute   {elapsed:8.2f} s   {rows / elapsed:14,.0f} rows/s   "
+          f"{args.products / elapsed:10,.0f} products/s   peak +{peak.peak - before:,.0f} MB RSS")
+    print(f"  Python loop          {loop * args.products:8.2f} s   (extrapolated from {args.check} products, "
+          f"{loop * 1000:.2f} ms each, same results)   {loop * args.products / elapsed:.0f}x slower")
+    print(f"  merge {args.stale:,} refreshed products   {merge_seconds * 1000:8.1f} ms")
+
+    if args.db_products:
+        del table, merged, history
+        bench_api(args)
+
+
+if __name__ == "__main__":
+    main()
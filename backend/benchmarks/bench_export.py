@@ -0,0 +1,135 @@
+# backend/benchmarks/bench_export.py
+"""
+Export throughput over a large price history table.
+
+Seeds --rows history intervals spread over --products products, then
+streams the full history export in each format, to a null sink through
+export.stream_export and through GET /api/export/history. Reports
+rows/second, output size, and the peak resident memory while exporting,
+which should stay flat as --rows grows.
+
+Usage:
+    python -m benchmarks.bench_export --rows 10000000
+    python -m benchmarks.bench_export --rows 1000000 --formats ndjson csv
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), 0 where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+class PeakRSS:
+    """Samples resident memory in a background thread"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="history intervals to export")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv", "parquet"])
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    import database
+    import export
+    import main as app_module
+    from models import Product, PriceHistory
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    per_product = max(1, args.rows // args.products)
+    with database.SessionLocal() as db:
+        db.execute(insert(Product), [{
+            'id': p + 1, 'url': f"https://www.amazon.com/dp/B{p:09d}", 'marketplace': "amazon.com",
+            'asin': f"B{p:09d}", 'name': f"Product {p}", 'current_price': 10.0, 'lowest_price': 5.0,
+            'highest_price': 15.0, 'currency': "USD", 'retailer': "Amazon", 'created_at': now,
+            'updated_at': now, 'last_checked_at': now, 'next_check_at': now, 'unchanged_checks': 0
+        } for p in range(args.products)])
+        batch = []
+        for i in range(args.rows):
+            seen = now - timedelta(hours=per_product - i % per_product)
+            batch.append({
+                'product_id': i // per_product % args.products + 1, 'price': 5.0 + i % 1000 / 100,
+                'currency': "USD", 'first_seen_at': seen, 'last_seen_at': seen + timedelta(minutes=30)
+            })
+            if len(batch) == 100_000:
+                db.execute(insert(PriceHistory), batch)
+                batch = []
+        if batch:
+            db.execute(insert(PriceHistory), batch)
+        db.commit()
+    print(f"seeded {args.rows} history rows for {args.products} products in {time.perf_counter() - started:.1f}s")
+
+    client = TestClient(app_module.app)
+
+    def direct(fmt):
+        size = 0
+        for chunk in export.stream_export("history", fmt):
+            size += len(chunk)
+        return size
+
+    def http(fmt):
+        size = 0
+        with client.stream("GET", "/api/export/history", params={"format": fmt}) as response:
+            assert response.status_code == 200, response.read()
+            for chunk in response.iter_bytes():
+                size += len(chunk)
+        return size
+
+    print(f"{'path':<10} {'format':<8} {'rows/s':>12} {'MB out':>10} {'peak RSS MB':>12}")
+    for fmt in args.formats:
+        try:
+            export.check_format(fmt)
+        except ValueError as e:
+            print(f"{'':<10} {fmt:<8} skipped: {e}")
+            continue
+        for name, run in (("direct", direct), ("http", http)):
+            with PeakRSS() as memory:
+                started = time.perf_counter()
+                size = run(fmt)
+                elapsed = time.perf_counter() - started
+            print(f"{name:<10} {fmt:<8} {args.rows / elapsed:12.0f} {size / 2**20:10.1f} {memory.peak:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
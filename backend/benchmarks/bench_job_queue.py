@@ -0,0 +1,151 @@
+# backend/benchmarks/bench_job_queue.py
+"""
+Multi-process throughput of the durable scrape queue.
+
+For each worker process count in --processes, queues --jobs scrapes of
+stub retailer pages (--failing of them 404 and are retried until they
+fail), starts that many `worker.py` processes against one database and
+times until every job is finished, then stops the workers with SIGTERM.
+
+--crashed jobs per round are leased up front by a worker that never
+finishes them, as if it had been killed mid-scrape: they reappear after
+the visibility timeout and are picked up by the live workers.
+
+Checks every job ends as expected: succeeded on the first attempt (the
+second for crashed ones) with its product saved once, or failed after
+JOB_MAX_ATTEMPTS. Uses a temporary SQLite file unless DATABASE_URL is
+set, e.g. to PostgreSQL to exercise SKIP LOCKED. SQLite runs with the
+app's durable default (DB_SQLITE_SYNCHRONOUS=FULL); set it to NORMAL to
+see what fewer fsyncs are worth.
+
+Usage:
+    python -m benchmarks.bench_job_queue
+    python -m benchmarks.bench_job_queue --jobs 2000 --processes 1,4,16 --concurrency 10 --delay 0.2
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def run_quiet_worker(concurrency: int, ready, go) -> None:
+    """Child process entry point: a worker that only logs errors, started on `go`"""
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger("scraper").setLevel(logging.CRITICAL)
+    logging.getLogger("worker").setLevel(logging.ERROR)
+    from worker import run_worker
+
+    # Imports done; wait so process start-up isn't timed
+    ready.release()
+    go.wait()
+    run_worker(concurrency)
+
+
+def run_round(args, processes, server, round_number):
+    """Queue the round's jobs, run `processes` workers until all are done"""
+    from sqlalchemy import func
+
+    import crud
+    from database import SessionLocal
+    from models import Product, ScrapeJob
+
+    context = multiprocessing.get_context("spawn")
+    ready, go = context.Semaphore(0), context.Event()
+    workers = [context.Process(target=run_quiet_worker, args=(args.concurrency, ready, go)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+
+    prefix = f"R{round_number}"
+    good = [server.product_url(f"{prefix}{i:08d}") for i in range(args.jobs - args.failing)]
+    bad = [f"{server.base_url}/amazon/gone/{prefix}{i:08d}" for i in range(args.failing)]
+    with SessionLocal() as db:
+        jobs = [crud.enqueue_job(db, url, args.max_attempts)[0].id for url in good + bad]
+        crashed = {job_id for job_id, *_ in crud.lease_jobs(db, "crashed-worker", args.crashed, args.visibility)}
+    first, last = min(jobs), max(jobs)
+
+    started = time.perf_counter()
+    go.set()
+
+    with SessionLocal() as db:
+        while True:
+            active = db.query(func.count(ScrapeJob.id)).filter(
+                ScrapeJob.id.between(first, last), ScrapeJob.status.in_(crud.JOB_ACTIVE_STATUSES)
+            ).scalar()
+            db.rollback()
+            if not active:
+                break
+            time.sleep(0.02)
+    elapsed = time.perf_counter() - started
+
+    for worker in workers:
+        worker.terminate()  # SIGTERM: the worker stops leasing and exits
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0, f"worker exited with {worker.exitcode}"
+
+    with SessionLocal() as db:
+        rows = db.query(ScrapeJob).filter(ScrapeJob.id.between(first, last)).all()
+        by_url = {row.url: row for row in rows}
+        leased_by = {row.worker for row in rows}
+        for url in good:
+            job = by_url[url]
+            expected = 2 if job.id in crashed else 1
+            assert job.status == "succeeded" and job.attempts == expected, (job.id, job.status, job.attempts)
+            assert job.product_id is not None
+        for url in bad:
+            job = by_url[url]
+            assert job.status == "failed" and job.attempts == args.max_attempts, (job.id, job.status, job.attempts)
+        products = db.query(func.count(Product.id)).filter(Product.url.like(f"%/dp/{prefix}%")).scalar()
+        assert products == len(good), (products, len(good))
+
+    return elapsed, len(leased_by - {"crashed-worker"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--failing", type=int, default=20, help="jobs whose page 404s")
+    parser.add_argument("--crashed", type=int, default=10, help="jobs leased by a worker that dies")
+    parser.add_argument("--processes", default="1,2,4,8", help="comma-separated worker process counts")
+    parser.add_argument("--concurrency", type=int, default=2, help="jobs in flight per process")
+    parser.add_argument("--delay", type=float, default=0.5, help="upstream delay in seconds")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--visibility", type=float, default=2.0, help="visibility timeout in seconds")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+    # Read by the worker processes at import
+    os.environ["JOB_MAX_ATTEMPTS"] = str(args.max_attempts)
+    os.environ["JOB_VISIBILITY_TIMEOUT"] = str(args.visibility)
+    os.environ["JOB_RETRY_BASE_SECONDS"] = "0.05"
+    os.environ["JOB_POLL_SECONDS"] = "0.05"
+    os.environ.setdefault("PARSE_POOL_WORKERS", "0")
+
+    import database
+    import models  # noqa: F401 (registers the tables)
+    from benchmarks.stub_server import StubRetailerServer
+
+    database.engine.echo = False
+    logging.basicConfig(level=logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    dialect = database.engine.dialect.name
+    print(f"{args.jobs:,} jobs per round ({args.failing} failing, {args.crashed} leased by a crashed worker), "
+          f"{args.concurrency} in flight per process, {args.delay * 1000:.0f} ms upstream, {dialect}")
+    with StubRetailerServer(delay=args.delay) as server:
+        baseline = None
+        for round_number, processes in enumerate(int(p) for p in args.processes.split(",")):
+            elapsed, used = run_round(args, processes, server, round_number)
+            rate = args.jobs / elapsed
+            baseline = baseline or rate
+            print(f"  {processes:2d} processes   {elapsed:7.2f} s   {rate:8,.1f} jobs/s   "
+                  f"{rate / baseline:5.2f}x   ({used} workers leased jobs, all jobs checked)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_pagination.py
+"""
+Deep-page latency of GET /api/products: OFFSET vs keyset cursors.
+
+Seeds --products rows, walks the listing with cursors to collect the token
+for every page, then times fetching a shallow and a deep page both ways:
+?skip= (ORDER BY ... OFFSET) and ?cursor=. A filtered listing
+(?retailer=) is timed the same way.
+
+Usage:
+    python -m benchmarks.bench_pagination --products 500000 --limit 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=50, help="page size")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    import database
+    import main as app_module
+    from models import Product
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        batch = []
+        for i in range(args.products):
+            updated = now - timedelta(seconds=i // 3)
+            batch.append({
+                'url': f"https://www.amazon.com/dp/B{i:09d}", 'marketplace': "amazon.com", 'asin': f"B{i:09d}",
+                'name': f"Product {i}", 'current_price': 5.0 + i % 500, 'lowest_price': 5.0, 'highest_price': 505.0,
+                'currency': "USD" if i % 4 else "EUR", 'retailer': "Amazon" if i % 2 else "Other",
+                'created_at': updated, 'updated_at': updated, 'last_checked_at': updated,
+                'next_check_at': updated, 'unchanged_checks': 0
+            })
+            if len(batch) == 50_000:
+                db.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Product), batch)
+        db.commit()
+
+    client = TestClient(app_module.app)
+
+    def cursors(params):
+        """Cursor for every page of the listing, in order (None for the first)"""
+        tokens = [None]
+        while True:
+            response = client.get("/api/products", params={**params, "limit": args.limit, "cursor": tokens[-1]})
+            token = response.headers.get("X-Next-Cursor")
+            if not token:
+                return tokens
+            tokens.append(token)
+
+    def timed(params):
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            response = client.get("/api/products", params={**params, "limit": args.limit})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        return statistics.median(latencies) * 1000
+
+    print(f"{args.products} products, {args.limit} per page")
+    print(f"{'listing':<20} {'page':>8} {'skip ms':>10} {'cursor ms':>10}")
+
+    tokens = cursors({})
+    for page in (1, len(tokens) // 2, len(tokens)):
+        skip_ms = timed({"skip": (page - 1) * args.limit})
+        cursor_ms = timed({"cursor": tokens[page - 1]})
+        print(f"{'all':<20} {page:8d} {skip_ms:10.2f} {cursor_ms:10.2f}")
+
+    tokens = cursors({"retailer": "Amazon"})
+    for page in (1, len(tokens)):
+        cursor_ms = timed({"retailer": "Amazon", "cursor": tokens[page - 1]})
+        print(f"{'retailer=Amazon':<20} {page:8d} {'-':>10} {cursor_ms:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
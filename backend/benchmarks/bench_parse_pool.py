@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_parse_pool.py
+"""
+Parse pool scaling benchmark.
+
+Feeds inflated fixture pages through ParsePool with 1/2/4/8 workers (and
+in-process parsing as the baseline) from concurrent asyncio tasks, the way
+the batch and refresh paths do, and reports pages/second and speedup.
+Results are checked against the expected corpus output.
+
+Usage:
+    python -m benchmarks.bench_parse_pool --pages 200 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from parse_pool import ParsePool
+from scraper import AmazonScraper, SCRAPER_PARSER
+from benchmarks.corpus import inflate, load_expected, load_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-kb", type=int, default=1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--parser", default=SCRAPER_PARSER)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    expected = load_expected()
+    corpus = [(name, inflate(page, args.page_kb)) for name, page in load_pages().items()]
+    jobs = [corpus[i % len(corpus)] for i in range(args.pages)]
+
+    def check(results):
+        for (name, _), result in zip(jobs, results):
+            if result:
+                result.pop("url", None)
+            assert result == expected[name], f"{name}: {result} != {expected[name]}"
+
+    print(f"{args.pages} pages, ~{args.page_kb} KB each, parser={args.parser}, {os.cpu_count()} CPUs")
+
+    scraper = AmazonScraper(parser=args.parser)
+    started = time.perf_counter()
+    check([scraper.parse(page, name) for name, page in jobs])
+    baseline = args.pages / (time.perf_counter() - started)
+    print(f"in-process   {baseline:8.1f} pages/s")
+
+    for workers in args.workers:
+        pool = ParsePool(workers, parser=args.parser)
+        pool.warm()
+
+        async def run():
+            return await asyncio.gather(*(pool.parse(page, name) for name, page in jobs))
+
+        started = time.perf_counter()
+        check(asyncio.run(run()))
+        rate = args.pages / (time.perf_counter() - started)
+        pool.shutdown()
+        print(f"{workers} workers    {rate:8.1f} pages/s   x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/benchmarks/bench_parsers.py
+"""
+Parser backend benchmark and parity check.
+
+Runs AmazonScraper.parse over the fixture corpus with every parser
+backend, verifies each produces exactly the expected result, and reports
+pages/second per backend on pages inflated to --page-kb.
+
+Usage:
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --page-kb 2048 --rounds 5
+    python -m benchmarks.bench_parsers --write-expected   # regenerate with html.parser
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from scraper import AmazonScraper, PARSER_BACKENDS, HAS_LXML
+from benchmarks.corpus import EXPECTED_PATH, inflate, load_expected, load_pages
+
+
+def parse(scraper: AmazonScraper, page: bytes):
+    result = scraper.parse(page, "fixture")
+    if result:
+        result.pop("url", None)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-kb", type=int, default=1024, help="inflate pages to this size (0 = as checked in)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--write-expected", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    pages = load_pages()
+
+    if args.write_expected:
+        reference = AmazonScraper(parser="html.parser")
+        expected = {name: parse(reference, page) for name, page in pages.items()}
+        with open(EXPECTED_PATH, "w", encoding="utf-8") as f:
+            json.dump(expected, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {len(expected)} expected results to {EXPECTED_PATH}")
+        return
+
+    expected = load_expected()
+    inflated = {name: inflate(page, args.page_kb) for name, page in pages.items()}
+    backends = [b for b in PARSER_BACKENDS if b != "lxml" or HAS_LXML]
+
+    failures = 0
+    print(f"{len(pages)} pages, ~{args.page_kb} KB each, {args.rounds} rounds")
+    for backend in backends:
+        scraper = AmazonScraper(parser=backend)
+        for name in pages:
+            for variant in (pages[name], inflated[name]):
+                result = parse(scraper, variant)
+                if result != expected[name]:
+                    failures += 1
+                    print(f"  MISMATCH [{backend}] {name}: {result} != {expected[name]}")
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for page in inflated.values():
+                scraper.parse(page, "fixture")
+        elapsed = time.perf_counter() - started
+        count = args.rounds * len(inflated)
+        print(f"{backend:<12} {count / elapsed:8.1f} pages/s   {elapsed / count * 1000:8.2f} ms/page")
+
+    if failures:
+        print(f"{failures} parity failures")
+        sys.exit(1)
+    print("all backends match expected results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# backend/benchmarks/bench_price_engine.py
+"""
+Price engine correctness suite and microbenchmark.
+
+Checks AmazonScraper's price text parsing, currency symbol lookup and the
+Strategy 3 page scan against fixtures/price_cases.json (every symbol and
+code in CURRENCY_MAP, plus locale formats and scan texts that must not
+match), then times them against the previous implementation.
+
+Usage:
+    python -m benchmarks.bench_price_engine
+    python -m benchmarks.bench_price_engine --iterations 20000
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from scraper import AmazonScraper
+from benchmarks.corpus import FIXTURES_DIR
+
+CASES_PATH = os.path.join(FIXTURES_DIR, "price_cases.json")
+
+# ---- previous implementation, kept for comparison ----
+
+_LEGACY_SCAN_PATTERNS = [
+    (r'(Rs\. ? )\s*([\d,]+\.?\d{0,2})', 'LKR'),
+    (r'(රු\.?)\s*([\d,]+\.?\d{0,2})', 'LKR'),
+    (r'\$\s*([\d,]+\.?\d{0,2})', 'USD'),
+    (r'€\s*([\d,]+\. ?\d{0,2})', 'EUR'),
+    (r'£\s*([\d,]+\.?\d{0,2})', 'GBP'),
+    (r'₹\s*([\d,]+\.?\d{0,2})', 'INR'),
+]
+
+
+def legacy_parse_price_text(text):
+    currency = 'USD'
+    for symbol in sorted(AmazonScraper.CURRENCY_MAP.keys(), key=len, reverse=True):
+        if symbol in text:
+            currency = AmazonScraper.CURRENCY_MAP[symbol]
+            text = text.replace(symbol, '').strip()
+            break
+    match = re.search(r'([\d,]+\.?\d{0,2})', text)
+    if match:
+        try:
+            return float(match.group(1).replace(',', '')), currency
+        except ValueError:
+            pass
+    return None, currency
+
+
+def legacy_scan(text):
+    for pattern, currency_code in _LEGACY_SCAN_PATTERNS:
+        matches = re.findall(pattern, text)
+        if matches:
+            try:
+                amount = matches[0][1] if isinstance(matches[0], tuple) else matches[0]
+                return float(amount.replace(',', '')), currency_code
+            except (ValueError, IndexError):
+                continue
+    return None, None
+
+
+# ---- checks ----
+
+def check(cases) -> int:
+    scraper = AmazonScraper()
+    engine = scraper.PRICE_ENGINE
+    failures = 0
+
+    def expect(kind, given, result, wanted):
+        nonlocal failures
+        if result != wanted:
+            failures += 1
+            print(f"  FAIL {kind} {given!r}: got {result}, expected {wanted}")
+
+    for case in cases["price_text"]:
+        expect("price_text", case["text"], scraper._parse_price_text(case["text"]), (case["price"], case["currency"]))
+    for case in cases["symbol"]:
+        expect("symbol", case["symbol"], engine.currency_code(case["symbol"]), case["currency"])
+    for case in cases["scan"]:
+        expect("scan", case["text"], engine.scan(case["text"]), (case["price"], case["currency"]))
+
+    missing = set(AmazonScraper.CURRENCY_MAP) - {case["symbol"] for case in cases["symbol"]}
+    if missing:
+        failures += len(missing)
+        print(f"  FAIL no symbol cases for {sorted(missing)}")
+    return failures
+
+
+def timed(fn, args, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for arg in args:
+            fn(arg)
+    return (time.perf_counter() - started) / (iterations * len(args)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--page-kb", type=int, default=256, help="size of the free text for the scan benchmark")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with open(CASES_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    failures = check(cases)
+    total = sum(len(group) for group in cases.values())
+    print(f"correctness: {total - failures}/{total} cases pass")
+
+    scraper = AmazonScraper()
+    texts = [case["text"] for case in cases["price_text"]]
+    # Page text with the price near the top (the usual shape of a product page,
+    # where the scan stops early) and with the only price at the very end (the
+    # worst case: every byte is examined)
+    filler = "Customers who viewed this item also viewed similar products. " * (args.page_kb * 16)
+    early_text = "Deal of the day. Price: $44.95 " + filler + " Bundle: £12.00"
+    late_text = filler + "Price: $44.95"
+    page_iterations = max(1, args.iterations // 200)
+
+    print(f"{'operation':<22} {'legacy us':>10} {'engine us':>10} {'speedup':>8}")
+    for name, legacy, engine, inputs, iterations in [
+        ("parse price text", legacy_parse_price_text, scraper._parse_price_text, texts, args.iterations),
+        (f"scan {args.page_kb} KB, early", legacy_scan, scraper.PRICE_ENGINE.scan, [early_text], page_iterations),
+        (f"scan {args.page_kb} KB, late", legacy_scan, scraper.PRICE_ENGINE.scan, [late_text], page_iterations),
+    ]:
+        before = timed(legacy, inputs, iterations)
+        after = timed(engine, inputs, iterations)
+        print(f"{name:<22} {before:10.2f} {after:10.2f} {before / after:7.1f}x")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# backend/benchmarks/bench_product_history.py
+"""
+Product detail latency with a long price history.
+
+Seeds one product with --rows history intervals, then times
+GET /api/products/{id}, which embeds only the most recent window, against
+the previous handler, which loaded and serialized the full
+product.price_history relationship (copied below and mounted on a temporary
+route). Also times paging backwards through /history with ?before=.
+
+Usage:
+    python -m benchmarks.bench_product_history --rows 1000000
+    python -m benchmarks.bench_product_history --rows 100000 --repeat 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="history intervals for the product")
+    parser.add_argument("--repeat", type=int, default=10, help="timed requests per endpoint")
+    parser.add_argument("--legacy-repeat", type=int, default=2, help="timed requests for the previous handler")
+    parser.add_argument("--pages", type=int, default=20, help="history pages to walk backwards")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'product_history.db')}"
+
+    from fastapi import Depends, HTTPException
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    import crud
+    import database
+    import schemas
+    import main as app_module
+    from models import Product, PriceHistory
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    # ---- seed ----
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        product = Product(
+            url="https://www.amazon.com/dp/B000000001", marketplace="amazon.com", asin="B000000001",
+            name="Long history", current_price=10.0, lowest_price=5.0, highest_price=15.0,
+            currency="USD", retailer="Amazon", created_at=now, updated_at=now, last_checked_at=now,
+            next_check_at=now, unchanged_checks=0
+        )
+        db.add(product)
+        db.commit()
+        product_id = product.id
+
+        first = now - timedelta(minutes=10 * args.rows)
+        batch = []
+        for i in range(args.rows):
+            seen = first + timedelta(minutes=10 * i)
+            batch.append({
+                'product_id': product_id, 'price': 5.0 + (i % 1000) / 100, 'currency': 'USD',
+                'first_seen_at': seen, 'last_seen_at': seen + timedelta(minutes=5)
+            })
+            if len(batch) == 50_000:
+                db.execute(insert(PriceHistory), batch)
+                batch = []
+        if batch:
+            db.execute(insert(PriceHistory), batch)
+        db.commit()
+    seed_seconds = time.perf_counter() - started
+
+    # ---- previous implementation: full relationship, sorted in Python ----
+
+    @app_module.app.get("/legacy/products/{product_id}")
+    def legacy_get_product(product_id: int, db: Session = Depends(app_module.get_db)):
+        product = crud.get_product_by_id(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        intervals = sorted(product.price_history, key=lambda h: h.first_seen_at)
+        return schemas.ProductWithHistoryResponse(
+            **schemas.ProductResponse.model_validate(product).model_dump(),
+            price_history=crud.price_points(intervals)
+        )
+
+    client = TestClient(app_module.app)
+
+    def timed(path, repeat, params=None):
+        latencies, size = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(path, params=params)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+            size = len(response.content)
+        return latencies, size, response
+
+    results = []
+    latencies, size, _ = timed(f"/api/products/{product_id}", args.repeat)
+    results.append(("GET /api/products/{id}", latencies, size))
+    latencies, size, _ = timed(f"/api/products/{product_id}", args.repeat, {"history_limit": 1000})
+    results.append(("  ?history_limit=1000", latencies, size))
+
+    page_latencies, page_size, before = [], 0, None
+    for _ in range(args.pages):
+        params = {"limit": 100}
+        if before:
+            params["before"] = before
+        latencies, page_size, response = timed(f"/api/products/{product_id}/history", 1, params)
+        page_latencies.extend(latencies)
+        before = response.json()[-1]["recorded_at"]
+    results.append((f"/history pages (x{args.pages})", page_latencies, page_size))
+
+    latencies, size, _ = timed(f"/legacy/products/{product_id}", args.legacy_repeat)
+    results.append(("previous full history", latencies, size))
+
+    print(f"{args.rows} history intervals ({2 * args.rows} points), seeded in {seed_seconds:.1f}s")
+    print(f"{'endpoint':<28} {'p50 ms':>10} {'max ms':>10} {'bytes':>12}")
+    for name, latencies, size in results:
+        print(f"{name:<28} {statistics.median(latencies) * 1000:10.1f} {max(latencies) * 1000:10.1f} {size:12d}")
+
+
+if __name__ == "__main__":
+    main()
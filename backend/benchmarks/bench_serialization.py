@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_serialization.py
+"""
+List endpoint serialization: Pydantic path vs the FAST_JSON_RESPONSES path.
+
+Seeds --products products and a long history for one of them, then for
+/api/products?limit=N and /api/products/{id}/history (raw and hourly)
+checks that both paths return identical bytes and reports p50/p99
+latency and peak traced memory per request. The fast path is measured
+with orjson and with the stdlib json fallback. The response cache is off
+so every request is served by the endpoint.
+
+Usage:
+    python -m benchmarks.bench_serialization --products 2000 --limit 1000
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=1000, help="page size requested")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint and path")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serialization.db')}"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    import crud
+    import database
+    import fast_json
+    import main as app_module
+    from models import Product
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+    database.Base.metadata.create_all(bind=database.engine)
+
+    # Microsecond timestamps, NULL lowest/highest prices and non-ASCII names
+    # exercise the encodings that have to match
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        db.execute(insert(Product), [{
+            'url': f"https://www.amazon.de/dp/B{i:09d}", 'marketplace': "amazon.de", 'asin': f"B{i:09d}",
+            'name': f"Kaffeemühle «{i}»", 'current_price': 10.0 + i % 700 / 7, 'lowest_price': None if i % 5 else 9.5,
+            'highest_price': 99.99, 'currency': "EUR", 'retailer': "Amazon",
+            'created_at': now - timedelta(seconds=i, microseconds=i * 7), 'updated_at': now - timedelta(seconds=i),
+            'last_checked_at': now, 'next_check_at': now, 'unchanged_checks': 0
+        } for i in range(args.products)])
+        crud.append_price_observations(db, [
+            (1, 10.0 + i % 13, "EUR", now - timedelta(minutes=20 * (5000 - i), microseconds=i))
+            for i in range(5000)
+        ])
+        db.commit()
+
+    client = TestClient(app_module.app)
+    endpoints = [
+        ("/api/products", {"limit": args.limit}),
+        ("/api/products/1/history", {"limit": args.limit}),
+        ("/api/products/1/history", {"limit": args.limit, "resolution": "hour"}),
+    ]
+    modes = [("pydantic", False, fast_json.orjson), ("fast, orjson", True, fast_json.orjson), ("fast, json", True, None)]
+
+    def measure(path, params):
+        client.get(path, params=params)
+        latencies = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            response = client.get(path, params=params)
+            latencies.append(time.perf_counter() - started)
+        tracemalloc.start()
+        client.get(path, params=params)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        latencies.sort()
+        return response, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], peak
+
+    print(f"{args.products} products, limit={args.limit}, {args.requests} requests each")
+    print(f"{'endpoint':<42} {'path':<14} {'p50 ms':>8} {'p99 ms':>8} {'peak KB':>9}")
+    for path, params in endpoints:
+        label = path + ("?resolution=" + params["resolution"] if "resolution" in params else "")
+        reference = None
+        for name, enabled, encoder in modes:
+            app_module.fast_json.FAST_JSON_RESPONSES = enabled
+            fast_json.orjson = encoder
+            response, p50, p99, peak = measure(path, params)
+            assert response.status_code == 200, response.text
+            if reference is None:
+                reference = response
+            else:
+                assert response.content == reference.content, f"{name} output differs for {label}"
+                assert response.headers.get("x-next-cursor") == reference.headers.get("x-next-cursor")
+            print(f"{label:<42} {name:<14} {p50 * 1000:8.2f} {p99 * 1000:8.2f} {peak / 1024:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
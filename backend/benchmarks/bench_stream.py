@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_stream.py
+"""
+Fan-out cost of the /api/stream hub.
+
+Connects --subscribers in-process stream consumers (--followers of them
+following one product each, the rest following everything), then
+changes the price of each of --products products once, in transactions
+of --batch products, and times until every consumer has every event it
+should get (an updated and a price event per product). Reports delivery latency, events and frames per
+second, database reads, and RSS per subscriber.
+
+For comparison, the same clients polling /api/products every
+--poll-seconds would run subscribers / poll-seconds queries per second.
+
+Usage:
+    python -m benchmarks.bench_stream
+    python -m benchmarks.bench_stream --subscribers 10000 --products 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+
+async def consume(stream, received, index):
+    async for chunk in stream:
+        received[index] += len(chunk)
+
+
+async def run(args):
+    import crud
+    import database
+    import models  # noqa: F401 (registers the tables)
+    from benchmarks.bench_export import rss_mb
+    from stream import StreamHub
+
+    database.engine.echo = False
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        for i in range(args.products):
+            crud.create_product(db, f"https://www.amazon.com/dp/B{i:09d}", f"Product {i}", 100.0, "USD", "Amazon")
+
+    hub = StreamHub(
+        client_buffer=args.products * 2, replay_size=args.products * 2, max_subscribers=args.subscribers, heartbeat=3600
+    )
+    hub.start()
+    loads = []
+    load = hub._load
+    hub._load = lambda product_ids: loads.append(len(product_ids)) or load(product_ids)
+    before = rss_mb()
+    received = [0] * args.subscribers
+    tasks = []
+    for index in range(args.subscribers):
+        product_ids = [index % args.products + 1] if index < args.followers else None
+        tasks.append(asyncio.create_task(consume(hub.subscribe(product_ids), received, index)))
+    await asyncio.sleep(0.1)
+    per_subscriber_kb = (rss_mb() - before) * 1024 / args.subscribers
+    connected = received[:]
+
+    def write():
+        with database.SessionLocal() as db:
+            products = {product.id: product for product in db.query(models.Product)}
+            for start in range(1, args.products + 1, args.batch):
+                batch = range(start, min(start + args.batch, args.products + 1))
+                for product_id in batch:
+                    product = products[product_id]
+                    product.current_price = 90.0
+                    product.updated_at = product.last_checked_at = datetime.utcnow()
+                db.commit()
+                crud.notify_write("updated", batch)
+
+    started = time.perf_counter()
+    await asyncio.to_thread(write)
+    # An updated and a price event per product
+    while hub.stats["published"] < 2 * args.products:
+        await asyncio.sleep(0.001)
+    everything = sum(len(event.frame) for event in hub.replay)
+    per_product = {}
+    for event in hub.replay:
+        per_product[event.product_id] = per_product.get(event.product_id, 0) + len(event.frame)
+    expected = [
+        connected[index] + (per_product[index % args.products + 1] if index < args.followers else everything)
+        for index in range(args.subscribers)
+    ]
+    while received != expected:
+        await asyncio.sleep(0.001)
+        if time.perf_counter() - started > 120:
+            raise AssertionError("events missing")
+    elapsed = time.perf_counter() - started
+
+    await hub.stop()
+    await asyncio.gather(*tasks)
+    events = hub.stats["published"]
+    frames = args.followers * 2 + (args.subscribers - args.followers) * events
+    print(f"{args.subscribers:,} subscribers ({args.followers:,} following one product), "
+          f"{args.products:,} price changes in transactions of {args.batch}")
+    print(f"  all delivered in     {elapsed * 1000:9.1f} ms")
+    print(f"  events published     {events:9,}   {events / elapsed:12,.0f}/s")
+    print(f"  frames delivered     {frames:9,}   {frames / elapsed:12,.0f}/s")
+    print(f"  lagged / resets      {hub.stats['lagged']:9,}")
+    print(f"  memory               {per_subscriber_kb:9.1f} KB RSS per subscriber")
+    print(f"  stream DB reads      {len(loads):9,}   (one product query per publisher pass)")
+    print(f"  polling instead      {args.subscribers / args.poll_seconds:9,.0f} /api/products queries/s "
+          f"at one poll per {args.poll_seconds:g} s per client")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--followers", type=int, default=1000, help="subscribers following a single product")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=50, help="products written per transaction")
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stream.db')}"
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# backend/benchmarks/bench_streaming.py
+"""
+Streaming fetch benchmark.
+
+Serves the inflated fixture corpus from the stub retailer server at a
+capped bandwidth and scrapes every page twice: once with the full-page
+download and once with the streaming early-exit fetch. Reports bytes on
+the wire and time-to-result per page, and checks both modes return the
+expected result.
+
+Usage:
+    python -m benchmarks.bench_streaming --page-kb 1024 --bandwidth-kb 1024
+    python -m benchmarks.bench_streaming --no-compress
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from scraper import AmazonScraper
+from benchmarks.corpus import inflate, load_expected, load_pages
+from benchmarks.stub_server import StubRetailerServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-kb", type=int, default=1024)
+    parser.add_argument("--bandwidth-kb", type=float, default=1024, help="server bandwidth in KB/s (0 = unthrottled)")
+    parser.add_argument("--no-compress", action="store_true", help="serve identity-encoded pages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    expected = load_expected()
+    pages = {name: inflate(page, args.page_kb) for name, page in load_pages().items()}
+
+    async def scrape(scraper: AmazonScraper, url: str):
+        try:
+            return await scraper.scrape_async(url)
+        except Exception:
+            return None
+
+    async def run(server: StubRetailerServer):
+        modes = {"full": AmazonScraper(streaming=False), "streaming": AmazonScraper(streaming=True)}
+        totals = {mode: [0, 0.0] for mode in modes}
+        print(f"{'page':<36} {'mode':<10} {'wire KB':>9} {'ms':>8}  early  ok")
+        for name in pages:
+            for mode, scraper in modes.items():
+                sent_before = server.httpd.bytes_sent
+                started = time.perf_counter()
+                result = await scrape(scraper, server.product_url(name))
+                elapsed = time.perf_counter() - started
+                await asyncio.sleep(0.05)
+                wire = server.httpd.bytes_sent - sent_before
+
+                fetch = result.pop("fetch", {}) if result else {}
+                if fetch.get("early_exit"):
+                    # The server keeps writing into the socket buffer after we hang up,
+                    # so use the client's count of bytes actually received
+                    wire = fetch["bytes_transferred"]
+                if result:
+                    result.pop("url", None)
+                ok = result == expected[name]
+                totals[mode][0] += wire
+                totals[mode][1] += elapsed
+                print(f"{name:<36} {mode:<10} {wire / 1024:9.1f} {elapsed * 1000:8.1f}  "
+                      f"{'yes' if fetch.get('early_exit') else 'no ':<5}  {'ok' if ok else 'MISMATCH'}")
+        await AmazonScraper.close_async_client()
+        return totals
+
+    with StubRetailerServer(pages=pages, compress=not args.no_compress, bandwidth=args.bandwidth_kb * 1024) as server:
+        totals = asyncio.run(run(server))
+
+    print()
+    full_bytes, full_time = totals["full"]
+    for mode, (wire, elapsed) in totals.items():
+        print(f"{mode:<10} total {wire / 1024:10.1f} KB on the wire ({100 * wire / full_bytes:5.1f}%), "
+              f"{elapsed / len(pages) * 1000:8.1f} ms/page ({100 * elapsed / full_time:5.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
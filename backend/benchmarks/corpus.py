@@ -0,0 +1,78 @@
+# backend/benchmarks/corpus.py
+"""
+Checked-in corpus of Amazon product pages used by the benchmarks.
+
+Pages live in fixtures/pages/*.html, and fixtures/expected.json holds the
+result the reference html.parser backend produces for each of them. The
+fixture pages are small; inflate() pads them to real-world size with
+review markup and inline CSS, the two things that make up most of a real
+product page.
+"""
+import json
+import os
+import random
+from typing import Dict, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+PAGES_DIR = os.path.join(FIXTURES_DIR, "pages")
+EXPECTED_PATH = os.path.join(FIXTURES_DIR, "expected.json")
+
+_REVIEW = (
+    '<div data-hook="review" class="a-section review aok-relative">'
+    '<div class="a-row a-spacing-mini"><span class="a-profile-name">Customer {i}</span></div>'
+    '<div class="a-row"><i class="a-icon a-icon-star a-star-{stars}"><span class="a-icon-alt">{stars}.0 out of 5 stars</span></i>'
+    '<span data-hook="review-title" class="a-size-base review-title">Works as described, would buy again</span></div>'
+    '<span data-hook="review-date" class="a-size-base a-color-secondary">Reviewed on {day} March 2025</span>'
+    '<div class="a-row review-data"><span data-hook="review-body" class="a-size-base review-text">'
+    '<span>{text}</span></span></div>'
+    '<div class="a-row"><span class="cr-vote-text">{votes} people found this helpful</span></div></div>\n'
+)
+_WORDS = (
+    "arrived quickly well packed setup took couple minutes worked without problems since battery "
+    "life advertised build feels solid sound quality great comfortable wear daily commute noise "
+    "cancelling impressive price point replaced older model returned first unit faulty support "
+    "helpful charging case small pocket connection drops occasionally firmware update fixed it"
+).split()
+_CSS = ".a-section-{i}{{margin-bottom:{m}px;padding:0 {p}px}}.a-row-{i} .a-col-left{{float:left;width:{w}%}}\n"
+
+
+def load_pages() -> Dict[str, bytes]:
+    pages = {}
+    for filename in sorted(os.listdir(PAGES_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(PAGES_DIR, filename), "rb") as f:
+                pages[filename[:-5]] = f.read()
+    return pages
+
+
+def load_expected() -> Dict[str, Optional[dict]]:
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def inflate(page: bytes, size_kb: int) -> bytes:
+    """Pad a page to roughly size_kb: a third inline CSS in <head>, the rest reviews"""
+    if size_kb <= 0:
+        return page
+    target = size_kb * 1024 - len(page)
+    # Seeded word salad so pages compress like real ones rather than like repeated text
+    rng = random.Random(size_kb)
+    css, reviews = [], []
+    css_size = review_size = 0
+    i = 0
+    while css_size < target // 3:
+        chunk = _CSS.format(i=i, m=i % 24, p=i % 16, w=30 + i % 40)
+        css.append(chunk)
+        css_size += len(chunk)
+        i += 1
+    while review_size < target - css_size:
+        text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 80))).capitalize() + "."
+        chunk = _REVIEW.format(i=i, stars=1 + i % 5, day=1 + i % 28, votes=i % 97, text=text)
+        reviews.append(chunk)
+        review_size += len(chunk)
+        i += 1
+
+    html = page.decode("utf-8")
+    html = html.replace("</head>", "<style>\n" + "".join(css) + "</style>\n</head>", 1)
+    html = html.replace('<div id="navFooter">', '<div id="reviewsMedley">\n' + "".join(reviews) + '</div>\n<div id="navFooter">', 1)
+    return html.encode("utf-8")
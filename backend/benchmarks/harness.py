@@ -0,0 +1,482 @@
+# backend/benchmarks/harness.py
+"""
+Offline end-to-end benchmark harness.
+
+Runs the scenarios below against the fixture corpus (benchmarks/corpus.py)
+and the stub retailer server, without touching the network, and writes
+one JSON report so runs before and after a change can be compared.
+
+Scenarios:
+    parse   AmazonScraper.parse over the corpus pages inflated to --page-kb,
+            checked against fixtures/expected.json
+    scrape  AmazonScraper.scrape_async of corpus pages from the stub server
+    track   POST /api/track end to end (scrape, parse, upsert, history) on
+            an empty database
+    read    GET /api/products (first page, and every page by cursor),
+            /api/products/{id}, /history (raw and daily) and /api/analytics
+            over --products products with --history price points each
+
+The stub server answers after --latency-ms plus a uniform 0..--jitter-ms,
+and answers --error-rate of requests with a 503, so the scrape and track
+numbers include upstream variance and failure handling. Every page maps to
+a corpus page, so each scrape result is checked too.
+
+Each result has count, errors, seconds, throughput (per second), latency
+p50/p95/p99/max in ms, CPU seconds, and peak RSS of the process (the stub
+server and in-process client included). The report also records the git
+commit, Python, platform and the performance-relevant environment.
+
+Usage:
+    python -m benchmarks.harness --output before.json
+    python -m benchmarks.harness --output after.json --compare before.json
+    python -m benchmarks.harness --scenarios scrape,track --latency-ms 200 --jitter-ms 300 --error-rate 0.05
+    python -m benchmarks.harness --quick --compare before.json --max-regression 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.bench_export import PeakRSS, rss_mb
+from benchmarks.corpus import inflate, load_expected, load_pages
+
+SCENARIOS = ("parse", "scrape", "track", "read")
+
+# Environment variables recorded with each report, by prefix
+ENV_PREFIXES = (
+    "SCRAPER_", "PARSE_POOL_", "SCRAPE_CACHE_", "RESPONSE_CACHE_", "FAST_JSON_", "HISTORY_", "DB_",
+    "METRICS_", "SQL_METRICS_", "ANALYTICS_", "ALERT", "STREAM_",
+)
+
+
+# ---- measuring ----
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+@contextmanager
+def measured(result: Dict[str, Any]):
+    """Fill result with seconds, CPU seconds and peak RSS of the block"""
+    started, cpu = time.perf_counter(), time.process_time()
+    before = rss_mb()
+    with PeakRSS() as peak:
+        yield result
+    result["seconds"] = time.perf_counter() - started
+    result["cpu_seconds"] = time.process_time() - cpu
+    result["peak_rss_mb"] = round(peak.peak, 1)
+    result["rss_growth_mb"] = round(peak.peak - before, 1)
+
+
+def summarize(result: Dict[str, Any], latencies: List[float], errors: int, **extra) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    summary = {
+        "count": count,
+        "errors": errors,
+        "seconds": round(result["seconds"], 4),
+        "throughput": round(count / result["seconds"], 2) if result["seconds"] else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            "mean": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        },
+        "cpu_seconds": round(result["cpu_seconds"], 3),
+        "peak_rss_mb": result["peak_rss_mb"],
+        "rss_growth_mb": result["rss_growth_mb"],
+    }
+    summary.update(extra)
+    return summary
+
+
+async def drive(operation: Callable[[int], Awaitable[bool]], count: int, concurrency: int) -> Tuple[List[float], int]:
+    """Run operation(0..count-1), concurrency at a time; (latencies, failures)"""
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for index in indexes:
+            started = time.perf_counter()
+            try:
+                ok = await operation(index)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    return latencies, errors
+
+
+# ---- corpus ----
+
+def corpus(page_kb: int, readable_only: bool = False) -> Tuple[List[str], Dict[str, bytes], Dict[str, Optional[dict]]]:
+    """Corpus page names, inflated pages and expected results"""
+    pages = load_pages()
+    expected = load_expected()
+    names = [name for name in pages if not readable_only or expected[name] is not None]
+    return names, {name: inflate(pages[name], page_kb) for name in names}, expected
+
+
+def serve_corpus(server, prefix: str, count: int, names: List[str], pages: Dict[str, bytes]) -> List[Tuple[str, str]]:
+    """Register count product keys on the stub server, cycling over the corpus; (url, page name) each"""
+    served = []
+    for i in range(count):
+        key, name = f"{prefix}{i:09d}", names[i % len(names)]
+        server.httpd.pages[key] = pages[name]
+        served.append((server.product_url(key), name))
+    return served
+
+
+def same_product(result: Optional[dict], expected: Optional[dict]) -> bool:
+    if result is None or expected is None:
+        return result is None and expected is None
+    # scrape results also carry url and fetch statistics
+    return {key: result.get(key) for key in expected} == expected
+
+
+# ---- scenarios ----
+
+def scenario_parse(args, server) -> Dict[str, Any]:
+    from metrics import PRICE_STRATEGY_TOTAL
+    from scraper import AmazonScraper
+
+    names, pages, expected = corpus(args.page_kb)
+    scraper = AmazonScraper()
+    strategies_before = dict(PRICE_STRATEGY_TOTAL.values)
+    latencies, mismatches = [], 0
+    result: Dict[str, Any] = {}
+    with measured(result):
+        for _ in range(args.parse_rounds):
+            for name in names:
+                started = time.perf_counter()
+                parsed = scraper.parse(pages[name], "https://www.amazon.com/dp/fixture")
+                latencies.append(time.perf_counter() - started)
+                mismatches += not same_product(parsed, expected[name])
+    strategies = {
+        labels[0]: value - strategies_before.get(labels, 0) for labels, value in PRICE_STRATEGY_TOTAL.values.items()
+    }
+    megabytes = args.parse_rounds * sum(len(page) for page in pages.values()) / 2**20
+    return {"parse": summarize(
+        result, latencies, mismatches,
+        pages=len(names), page_kb=args.page_kb, parser=scraper.parser,
+        mb_per_second=round(megabytes / result["seconds"], 2),
+        strategies={name: count for name, count in strategies.items() if count},
+    )}
+
+
+def scenario_scrape(args, server) -> Dict[str, Any]:
+    from parse_pool import get_parse_pool
+    from scraper import AmazonScraper
+
+    names, pages, expected = corpus(args.page_kb)
+    served = serve_corpus(server, "S", args.requests, names, pages)
+    hits, upstream_errors = server.httpd.hits, server.httpd.errors
+    mismatches = 0
+
+    async def run():
+        nonlocal mismatches
+        scraper = AmazonScraper(parse_pool=get_parse_pool())
+
+        async def scrape(index: int) -> bool:
+            nonlocal mismatches
+            url, name = served[index]
+            if same_product(await scraper.scrape_async(url), expected[name]):
+                return True
+            mismatches += 1
+            return False
+
+        try:
+            return await drive(scrape, args.requests, args.concurrency)
+        finally:
+            await AmazonScraper.close_async_client()
+
+    result: Dict[str, Any] = {}
+    with measured(result):
+        latencies, errors = asyncio.run(run())
+    return {"scrape": summarize(
+        result, latencies, errors,
+        concurrency=args.concurrency, mismatches=mismatches,
+        upstream_requests=server.httpd.hits - hits, upstream_errors=server.httpd.errors - upstream_errors,
+    )}
+
+
+def scenario_track(args, server) -> Dict[str, Any]:
+    import httpx
+
+    import main as app_module
+
+    names, pages, _ = corpus(args.page_kb, readable_only=True)
+    served = serve_corpus(server, "T", args.requests, names, pages)
+    statuses: Dict[str, int] = {}
+
+    async def run():
+        async with app_module.lifespan(app_module.app):
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=None) as client:
+                async def track(index: int) -> bool:
+                    response = await client.post("/api/track", json={"url": served[index][0]})
+                    statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                    return response.status_code == 200
+
+                return await drive(track, args.requests, args.concurrency)
+
+    result: Dict[str, Any] = {}
+    with measured(result):
+        latencies, errors = asyncio.run(run())
+    return {"track": summarize(result, latencies, errors, concurrency=args.concurrency, statuses=statuses)}
+
+
+def seed_products(args) -> List[int]:
+    """Insert --products products with --history price intervals each (and their rollups)"""
+    from sqlalchemy import func, insert
+
+    import crud
+    import database
+    from models import PriceHistory, Product
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        first = (db.query(func.max(Product.id)).scalar() or 0) + 1
+        ids = list(range(first, first + args.products))
+        for product_id in ids:
+            price = round(rng.uniform(5, 2000), 2)
+            points = []
+            for i in range(args.history):
+                seen = now - timedelta(hours=(args.history - i) * rng.uniform(2, 10))
+                price = round(max(1.0, price * rng.uniform(0.95, 1.05)), 2)
+                points.append((price, seen))
+            prices = [price for price, _ in points]
+            db.execute(insert(Product), [{
+                "id": product_id, "url": f"https://www.amazon.com/dp/R{product_id:09d}",
+                "marketplace": "amazon.com", "asin": f"R{product_id:09d}", "name": f"Seeded product {product_id}",
+                "current_price": prices[-1], "lowest_price": min(prices), "highest_price": max(prices),
+                "currency": "USD", "retailer": "Amazon", "created_at": points[0][1], "updated_at": points[-1][1],
+                "last_checked_at": now, "next_check_at": now + timedelta(hours=6), "unchanged_checks": 0,
+            }])
+            db.execute(insert(PriceHistory), [
+                {"product_id": product_id, "price": price, "currency": "USD",
+                 "first_seen_at": seen, "last_seen_at": seen}
+                for price, seen in points
+            ])
+            crud.record_rollups(db, [(product_id, price, "USD", seen) for price, seen in points])
+        db.commit()
+    return ids
+
+
+def scenario_read(args, server) -> Dict[str, Any]:
+    import httpx
+
+    import main as app_module
+    from response_cache import get_response_cache
+
+    seeding: Dict[str, Any] = {}
+    with measured(seeding):
+        ids = seed_products(args)
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {}
+
+    async def run():
+        async with app_module.lifespan(app_module.app):
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=None) as client:
+                async def get(path: str, params: Optional[dict] = None) -> httpx.Response:
+                    return await client.get(path, params=params)
+
+                endpoints: Dict[str, Callable[[int], Awaitable[bool]]] = {
+                    "read.products": lambda _: ok(get("/api/products", {"limit": 100})),
+                    "read.product": lambda _: ok(get(f"/api/products/{rng.choice(ids)}")),
+                    "read.history": lambda _: ok(get(f"/api/products/{rng.choice(ids)}/history", {"limit": 100})),
+                    "read.history_day": lambda _: ok(get(
+                        f"/api/products/{rng.choice(ids)}/history", {"resolution": "day", "limit": 100}
+                    )),
+                    "read.analytics": lambda _: ok(get("/api/analytics", {"limit": 100, "sort": "percent_off_high"})),
+                }
+                for name, operation in endpoints.items():
+                    cache = dict(get_response_cache().stats)
+                    result: Dict[str, Any] = {}
+                    with measured(result):
+                        latencies, errors = await drive(operation, args.requests, args.concurrency)
+                    hits = get_response_cache().stats["hits"] - cache["hits"]
+                    results[name] = summarize(result, latencies, errors, concurrency=args.concurrency, cache_hits=hits)
+
+                # Every page of /api/products, one after another by cursor
+                latencies, errors, cursor = [], 0, None
+                result = {}
+                with measured(result):
+                    while True:
+                        started = time.perf_counter()
+                        response = await get("/api/products", {"limit": 100, **({"cursor": cursor} if cursor else {})})
+                        latencies.append(time.perf_counter() - started)
+                        errors += response.status_code != 200
+                        cursor = response.headers.get("X-Next-Cursor")
+                        if not cursor or response.status_code != 200:
+                            break
+                results["read.products_pages"] = summarize(result, latencies, errors)
+
+    async def ok(response: Awaitable) -> bool:
+        return (await response).status_code == 200
+
+    asyncio.run(run())
+    for summary in results.values():
+        summary["products"] = len(ids)
+        summary["history_points"] = args.history
+    results["read.products_pages"]["seed_seconds"] = round(seeding["seconds"], 2)
+    return results
+
+
+RUNNERS = {"parse": scenario_parse, "scrape": scenario_scrape, "track": scenario_track, "read": scenario_read}
+
+
+# ---- reporting ----
+
+def run_metadata(args) -> Dict[str, Any]:
+    def git(*command) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *command], capture_output=True, text=True, timeout=10, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    import database
+
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": git("rev-parse", "HEAD"),
+        "git_dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": database.engine.dialect.name,
+        "args": vars(args),
+        "env": {key: value for key, value in sorted(os.environ.items()) if key.startswith(ENV_PREFIXES)},
+    }
+
+
+def print_summary(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """Table on stderr, with changes against the baseline results if given"""
+    header = f"{'scenario':<22}{'count':>7}{'errors':>7}{'per sec':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>9}"
+    print(header, file=sys.stderr)
+    for name, summary in results.items():
+        latency = summary["latency_ms"]
+        line = (f"{name:<22}{summary['count']:>7}{summary['errors']:>7}{summary['throughput']:>11.1f}"
+                f"{latency['p50']:>10.2f}{latency['p95']:>10.2f}{latency['p99']:>10.2f}{summary['peak_rss_mb']:>9.0f}")
+        before = (baseline or {}).get(name)
+        if before:
+            line += (f"   throughput {change(before['throughput'], summary['throughput']):>7}"
+                     f"   p95 {change(before['latency_ms']['p95'], latency['p95']):>7}")
+        print(line, file=sys.stderr)
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], limit: float) -> List[str]:
+    """Scenarios whose throughput fell, or whose p95 rose, by more than limit percent"""
+    found = []
+    for name, summary in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if before["throughput"] and (before["throughput"] - summary["throughput"]) / before["throughput"] * 100 > limit:
+            found.append(f"{name}: throughput {change(before['throughput'], summary['throughput'])}")
+        p95_before = before["latency_ms"]["p95"]
+        if p95_before and (summary["latency_ms"]["p95"] - p95_before) / p95_before * 100 > limit:
+            found.append(f"{name}: p95 {change(p95_before, summary['latency_ms']['p95'])}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated, from " + ", ".join(SCENARIOS))
+    parser.add_argument("--quick", action="store_true", help="small sizes for a smoke run")
+    parser.add_argument("--requests", type=int, default=500, help="operations per scrape/track/read measurement")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--page-kb", type=int, default=256, help="inflate corpus pages to this size (0 = as checked in)")
+    parser.add_argument("--parse-rounds", type=int, default=10, help="passes over the corpus in the parse scenario")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub server base latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="extra uniform 0..jitter latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub responses that are 503s")
+    parser.add_argument("--products", type=int, default=2000, help="products seeded for the read scenario")
+    parser.add_argument("--history", type=int, default=50, help="price points per seeded product")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to compare with")
+    parser.add_argument("--max-regression", type=float, help="exit 1 if throughput or p95 is this many percent worse")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.requests, args.concurrency, args.parse_rounds = 100, 20, 2
+        args.products, args.history, args.page_kb = 200, 20, 64
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'harness.db')}"
+    import database
+    import models  # noqa: F401 (registers the tables)
+    from benchmarks.stub_server import StubRetailerServer
+
+    logging.basicConfig(level=logging.WARNING)
+    database.engine.echo = False
+    database.Base.metadata.create_all(bind=database.engine)
+
+    report = {"meta": run_metadata(args), "results": {}}
+    with StubRetailerServer(
+        delay=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, error_rate=args.error_rate, seed=args.seed
+    ) as server:
+        for name in scenarios:
+            # Injected errors and the unavailable fixture page log on every pass
+            for noisy in ("main", "scraper"):
+                logging.getLogger(noisy).setLevel(logging.CRITICAL)
+            report["results"].update(RUNNERS[name](args, server))
+            # main.py configures INFO logging when first imported
+            logging.getLogger().setLevel(logging.WARNING)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_summary(report["results"], baseline)
+
+    body = json.dumps(report, indent=2, sort_keys=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+
+    if baseline is not None and args.max_regression is not None:
+        found = regressions(report["results"], baseline, args.max_regression)
+        if found:
+            print(f"Regressions past {args.max_regression:g}%: " + "; ".join(found), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
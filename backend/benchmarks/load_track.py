@@ -0,0 +1,104 @@
+# backend/benchmarks/load_track.py
+"""
+Load test for POST /api/track against slow stub upstreams.
+
+Every request hits the stub retailer server, which sleeps for --delay
+seconds before answering. With the non-blocking scrape path a single
+worker overlaps all of those waits, so wall time stays close to one
+upstream delay per wave of --concurrency requests.
+
+With --distinct the requests cycle over fewer product URLs, the "viral
+link" case: the scrape cache coalesces concurrent requests for one URL
+into a single upstream fetch and serves repeats from memory.
+
+Usage:
+    python -m benchmarks.load_track --requests 500 --concurrency 200 --delay 1.0
+    python -m benchmarks.load_track --blocking   # old in-loop requests.get path
+    python -m benchmarks.load_track --distinct 5 [--no-cache]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=1.0, help="upstream delay in seconds")
+    parser.add_argument("--blocking", action="store_true", help="scrape with blocking requests.get inside the event loop")
+    parser.add_argument("--distinct", type=int, default=0, help="number of distinct product URLs (default: one per request)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the scrape cache and request coalescing")
+    args = parser.parse_args()
+    distinct = args.distinct or args.requests
+
+    db_path = os.path.join(tempfile.mkdtemp(), "load_track.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    if args.no_cache:
+        os.environ["SCRAPE_CACHE_ENABLED"] = "false"
+
+    import httpx
+    import database
+    import models as database_models
+    import main as app_module
+    from scraper import AmazonScraper
+    from scrape_cache import get_scrape_cache
+    from benchmarks.stub_server import StubRetailerServer
+
+    database.engine.echo = False
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.blocking:
+        async def blocking_scrape(self, url):
+            return self.scrape(url)
+        AmazonScraper.scrape_async = blocking_scrape
+
+    async def run(server: StubRetailerServer):
+        transport = httpx.ASGITransport(app=app_module.app)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        failures = 0
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=None) as client:
+            async def one(i: int):
+                nonlocal failures
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post("/api/track", json={"url": server.product_url(f"B{i % distinct:09d}")})
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        failures += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+        await AmazonScraper.close_async_client()
+        return elapsed, latencies, failures
+
+    with StubRetailerServer(delay=args.delay) as server:
+        elapsed, latencies, failures = asyncio.run(run(server))
+        upstream = server.httpd.hits
+
+    with database.SessionLocal() as db:
+        history_rows = db.query(database_models.PriceHistory).count()
+    stats = get_scrape_cache().stats
+
+    latencies.sort()
+    print(f"mode:          {'blocking' if args.blocking else 'async'}")
+    print(f"requests:      {args.requests} (concurrency {args.concurrency}, upstream delay {args.delay:.2f}s)")
+    print(f"products:      {distinct} distinct URLs, {upstream} upstream fetches, {history_rows} history rows")
+    print(f"scrape cache:  {stats['hits']} hits, {stats['misses']} misses, {stats['coalesced']} coalesced")
+    print(f"failures:      {failures}")
+    print(f"wall time:     {elapsed:.2f}s")
+    print(f"throughput:    {args.requests / elapsed:.1f} req/s")
+    print(f"latency p50:   {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"latency p99:   {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# backend/benchmarks/recheck_simulation.py
+"""
+Replay price histories against the re-check policy.
+
+Each history is a step function of true prices. The simulation checks it
+once with a fixed cadence and once with the adaptive policy in recheck.py,
+then reports how many fetches each used, how quickly a price change was
+detected after it happened, and how many changes were never seen (price
+moved and moved back between two checks).
+
+Histories come from a synthetic mix of static, slow, weekly, volatile and
+flash-sale products, or from a real database's price_history table.
+
+Usage:
+    python -m benchmarks.recheck_simulation --products 2000 --days 90
+    python -m benchmarks.recheck_simulation --database-url postgresql://...
+"""
+import argparse
+import bisect
+import math
+import random
+import statistics
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import recheck
+
+# (seconds since start, price), first entry at 0
+Trace = List[Tuple[float, float]]
+
+DAY = 86400.0
+HOUR = 3600.0
+
+
+def synthetic_traces(count: int, days: float, seed: int) -> List[Trace]:
+    rng = random.Random(seed)
+    horizon = days * DAY
+    profiles = [
+        ("static", 0.50, None),
+        ("slow", 0.25, (20 * DAY, 60 * DAY)),
+        ("weekly", 0.15, (2 * DAY, 10 * DAY)),
+        ("volatile", 0.08, (2 * HOUR, 12 * HOUR)),
+        ("flash", 0.02, None),
+    ]
+    traces = []
+    for _ in range(count):
+        roll, name = rng.random(), "static"
+        for name, share, _ in profiles:
+            roll -= share
+            if roll < 0:
+                break
+        gaps = dict((p[0], p[2]) for p in profiles)[name]
+
+        price = round(rng.uniform(10, 500), 2)
+        trace = [(0.0, price)]
+        if name == "flash":
+            t = rng.uniform(3 * DAY, 20 * DAY)
+            while t < horizon:
+                trace.append((t, round(price * rng.uniform(0.6, 0.85), 2)))
+                trace.append((t + rng.uniform(2 * HOUR, 8 * HOUR), price))
+                t += rng.uniform(10 * DAY, 30 * DAY)
+        elif gaps:
+            t = rng.uniform(*gaps)
+            while t < horizon:
+                price = round(price * rng.uniform(0.85, 1.15), 2)
+                trace.append((t, price))
+                t += rng.uniform(*gaps)
+        traces.append([point for point in trace if point[0] < horizon])
+    return traces
+
+
+def database_traces(url: str) -> List[Trace]:
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url)
+    series: Dict[int, List[Tuple[datetime, float]]] = {}
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT product_id, first_seen_at, price FROM price_history ORDER BY product_id, first_seen_at"
+        ))
+        for product_id, recorded_at, price in rows:
+            series.setdefault(product_id, []).append((recorded_at, price))
+
+    traces = []
+    for points in series.values():
+        start = points[0][0]
+        trace = [(0.0, points[0][1])]
+        for recorded_at, price in points[1:]:
+            if price != trace[-1][1]:
+                trace.append(((recorded_at - start).total_seconds(), price))
+        traces.append(trace)
+    return traces
+
+
+def detection(trace: Trace, checks: List[float], horizon: float) -> Tuple[List[float], int]:
+    """Latency to the first check after each change, and the count of changes never observed"""
+    latencies, missed = [], 0
+    for i, (changed_at, _) in enumerate(trace[1:], start=1):
+        ends = trace[i + 1][0] if i + 1 < len(trace) else horizon
+        j = bisect.bisect_left(checks, changed_at)
+        if j < len(checks) and checks[j] < ends:
+            latencies.append(checks[j] - changed_at)
+        else:
+            missed += 1
+    return latencies, missed
+
+
+def fixed_checks(interval: float, horizon: float) -> List[float]:
+    return [k * interval for k in range(int(math.ceil(horizon / interval)))]
+
+
+def adaptive_checks(trace: Trace, horizon: float) -> List[float]:
+    epoch = datetime(2000, 1, 1)
+    lookback = recheck.RECHECK_LOOKBACK_DAYS * DAY
+    times = [t for t, _ in trace]
+    checks: List[float] = []
+    points = deque()
+    unchanged = 0
+    t = 0.0
+    while t < horizon:
+        price = trace[bisect.bisect_right(times, t) - 1][1]
+        if points and points[-1][1] == price:
+            unchanged += 1
+        else:
+            unchanged = 0
+        checks.append(t)
+
+        now = epoch + timedelta(seconds=t)
+        points.append((now, price))
+        while points and (t - (points[0][0] - epoch).total_seconds()) > lookback:
+            points.popleft()
+        t += recheck.next_check_delay(list(points), unchanged, now)
+    return checks
+
+
+def summarize(name: str, fetches: int, latencies: List[float], missed: int, baseline_fetches: int):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    saved = 100.0 * (1 - fetches / baseline_fetches) if baseline_fetches else 0.0
+    print(f"{name:<10} fetches={fetches:>10}  saved={saved:6.1f}%  "
+          f"detected={len(latencies):>7}  missed={missed:>6}  "
+          f"latency mean={statistics.fmean(latencies) / HOUR if latencies else 0:7.2f}h  "
+          f"p95={p95 / HOUR:7.2f}h")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--fixed-hours", type=float, default=1.0, help="fixed cadence to compare against")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", help="replay price_history from this database instead")
+    args = parser.parse_args()
+
+    horizon = args.days * DAY
+    if args.database_url:
+        traces = database_traces(args.database_url)
+        horizon = max((trace[-1][0] for trace in traces), default=0.0) + DAY
+    else:
+        traces = synthetic_traces(args.products, args.days, args.seed)
+
+    fixed = fixed_checks(args.fixed_hours * HOUR, horizon)
+    totals = {"fixed": [0, [], 0], "adaptive": [0, [], 0]}
+    for trace in traces:
+        for name, checks in (("fixed", fixed), ("adaptive", adaptive_checks(trace, horizon))):
+            latencies, missed = detection(trace, checks, horizon)
+            totals[name][0] += len(checks)
+            totals[name][1].extend(latencies)
+            totals[name][2] += missed
+
+    changes = sum(len(trace) - 1 for trace in traces)
+    print(f"histories: {len(traces)}  horizon: {horizon / DAY:.0f} days  price changes: {changes}")
+    for name, (fetches, latencies, missed) in totals.items():
+        summarize(name, fetches, latencies, missed, totals["fixed"][0])
+
+
+if __name__ == "__main__":
+    main()
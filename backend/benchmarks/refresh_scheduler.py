@@ -0,0 +1,87 @@
+# backend/benchmarks/refresh_scheduler.py
+"""
+Run the refresh scheduler once against the stub retailer server.
+
+Seeds --products overdue products, changes every stub price, then lets
+RefreshScheduler re-check them all and reports throughput, the effective
+per-host request rate and how many prices were picked up.
+
+Usage:
+    python -m benchmarks.refresh_scheduler --products 200 --host-rate 50 --host-burst 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--host-rate", type=float, default=50.0)
+    parser.add_argument("--host-burst", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.05, help="upstream delay in seconds")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "refresh.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    import crud
+    import database
+    from database import SessionLocal, Base, engine
+    from models import Product
+    from scheduler import RefreshScheduler
+    from scraper import AmazonScraper
+    from benchmarks.stub_server import StubRetailerServer, stub_price
+
+    database.engine.echo = False
+    logging.basicConfig(level=logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+
+    with StubRetailerServer(delay=args.delay) as server:
+        db = SessionLocal()
+        overdue = datetime.utcnow() - timedelta(days=1)
+        for i in range(args.products):
+            asin = f"B{i:09d}"
+            product = crud.create_product(db, server.product_url(asin), f"Stub Product {asin}", stub_price(asin), "USD", "Amazon")
+            product.next_check_at = overdue
+        db.commit()
+        db.close()
+
+        server.httpd.epoch = 1
+        scheduler = RefreshScheduler(
+            concurrency=args.concurrency,
+            host_rate=args.host_rate,
+            host_burst=args.host_burst,
+        )
+
+        async def run():
+            try:
+                await scheduler.run(once=True)
+            finally:
+                await AmazonScraper.close_async_client()
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+        db = SessionLocal()
+        current = sum(
+            1 for product in db.query(Product)
+            if product.current_price == stub_price(product.url.rsplit('/', 1)[-1], 1)
+        )
+        db.close()
+
+    print(f"products:         {args.products}")
+    print(f"scheduler stats:  {scheduler.stats}")
+    print(f"prices refreshed: {current}/{args.products}")
+    print(f"wall time:        {elapsed:.2f}s")
+    print(f"host rate:        {server.httpd.hits / elapsed:.1f} req/s (limit {args.host_rate}/s, burst {args.host_burst})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# backend/benchmarks/stub_server.py
+"""
+Local stand-in for an Amazon product page server.
+
+Serves a small product page for any /amazon/dp/<ASIN> path after an
+artificial delay, so scraper and API throughput can be measured without
+touching the network. Pages can also be supplied up front (e.g. the
+fixture corpus, served at /amazon/dp/<page name>), gzip-compressed on
+request and sent at a capped bandwidth to model a real retailer link.
+
+Latency can vary per request (delay plus a uniform 0..jitter seconds),
+and error_rate of requests are answered with error_status instead of the
+page, both drawn from a seeded generator so runs are repeatable.
+"""
+import gzip
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>Amazon.com: {name}</title></head>
+<body>
+<div id="centerCol">
+  <span id="productTitle" class="a-size-large">  {name}  </span>
+  <div id="corePrice_feature_div">
+    <span class="a-price" data-a-size="xl">
+      <span class="a-offscreen">${price:.2f}</span>
+      <span aria-hidden="true">
+        <span class="a-price-symbol">$</span><span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span><span class="a-price-fraction">{fraction:02d}</span>
+      </span>
+    </span>
+  </div>
+</div>
+</body>
+</html>
+"""
+
+
+SEND_CHUNK = 16384
+
+
+def stub_price(asin: str, epoch: int = 0) -> float:
+    """Deterministic price for an ASIN so results can be checked"""
+    key = asin if epoch == 0 else f"{asin}:{epoch}"
+    digest = hashlib.md5(key.encode()).digest()
+    return 10 + int.from_bytes(digest[:2], 'big') % 990 + 0.99
+
+
+def render_product_page(asin: str, epoch: int = 0) -> bytes:
+    price = stub_price(asin, epoch)
+    return PAGE_TEMPLATE.format(
+        name=f"Stub Product {asin}",
+        price=price,
+        whole=int(price),
+        fraction=round((price - int(price)) * 100),
+    ).encode('utf-8')
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        delay = float(params.get('delay', [self.server.delay])[0])
+        with self.server.rng_lock:
+            if self.server.jitter > 0:
+                delay += self.server.rng.uniform(0, self.server.jitter)
+            failed = self.server.error_rate > 0 and self.server.rng.random() < self.server.error_rate
+        if delay > 0:
+            time.sleep(delay)
+
+        parts = [p for p in parsed.path.split('/') if p]
+        if len(parts) < 2 or parts[-2] != 'dp':
+            self._send(404, b"not found")
+            return
+
+        self.server.hits += 1
+        if failed:
+            self.server.errors += 1
+            self._send(self.server.error_status, b"injected error")
+            return
+        key = parts[-1]
+        if key in self.server.pages:
+            body = self.server.pages[key]
+        else:
+            body = render_product_page(key, self.server.epoch)
+
+        encoding = None
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            encoding = 'gzip'
+            if key in self.server.pages:
+                # Keyed by body, so pages shared by many keys compress once
+                page = body
+                body = self.server.gzip_cache.get(page) or gzip.compress(page, 6)
+                self.server.gzip_cache[page] = body
+            else:
+                body = gzip.compress(body, 6)
+        self._send(200, body, encoding)
+
+    def _send(self, status: int, body: bytes, encoding: Optional[str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        try:
+            if self.server.bandwidth <= 0:
+                self.wfile.write(body)
+                self.server.bytes_sent += len(body)
+                return
+            # Throttle to the configured bytes/second
+            for start in range(0, len(body), SEND_CHUNK):
+                chunk = body[start:start + SEND_CHUNK]
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                self.server.bytes_sent += len(chunk)
+                time.sleep(len(chunk) / self.server.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client stopped reading early (streaming scrape found what it needed)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRetailerServer:
+    """Threaded stub server that can be started/stopped from a benchmark"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay: float = 0.0,
+        pages: Optional[Dict[str, bytes]] = None,
+        compress: bool = True,
+        bandwidth: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+    ):
+        self.httpd = ThreadingHTTPServer((host, port), StubRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.httpd.delay = delay
+        self.httpd.pages = pages or {}
+        self.httpd.compress = compress
+        self.httpd.gzip_cache = {}
+        # Bytes per second, 0 = unthrottled
+        self.httpd.bandwidth = bandwidth
+        # Extra uniform 0..jitter seconds per request, and the share answered with error_status
+        self.httpd.jitter = jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.error_status = error_status
+        self.httpd.rng = random.Random(seed)
+        self.httpd.rng_lock = threading.Lock()
+        self.httpd.errors = 0
+        # Bump epoch to change every product's price
+        self.httpd.epoch = 0
+        self.httpd.hits = 0
+        self.httpd.bytes_sent = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def product_url(self, asin: str) -> str:
+        return f"{self.base_url}/amazon/dp/{asin}"
+
+    def start(self) -> "StubRetailerServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stub retailer server")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = StubRetailerServer(
+        port=args.port, delay=args.delay, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status
+    )
+    print(f"Stub retailer listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,61 @@
+# backend/canonical.py
+"""
+Canonical product identity for retailer URLs
+
+The same Amazon product is reachable through many URLs: /dp/<ASIN>,
+/gp/product/<ASIN>?ref=..., /Some-Title/dp/<ASIN>/ref=sr_1_1?tag=...,
+mobile and smile subdomains. canonicalize() reduces all of them to the
+marketplace (e.g. "amazon.co.uk") plus ASIN, and a single canonical URL
+that is used for fetching, caching and storage.
+"""
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+# ASINs are 10 uppercase alphanumerics (ISBN-10 for books) after a known path segment
+_ASIN_RE = re.compile(
+    r'/(?:dp|gp/product|gp/aw/d|gp/offer-listing|exec/obidos/asin|o/asin|product-reviews)/([A-Z0-9]{10})(?=[/?#]|$)',
+    re.IGNORECASE,
+)
+# Subdomains that serve the same catalogue as www
+_HOST_PREFIXES = ('www.', 'smile.', 'm.')
+_AMAZON_HOST_RE = re.compile(r'^amazon\.[a-z.]+$')
+
+
+class CanonicalURL(NamedTuple):
+    marketplace: str
+    asin: str
+    url: str
+
+
+def canonicalize(url: str) -> Optional[CanonicalURL]:
+    """
+    Extract marketplace and ASIN from a product URL
+
+    Returns:
+        CanonicalURL, or None if the URL doesn't identify a product
+    """
+    parts = urlsplit(url.strip())
+    match = _ASIN_RE.search(parts.path)
+    if not match or not parts.hostname:
+        return None
+    asin = match.group(1).upper()
+
+    host = parts.hostname.lower()
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    if _AMAZON_HOST_RE.match(host):
+        return CanonicalURL(host, asin, f"https://www.{host}/dp/{asin}")
+
+    # Other hosts (mirrors, local stubs) keep their scheme and port
+    netloc = parts.netloc.lower()
+    return CanonicalURL(netloc, asin, f"{parts.scheme.lower()}://{netloc}/dp/{asin}")
+
+
+def canonical_url(url: str) -> str:
+    """Canonical URL if the product can be identified, else the URL unchanged"""
+    canonical = canonicalize(url)
+    return canonical.url if canonical else url
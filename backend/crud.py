@@ -1,21 +1,152 @@
 # backend/crud.py
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from models import Product, PriceHistory
-from datetime import datetime
-from typing import List, Optional
+from sqlalchemy import BigInteger, Integer, and_, case, cast, desc, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from models import Product, PriceAlert, PriceHistory, ScrapeJob, PriceRollup, PriceRollupHourly, PriceRollupDaily
+from datetime import datetime, timedelta
+from canonical import canonicalize, canonical_url
+from metrics import WRITE_STAGE_SECONDS
+import recheck
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+import calendar
+import logging
+import uuid
+
+if TYPE_CHECKING:
+    from history_buffer import HistoryBuffer
+
+logger = logging.getLogger(__name__)
+
+# Max URLs per IN (...) lookup, keeps bind parameter counts sane on every dialect
+BULK_LOOKUP_CHUNK = 500
+
+# History resolutions served from precomputed rollups
+ROLLUP_MODELS = {'hour': PriceRollupHourly, 'day': PriceRollupDaily}
+
+# Called as listener(action, product_ids) after a committed write, see notify_write
+WriteListener = Callable[[str, List[int]], None]
+_write_listeners: List[WriteListener] = []
+
+def add_write_listener(listener: WriteListener) -> None:
+    """Register a callback for committed product and history writes"""
+    _write_listeners.append(listener)
+
+def remove_write_listener(listener: WriteListener) -> None:
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+def notify_write(action: str, product_ids: Iterable[int]) -> None:
+    """
+    Tell write listeners (caches, subscribers) that products changed
+    
+    The crud write functions call this after their commit; code that commits
+    its own writes (e.g. the history buffer) calls it too.
+    
+    Args:
+        action: "created", "updated", "deleted" or "history"
+        product_ids: Products whose row or history changed
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    for listener in list(_write_listeners):
+        try:
+            listener(action, product_ids)
+        except Exception as e:
+            logger.error(f"Write listener failed for {action} {product_ids[:10]}: {str(e)}")
 
 def get_product_by_url(db: Session, url: str) -> Optional[Product]:
-    """Get product by URL"""
+    """Get product by URL, matching any URL variant of the same ASIN"""
+    canonical = canonicalize(url)
+    if canonical:
+        return db.query(Product).filter(
+            Product.marketplace == canonical.marketplace,
+            Product.asin == canonical.asin
+        ).first()
     return db.query(Product).filter(Product.url == url).first()
 
+def get_products_by_urls(db: Session, urls: List[str]) -> Dict[str, Product]:
+    """
+    Look up many products by URL with chunked IN queries
+    
+    Returns:
+        Dict of url -> product for the URLs that are tracked
+    """
+    keys: Dict[Tuple[str, str], List[str]] = {}
+    plain: List[str] = []
+    for url in urls:
+        canonical = canonicalize(url)
+        if canonical:
+            keys.setdefault((canonical.marketplace, canonical.asin), []).append(url)
+        else:
+            plain.append(url)
+    
+    found: Dict[str, Product] = {}
+    pairs = list(keys)
+    for i in range(0, len(pairs), BULK_LOOKUP_CHUNK):
+        chunk = pairs[i:i + BULK_LOOKUP_CHUNK]
+        query = db.query(Product).filter(tuple_(Product.marketplace, Product.asin).in_(chunk))
+        for product in query:
+            for url in keys[(product.marketplace, product.asin)]:
+                found[url] = product
+    for i in range(0, len(plain), BULK_LOOKUP_CHUNK):
+        for product in db.query(Product).filter(Product.url.in_(plain[i:i + BULK_LOOKUP_CHUNK])):
+            found[product.url] = product
+    return found
+
+def get_product_rows(db: Session, product_ids: List[int], columns: Sequence[Any]) -> List[Any]:
+    """Rows of `columns` for the given products (any order), in chunked IN queries"""
+    rows = []
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        rows.extend(db.execute(
+            select(*columns).where(Product.id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK]))
+        ).all())
+    return rows
+
 def get_product_by_id(db: Session, product_id: int) -> Optional[Product]:
     """Get product by ID"""
     return db.query(Product).filter(Product.id == product_id).first()
 
-def get_all_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
-    """Get all tracked products"""
-    return db.query(Product).order_by(desc(Product.updated_at)).offset(skip).limit(limit).all()
+def get_all_products(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    columns: Optional[Sequence[Any]] = None
+) -> List[Product]:
+    """Get all tracked products, or rows of just `columns` of them"""
+    query = db.query(*columns) if columns else db.query(Product)
+    return query.order_by(desc(Product.updated_at)).offset(skip).limit(limit).all()
+
+def get_products_page(
+    db: Session,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    retailer: Optional[str] = None,
+    currency: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    columns: Optional[Sequence[Any]] = None
+) -> List[Product]:
+    """
+    Get one page of products, most recently updated first
+    
+    Keyset pagination: `after` is the (updated_at, id) of the last product on
+    the previous page, so every page is an index range scan on
+    (updated_at, id), or (retailer|currency, updated_at, id) when filtered,
+    however deep it is. With `columns`, returns rows of just those columns.
+    """
+    query = db.query(*columns) if columns else db.query(Product)
+    if retailer is not None:
+        query = query.filter(Product.retailer == retailer)
+    if currency is not None:
+        query = query.filter(Product.currency == currency)
+    if min_price is not None:
+        query = query.filter(Product.current_price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.current_price <= max_price)
+    if after is not None:
+        query = query.filter(tuple_(Product.updated_at, Product.id) < tuple_(*after))
+    return query.order_by(desc(Product.updated_at), desc(Product.id)).limit(limit).all()
 
 def create_product(
     db: Session,
@@ -25,40 +156,56 @@ def create_product(
     currency: str,
     retailer: str
 ) -> Product:
-    """Create new product and record initial price"""
+    """Create new product and record initial price, in one transaction"""
+    now = datetime.utcnow()
+    canonical = canonicalize(url)
     product = Product(
-        url=url,
+        url=canonical.url if canonical else url,
+        marketplace=canonical.marketplace if canonical else None,
+        asin=canonical.asin if canonical else None,
         name=name,
         current_price=price,
         lowest_price=price,
         highest_price=price,
         currency=currency,
         retailer=retailer,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
-        last_checked_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now,
+        last_checked_at=now,
+        next_check_at=recheck.next_check_at([], 0, now),
+        unchanged_checks=0
     )
     db.add(product)
+    # Flush for the id, then record initial price in history
+    db.flush()
+    _extend_or_open_interval(db, None, product.id, price, currency, now)
+    record_rollups(db, [(product.id, price, currency, now)])
     db.commit()
-    db.refresh(product)
-    
-    # Record initial price in history
-    add_price_history(db, product.id, price, currency)
-    
+    notify_write("created", [product.id])
     return product
 
 def update_product_price(
     db: Session,
     product: Product,
     new_price: float,
-    currency: str
+    currency: str,
+    history: Optional["HistoryBuffer"] = None
 ) -> Product:
-    """Update product price and record in history"""
+    """
+    Update product price and record the observation in history, in one transaction
+    
+    Args:
+        history: write-behind buffer to queue the history observation on
+            instead of writing it in this transaction
+    """
+    now = datetime.utcnow()
+    _track_unchanged_checks(product, new_price, currency)
+    
     # Direct assignment works with Mapped[] types
     product.current_price = new_price
     product.currency = currency
-    product.last_checked_at = datetime.utcnow()
-    product.updated_at = datetime.utcnow()
+    product.last_checked_at = now
+    product.updated_at = now
     
     # Update lowest/highest - use 'is not None' for proper conditional checks
     if product.lowest_price is None or new_price < product.lowest_price:
@@ -66,45 +213,736 @@ def update_product_price(
     if product.highest_price is None or new_price > product.highest_price:
         product.highest_price = new_price
     
-    db.commit()
-    db.refresh(product)
+    # Schedule the next check from recent history plus this observation
+    with WRITE_STAGE_SECONDS.time("update", "read"):
+        points = get_recent_price_points(db, [product.id], recheck.lookback_start(now)).get(product.id, [])
+    points.append((now, new_price))
+    product.next_check_at = recheck.next_check_at(points, product.unchanged_checks, now)
     
-    # Record price in history (only if price changed)
-    add_price_history(db, product.id, new_price, currency)
+    # Extend the open history interval, or start a new one if the price moved
+    with WRITE_STAGE_SECONDS.time("update", "history"):
+        if history is not None:
+            history.add(product.id, new_price, currency, now)
+        else:
+            _append_price(db, product.id, new_price, currency, now)
+    with WRITE_STAGE_SECONDS.time("update", "commit"):
+        db.commit()
+    notify_write("updated", [product.id])
     
     return product
 
-def add_price_history(
+def save_scraped_product(
+    db: Session,
+    url: str,
+    product_data: Dict[str, Any],
+    reused: bool = False
+) -> Tuple[Product, bool]:
+    """
+    Create or update a product from scraper output in a single transaction
+    
+    On PostgreSQL and SQLite the product is written with one
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, followed by the history
+    append and one commit. Other dialects fall back to the ORM path.
+    
+    Args:
+        reused: product_data came from the scrape cache, so an existing
+            product already has this observation and is returned unchanged
+    
+    Returns:
+        Tuple of (product, created)
+    """
+    if reused:
+        existing_product = get_product_by_url(db, url)
+        if existing_product:
+            return existing_product, False
+    
+    if _dialect_insert(db) is not None:
+        try:
+            return _upsert_scraped_product(db, url, product_data)
+        except IntegrityError:
+            # Conflict on a key the upsert doesn't target (e.g. a row not yet
+            # keyed by migrate.py); the ORM path below resolves it
+            db.rollback()
+    
+    existing_product = get_product_by_url(db, url)
+    if existing_product:
+        product = update_product_price(
+            db,
+            existing_product,
+            product_data['price'],
+            product_data['currency']
+        )
+        return product, False
+    
+    try:
+        product = create_product(
+            db,
+            url=url,
+            name=product_data['name'],
+            price=product_data['price'],
+            currency=product_data['currency'],
+            retailer=product_data['retailer']
+        )
+    except IntegrityError:
+        # A concurrent request created the same product first
+        db.rollback()
+        existing_product = get_product_by_url(db, url)
+        if existing_product is None:
+            raise
+        return update_product_price(
+            db, existing_product, product_data['price'], product_data['currency']
+        ), False
+    return product, True
+
+def _dialect_insert(db: Session):
+    """The dialect's INSERT construct if it supports ON CONFLICT ... RETURNING"""
+    name = db.get_bind().dialect.name
+    if name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+def _upsert_scraped_product(db: Session, url: str, product_data: Dict[str, Any]) -> Tuple[Product, bool]:
+    now = datetime.utcnow()
+    price = product_data['price']
+    currency = product_data['currency']
+    canonical = canonicalize(url)
+    if canonical:
+        key_columns = [Product.marketplace, Product.asin]
+        key_filter = and_(Product.marketplace == canonical.marketplace, Product.asin == canonical.asin)
+    else:
+        key_columns = [Product.url]
+        key_filter = Product.url == url
+    
+    # Current state and recent history in one read, for the re-check schedule
+    since = recheck.lookback_start(now)
+    with WRITE_STAGE_SECONDS.time("upsert", "read"):
+        rows = db.execute(
+            select(Product.current_price, Product.currency, Product.unchanged_checks,
+                   PriceHistory.first_seen_at, PriceHistory.price)
+            .outerjoin(PriceHistory, and_(
+                PriceHistory.product_id == Product.id,
+                func.coalesce(PriceHistory.last_seen_at, PriceHistory.first_seen_at) >= since
+            ))
+            .where(key_filter)
+            .order_by(PriceHistory.first_seen_at)
+        ).all()
+    
+    unchanged_checks = 0
+    points: List[recheck.PricePoint] = []
+    if rows:
+        current_price, current_currency, previous_checks = rows[0][:3]
+        if price == current_price and currency == current_currency:
+            unchanged_checks = (previous_checks or 0) + 1
+        points = [(max(first_seen_at, since), point_price) for *_, first_seen_at, point_price in rows if first_seen_at]
+    points.append((now, price))
+    
+    dialect_insert = _dialect_insert(db)
+    stmt = dialect_insert(Product).values(
+        url=canonical.url if canonical else url,
+        marketplace=canonical.marketplace if canonical else None,
+        asin=canonical.asin if canonical else None,
+        name=product_data['name'],
+        retailer=product_data['retailer'],
+        current_price=price,
+        lowest_price=price,
+        highest_price=price,
+        currency=currency,
+        created_at=now,
+        updated_at=now,
+        last_checked_at=now,
+        next_check_at=recheck.next_check_at(points, unchanged_checks, now),
+        unchanged_checks=unchanged_checks
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            'current_price': excluded.current_price,
+            'currency': excluded.currency,
+            'updated_at': excluded.updated_at,
+            'last_checked_at': excluded.last_checked_at,
+            'next_check_at': excluded.next_check_at,
+            'unchanged_checks': excluded.unchanged_checks,
+            'lowest_price': case(
+                (or_(Product.lowest_price.is_(None), excluded.current_price < Product.lowest_price),
+                 excluded.current_price),
+                else_=Product.lowest_price
+            ),
+            'highest_price': case(
+                (or_(Product.highest_price.is_(None), excluded.current_price > Product.highest_price),
+                 excluded.current_price),
+                else_=Product.highest_price
+            ),
+        }
+    ).returning(Product)
+    with WRITE_STAGE_SECONDS.time("upsert", "upsert"):
+        product = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    # created_at is only written by the INSERT branch
+    created = product.created_at == now
+    
+    with WRITE_STAGE_SECONDS.time("upsert", "history"):
+        if created:
+            _extend_or_open_interval(db, None, product.id, price, currency, now)
+            record_rollups(db, [(product.id, price, currency, now)])
+        else:
+            _append_price(db, product.id, price, currency, now)
+        db.flush()
+    # Detach so the RETURNING values stay loaded: reading them after commit
+    # would otherwise check a connection out again until the session closes
+    db.expunge(product)
+    with WRITE_STAGE_SECONDS.time("upsert", "commit"):
+        db.commit()
+    notify_write("created" if created else "updated", [product.id])
+    return product, created
+
+def bulk_save_scraped_products(
+    db: Session,
+    items: List[Tuple[str, Dict[str, Any]]],
+    reused_urls: Collection[str] = (),
+    history: Optional["HistoryBuffer"] = None
+) -> Dict[str, Tuple[Product, bool]]:
+    """
+    Create or update many products from scraper output in one transaction
+    
+    Existing products are looked up with a single IN query, new and updated
+    rows plus their history entries are flushed together and committed once.
+    Existing products whose URL is in reused_urls (results served from the
+    scrape cache) are returned unchanged. With a history buffer, history
+    observations are queued on it instead of written in this transaction.
+    
+    Returns:
+        Dict of url -> (product, created)
+    """
+    # URL variants of one product collapse onto its canonical URL; the last
+    # result wins if the same product appears twice in a batch
+    keys = {url: canonical_url(url) for url, _ in items}
+    scraped = {keys[url]: data for url, data in items}
+    if not scraped:
+        return {}
+    reused_keys = {canonical_url(url) for url in reused_urls}
+    
+    now = datetime.utcnow()
+    with WRITE_STAGE_SECONDS.time("bulk", "read"):
+        existing = get_products_by_urls(db, list(scraped.keys()))
+        recent_points = get_recent_price_points(
+            db, [product.id for product in existing.values()], recheck.lookback_start(now)
+        )
+    
+    results: Dict[str, Tuple[Product, bool]] = {}
+    changed: List[Product] = []
+    
+    for url, data in scraped.items():
+        price = data['price']
+        product = existing.get(url)
+        if product and url in reused_keys:
+            results[url] = (product, False)
+            continue
+        if product:
+            _track_unchanged_checks(product, price, data['currency'])
+            points = recent_points.get(product.id, [])
+            points.append((now, price))
+            product.next_check_at = recheck.next_check_at(points, product.unchanged_checks, now)
+            product.current_price = price
+            product.currency = data['currency']
+            product.last_checked_at = now
+            product.updated_at = now
+            if product.lowest_price is None or price < product.lowest_price:
+                product.lowest_price = price
+            if product.highest_price is None or price > product.highest_price:
+                product.highest_price = price
+            results[url] = (product, False)
+            changed.append(product)
+        else:
+            canonical = canonicalize(url)
+            product = Product(
+                url=url,
+                marketplace=canonical.marketplace if canonical else None,
+                asin=canonical.asin if canonical else None,
+                name=data['name'],
+                current_price=price,
+                lowest_price=price,
+                highest_price=price,
+                currency=data['currency'],
+                retailer=data['retailer'],
+                created_at=now,
+                updated_at=now,
+                last_checked_at=now,
+                next_check_at=recheck.next_check_at([], 0, now),
+                unchanged_checks=0
+            )
+            db.add(product)
+            results[url] = (product, True)
+            changed.append(product)
+    
+    # Flush once to assign ids to new products before adding history
+    with WRITE_STAGE_SECONDS.time("bulk", "upsert"):
+        db.flush()
+    
+    observations = [(product.id, product.current_price, product.currency, now) for product in changed]
+    with WRITE_STAGE_SECONDS.time("bulk", "history"):
+        if history is not None:
+            for observation in observations:
+                history.add(*observation)
+        else:
+            append_price_observations(db, observations)
+    ids = [product.id for product, _ in results.values()]
+    with WRITE_STAGE_SECONDS.time("bulk", "commit"):
+        db.commit()
+    created_ids = {product.id for product, created in results.values() if created}
+    notify_write("created", created_ids)
+    notify_write("updated", [product.id for product in changed if product.id not in created_ids])
+    
+    # Reload the expired instances with one query per chunk instead of one each
+    for i in range(0, len(ids), BULK_LOOKUP_CHUNK):
+        db.query(Product).filter(Product.id.in_(ids[i:i + BULK_LOOKUP_CHUNK])).all()
+    
+    return {url: results[key] for url, key in keys.items()}
+
+def _append_price(
+    db: Session,
+    product_id: int,
+    price: float,
+    currency: str,
+    seen_at: datetime
+) -> None:
+    """Extend the open interval if the price is unchanged, else start one, and update rollups (no commit)"""
+    interval = (
+        db.query(PriceHistory)
+        .filter(PriceHistory.product_id == product_id)
+        .order_by(PriceHistory.first_seen_at.desc(), PriceHistory.id.desc())
+        .first()
+    )
+    _extend_or_open_interval(db, interval, product_id, price, currency, seen_at)
+    record_rollups(db, [(product_id, price, currency, seen_at)])
+
+def append_price_observations(
     db: Session,
+    observations: List[Tuple[int, float, str, datetime]]
+) -> None:
+    """
+    Record many (product_id, price, currency, seen_at) observations
+    
+    Observations are applied oldest first. Open intervals are loaded with
+    one grouped query per chunk, and rollups are updated with one statement
+    per resolution. Does not commit.
+    """
+    observations = sorted(observations, key=lambda observation: observation[3])
+    intervals = get_open_intervals(db, list({product_id for product_id, *_ in observations}))
+    for product_id, price, currency, seen_at in observations:
+        intervals[product_id] = _extend_or_open_interval(
+            db, intervals.get(product_id), product_id, price, currency, seen_at
+        )
+    record_rollups(db, observations)
+
+def get_open_intervals(db: Session, product_ids: List[int]) -> Dict[int, PriceHistory]:
+    """
+    Open (latest) history interval per product, with one query per chunk
+    
+    The open interval is the one that started last, not the one inserted
+    last: a write-behind flush can insert an older observation after an
+    inline write.
+    """
+    intervals: Dict[int, PriceHistory] = {}
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        ranked = (
+            select(
+                PriceHistory.id,
+                func.row_number().over(
+                    partition_by=PriceHistory.product_id,
+                    order_by=(PriceHistory.first_seen_at.desc(), PriceHistory.id.desc())
+                ).label("rank")
+            )
+            .where(PriceHistory.product_id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK]))
+            .subquery()
+        )
+        latest = db.query(PriceHistory).join(ranked, PriceHistory.id == ranked.c.id).filter(ranked.c.rank == 1)
+        for interval in latest:
+            intervals[interval.product_id] = interval
+    return intervals
+
+def _extend_or_open_interval(
+    db: Session,
+    interval: Optional[PriceHistory],
     product_id: int,
     price: float,
-    currency: str
+    currency: str,
+    seen_at: datetime
 ) -> PriceHistory:
-    """Add price history record"""
-    history = PriceHistory(
+    if interval is not None and seen_at < (interval.last_seen_at or interval.first_seen_at):
+        # Older than what is already recorded (e.g. a buffered observation
+        # flushed after an inline write): the open interval stays as it is
+        return interval
+    if interval is not None and interval.price == price and interval.currency == currency:
+        interval.last_seen_at = seen_at
+        return interval
+    interval = PriceHistory(
         product_id=product_id,
         price=price,
         currency=currency,
-        recorded_at=datetime.utcnow()
+        first_seen_at=seen_at,
+        last_seen_at=seen_at
+    )
+    db.add(interval)
+    return interval
+
+def _bucket_start(seen_at: datetime, resolution: str) -> datetime:
+    if resolution == 'hour':
+        return seen_at.replace(minute=0, second=0, microsecond=0)
+    return seen_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+_rollup_upserts: Dict[Tuple[Any, type], Any] = {}
+
+def _rollup_upsert(dialect_insert, model):
+    """INSERT ... ON CONFLICT DO UPDATE folding one bucket into a rollup table, built once"""
+    key = (dialect_insert, model)
+    if key not in _rollup_upserts:
+        stmt = dialect_insert(model.__table__)
+        excluded = stmt.excluded
+        table = model.__table__.c
+        newer = excluded.last_seen_at >= table.last_seen_at
+        _rollup_upserts[key] = stmt.on_conflict_do_update(
+            index_elements=[table.product_id, table.bucket_start],
+            set_={
+                'low': case((excluded.low < table.low, excluded.low), else_=table.low),
+                'high': case((excluded.high > table.high, excluded.high), else_=table.high),
+                'close': case((newer, excluded.close), else_=table.close),
+                'currency': case((newer, excluded.currency), else_=table.currency),
+                'last_seen_at': case((newer, excluded.last_seen_at), else_=table.last_seen_at),
+                'samples': table.samples + excluded.samples,
+            }
+        )
+    return _rollup_upserts[key]
+
+def record_rollups(
+    db: Session,
+    observations: List[Tuple[int, float, str, datetime]]
+) -> None:
+    """
+    Fold (product_id, price, currency, seen_at) observations into the hourly
+    and daily rollup buckets (no commit)
+    
+    Observations are pre-aggregated per bucket, then written with one
+    INSERT ... ON CONFLICT DO UPDATE per resolution where supported.
+    """
+    if not observations:
+        return
+    dialect_insert = _dialect_insert(db)
+    
+    for resolution, model in ROLLUP_MODELS.items():
+        buckets: Dict[Tuple[int, datetime], Dict[str, Any]] = {}
+        for product_id, price, currency, seen_at in observations:
+            key = (product_id, _bucket_start(seen_at, resolution))
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    'product_id': product_id, 'bucket_start': key[1], 'currency': currency,
+                    'open': price, 'low': price, 'high': price, 'close': price,
+                    'last_seen_at': seen_at, 'samples': 1
+                }
+                continue
+            row['low'] = min(row['low'], price)
+            row['high'] = max(row['high'], price)
+            row['samples'] += 1
+            if seen_at >= row['last_seen_at']:
+                row['close'], row['currency'], row['last_seen_at'] = price, currency, seen_at
+        
+        if dialect_insert is not None:
+            # Core executemany on a prebuilt statement; building the upsert
+            # costs more than running it
+            db.connection().execute(_rollup_upsert(dialect_insert, model), list(buckets.values()))
+            continue
+        
+        for (product_id, bucket_start), row in buckets.items():
+            existing = db.query(model).filter(
+                model.product_id == product_id, model.bucket_start == bucket_start
+            ).first()
+            if existing is None:
+                db.add(model(**row))
+                continue
+            existing.low = min(existing.low, row['low'])
+            existing.high = max(existing.high, row['high'])
+            existing.samples += row['samples']
+            if row['last_seen_at'] >= existing.last_seen_at:
+                existing.close, existing.currency = row['close'], row['currency']
+                existing.last_seen_at = row['last_seen_at']
+
+def rebuild_rollups(db: Session, product_ids: List[int]) -> int:
+    """
+    Recompute rollups for products from their history intervals (no commit)
+    
+    Each interval contributes its first and last observation, which is all
+    that change-only history keeps.
+    
+    Returns:
+        Number of observations rolled up
+    """
+    observations: List[Tuple[int, float, str, datetime]] = []
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        chunk = product_ids[i:i + BULK_LOOKUP_CHUNK]
+        for model in ROLLUP_MODELS.values():
+            db.query(model).filter(model.product_id.in_(chunk)).delete(synchronize_session=False)
+        rows = (
+            db.query(PriceHistory.product_id, PriceHistory.price, PriceHistory.currency,
+                     PriceHistory.first_seen_at, PriceHistory.last_seen_at)
+            .filter(PriceHistory.product_id.in_(chunk))
+            .order_by(PriceHistory.product_id, PriceHistory.first_seen_at)
+        )
+        for product_id, price, currency, first_seen_at, last_seen_at in rows:
+            observations.append((product_id, price, currency, first_seen_at))
+            if last_seen_at is not None and last_seen_at > first_seen_at:
+                observations.append((product_id, price, currency, last_seen_at))
+    record_rollups(db, observations)
+    return len(observations)
+
+def get_price_rollups(
+    db: Session,
+    product_id: int,
+    resolution: str,
+    limit: int = 100,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    columns: Optional[Sequence[Any]] = None
+) -> List[PriceRollup]:
+    """
+    Get hourly or daily price buckets for a product, newest first
+    
+    Args:
+        columns: Columns of ROLLUP_MODELS[resolution] to return rows of,
+            instead of model instances
+    """
+    model = ROLLUP_MODELS[resolution]
+    query = (db.query(*columns) if columns else db.query(model)).filter(model.product_id == product_id)
+    if since is not None:
+        query = query.filter(model.bucket_start >= _bucket_start(since, resolution))
+    if before is not None:
+        query = query.filter(model.bucket_start < before)
+    return query.order_by(desc(model.bucket_start)).limit(limit).all()
+
+def get_recent_price_points(
+    db: Session,
+    product_ids: List[int],
+    since: datetime
+) -> Dict[int, List[recheck.PricePoint]]:
+    """
+    Get (seen_at, price) points newer than `since` per product, oldest first
+    
+    One point per history interval overlapping the window, at the interval
+    start (clamped to `since`), so consecutive points always differ in price.
+    """
+    points: Dict[int, List[recheck.PricePoint]] = {}
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        rows = (
+            db.query(PriceHistory.product_id, PriceHistory.first_seen_at, PriceHistory.price)
+            .filter(
+                PriceHistory.product_id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK]),
+                func.coalesce(PriceHistory.last_seen_at, PriceHistory.first_seen_at) >= since
+            )
+            .order_by(PriceHistory.product_id, PriceHistory.first_seen_at)
+        )
+        for product_id, first_seen_at, price in rows:
+            points.setdefault(product_id, []).append((max(first_seen_at, since), price))
+    return points
+
+def claim_due_products(db: Session, limit: int, claim_seconds: float) -> List[Tuple[datetime, int, str]]:
+    """
+    Claim up to `limit` products due for a re-check, most overdue first
+    
+    Claiming pushes next_check_at claim_seconds out, so other schedulers
+    skip the products; the re-check then sets the real next_check_at, and
+    a scheduler that dies mid-check leaves them due again once the claim
+    runs out. PostgreSQL locks the candidates with FOR UPDATE SKIP LOCKED,
+    so concurrent schedulers take disjoint batches; elsewhere the UPDATE is
+    conditional on the product still being due, and only rows it matched
+    are returned.
+    
+    Returns:
+        (due time, product id, url) per claimed product
+    """
+    now = datetime.utcnow()
+    due = and_(Product.next_check_at.isnot(None), Product.next_check_at <= now)
+    candidates = (
+        select(Product.next_check_at, Product.id, Product.url)
+        .where(due)
+        .order_by(Product.next_check_at)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+    rows = db.execute(candidates).all()
+    if not rows:
+        db.commit()
+        return []
+    
+    claim = (
+        update(Product)
+        .where(Product.id.in_([row.id for row in rows]), due)
+        .values(next_check_at=now + timedelta(seconds=claim_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        claimed = set(db.scalars(claim.returning(Product.id)))
+    else:
+        claimed = set()
+        for row in rows:
+            if db.execute(claim.where(Product.id == row.id)).rowcount == 1:
+                claimed.add(row.id)
+    db.commit()
+    return [(due_at, product_id, url) for due_at, product_id, url in rows if product_id in claimed]
+
+def defer_product_checks(db: Session, product_ids: List[int], seconds: float) -> None:
+    """Set next_check_at `seconds` from now, e.g. to back off after a failed re-check or release a claim"""
+    if not product_ids:
+        return
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids))
+        .values(next_check_at=datetime.utcnow() + timedelta(seconds=seconds))
+        .execution_options(synchronize_session=False)
     )
-    db.add(history)
     db.commit()
-    db.refresh(history)
-    return history
+
+def get_analytics_products(db: Session, product_ids: Optional[List[int]] = None) -> List[Any]:
+    """(id, currency, current_price, highest_price) rows ordered by id, all products or the given ones"""
+    stmt = select(Product.id, Product.currency, Product.current_price, Product.highest_price)
+    if product_ids is None:
+        return db.execute(stmt.order_by(Product.id)).all()
+    rows = []
+    product_ids = sorted(product_ids)
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        rows.extend(db.execute(
+            stmt.where(Product.id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK])).order_by(Product.id)
+        ).all())
+    return rows
+
+def _epoch_seconds(db: Session, column):
+    """SQL expression for a naive UTC DateTime column as integer epoch seconds, None if unsupported"""
+    name = db.get_bind().dialect.name
+    if name == 'postgresql':
+        return cast(func.extract('epoch', column), BigInteger)
+    if name == 'sqlite':
+        return cast(func.strftime('%s', column), Integer)
+    return None
+
+def iter_analytics_history(
+    db: Session,
+    since: datetime,
+    product_ids: Optional[List[int]] = None,
+    batch_rows: int = 10000
+) -> Iterable[Sequence[Any]]:
+    """
+    Batches of (product_id, price, first_seen_at epoch seconds) history rows seen since `since`
+    
+    Ordered by product, then time, so rows can be grouped by product without
+    sorting. Timestamps are converted in SQL where the dialect allows, which
+    skips building a datetime per row. With product_ids, reads them in
+    chunked IN queries.
+    """
+    epoch = _epoch_seconds(db, PriceHistory.first_seen_at)
+    stmt = (
+        select(PriceHistory.product_id, PriceHistory.price, PriceHistory.first_seen_at if epoch is None else epoch)
+        .where(func.coalesce(PriceHistory.last_seen_at, PriceHistory.first_seen_at) >= since)
+        .order_by(PriceHistory.product_id, PriceHistory.first_seen_at, PriceHistory.id)
+    )
+    # Plain rows through Core, no ORM result processing
+    connection = db.connection()
+    if product_ids is None:
+        batches = connection.execute(stmt.execution_options(yield_per=batch_rows)).partitions()
+    else:
+        product_ids = sorted(product_ids)
+        batches = (
+            connection.execute(stmt.where(PriceHistory.product_id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK]))).all()
+            for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK)
+        )
+    for batch in batches:
+        if epoch is None:
+            batch = [(product_id, price, calendar.timegm(seen.timetuple())) for product_id, price, seen in batch]
+        yield batch
+
+def _track_unchanged_checks(product: Product, new_price: float, currency: str) -> None:
+    """Reset the unchanged-check counter on a price move, otherwise bump it"""
+    if new_price != product.current_price or currency != product.currency:
+        product.unchanged_checks = 0
+    else:
+        product.unchanged_checks = (product.unchanged_checks or 0) + 1
 
 def get_price_history(
     db: Session,
     product_id: int,
-    limit: int = 100
-) -> List[PriceHistory]:
-    """Get price history for a product"""
-    return (
-        db.query(PriceHistory)
-        .filter(PriceHistory.product_id == product_id)
-        .order_by(desc(PriceHistory.recorded_at))
+    limit: int = 100,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get price history for a product as a point series, newest first
+    
+    One query on (product_id, first_seen_at) that reads only the needed
+    columns. To fetch the next (older) page, pass the recorded_at of the
+    oldest returned point as `before`, and its id as `before_id` so points
+    with the same timestamp aren't skipped.
+    """
+    query = db.query(
+        PriceHistory.id, PriceHistory.price, PriceHistory.currency,
+        PriceHistory.first_seen_at, PriceHistory.last_seen_at
+    ).filter(PriceHistory.product_id == product_id)
+    if since is not None:
+        query = query.filter(func.coalesce(PriceHistory.last_seen_at, PriceHistory.first_seen_at) >= since)
+    if before is not None:
+        if before_id is None:
+            query = query.filter(PriceHistory.first_seen_at < before)
+        else:
+            # Intervals holding a point before (before, before_id): see price_points for point ids
+            query = query.filter(
+                tuple_(PriceHistory.first_seen_at, PriceHistory.id) < tuple_(before, (before_id + 1) // 2)
+            )
+    # Each interval expands to at most two points, so `limit` rows are plenty
+    intervals = (
+        query
+        .order_by(desc(PriceHistory.first_seen_at), desc(PriceHistory.id))
         .limit(limit)
         .all()
     )
+    points = price_points(intervals)
+    points.sort(key=lambda point: (point['recorded_at'], point['id']), reverse=True)
+    if since is not None:
+        points = [point for point in points if point['recorded_at'] >= since]
+    if before is not None:
+        if before_id is None:
+            points = [point for point in points if point['recorded_at'] < before]
+        else:
+            points = [point for point in points if (point['recorded_at'], point['id']) < (before, before_id)]
+    return points[:limit]
+
+def price_points(intervals: Iterable[PriceHistory]) -> List[Dict[str, Any]]:
+    """
+    Expand history intervals into the points the API serves
+    
+    An interval contributes a point when the price was first seen and, if it
+    was seen again later, one at the last observation. Points come out in
+    the order the intervals are given, so callers sort them as they need.
+    Point ids are unique and stable: 2 * interval id for the first point,
+    plus one for the last.
+    """
+    points: List[Dict[str, Any]] = []
+    for interval in intervals:
+        points.append({
+            'id': interval.id * 2,
+            'price': interval.price,
+            'currency': interval.currency,
+            'recorded_at': interval.first_seen_at
+        })
+        if interval.last_seen_at is not None and interval.last_seen_at > interval.first_seen_at:
+            points.append({
+                'id': interval.id * 2 + 1,
+                'price': interval.price,
+                'currency': interval.currency,
+                'recorded_at': interval.last_seen_at
+            })
+    return points
 
 def delete_product(db: Session, product_id: int) -> bool:
     """Delete product and its history"""
@@ -112,5 +950,308 @@ def delete_product(db: Session, product_id: int) -> bool:
     if product:
         db.delete(product)
         db.commit()
+        notify_write("deleted", [product_id])
         return True
-    return False
\ No newline at end of file
+    return False
+
+def create_alert(
+    db: Session,
+    product_id: int,
+    target_price: Optional[float] = None,
+    percent_off_high: Optional[float] = None,
+    cooldown_seconds: Optional[int] = None
+) -> PriceAlert:
+    """Register a price-drop alert on a product"""
+    alert = PriceAlert(
+        product_id=product_id,
+        target_price=target_price,
+        percent_off_high=percent_off_high,
+        cooldown_seconds=cooldown_seconds,
+        armed=True,
+        created_at=datetime.utcnow()
+    )
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    return alert
+
+def get_alert(db: Session, alert_id: int) -> Optional[PriceAlert]:
+    return db.get(PriceAlert, alert_id)
+
+def get_alerts(
+    db: Session,
+    product_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[PriceAlert]:
+    """Alerts in creation order, optionally for one product"""
+    query = db.query(PriceAlert)
+    if product_id is not None:
+        query = query.filter(PriceAlert.product_id == product_id)
+    return query.order_by(PriceAlert.id).offset(skip).limit(limit).all()
+
+def delete_alert(db: Session, alert_id: int) -> bool:
+    deleted = db.query(PriceAlert).filter(PriceAlert.id == alert_id).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+def iter_alert_rows(db: Session, batch_rows: int = 10000) -> Iterable[Any]:
+    """Every alert as a plain row, streamed in batches (for loading the alert index)"""
+    stmt = select(
+        PriceAlert.id, PriceAlert.product_id, PriceAlert.target_price, PriceAlert.percent_off_high,
+        PriceAlert.cooldown_seconds, PriceAlert.armed, PriceAlert.last_fired_at, PriceAlert.last_fired_price
+    ).execution_options(yield_per=batch_rows)
+    return db.execute(stmt)
+
+def iter_product_prices(db: Session, batch_rows: int = 10000) -> Iterable[Any]:
+    """(id, current_price) of every product, streamed in batches"""
+    return db.execute(select(Product.id, Product.current_price).execution_options(yield_per=batch_rows))
+
+def get_alert_prices(db: Session, product_ids: List[int]) -> List[Tuple[int, float, Optional[float]]]:
+    """(id, current_price, highest_price) of each product, in chunked IN queries"""
+    rows = []
+    for i in range(0, len(product_ids), BULK_LOOKUP_CHUNK):
+        rows.extend(db.execute(
+            select(Product.id, Product.current_price, Product.highest_price)
+            .where(Product.id.in_(product_ids[i:i + BULK_LOOKUP_CHUNK]))
+        ).all())
+    return rows
+
+def save_alert_states(db: Session, states: List[Dict[str, Any]]) -> None:
+    """
+    Persist fired/re-armed alert state in one bulk UPDATE by primary key
+    
+    Args:
+        states: dicts with id, armed, and last_fired_at/last_fired_price for
+            alerts that fired
+    """
+    if not states:
+        return
+    db.execute(update(PriceAlert), states)
+    db.commit()
+
+# Jobs that can still be leased
+JOB_ACTIVE_STATUSES = ('queued', 'running')
+
+# (id, url, lease_id, attempts, max_attempts) of a leased job
+LeasedJob = Tuple[int, str, str, int, int]
+
+def enqueue_job(db: Session, url: str, max_attempts: int) -> Tuple[ScrapeJob, bool]:
+    """
+    Queue a scrape of url, or return the job already queued or running for it
+    
+    A partial unique index (ix_scrape_jobs_active_url) allows one active job
+    per URL, so of two concurrent calls only one inserts.
+    
+    Returns:
+        (job, created)
+    """
+    existing = _active_job(db, url)
+    if existing is not None:
+        return existing, False
+    now = datetime.utcnow()
+    job = ScrapeJob(
+        url=url, status='queued', attempts=0, max_attempts=max_attempts, available_at=now, created_at=now
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request queued the same URL first
+        db.rollback()
+        existing = _active_job(db, url)
+        if existing is None:
+            raise
+        return existing, False
+    return job, True
+
+def _active_job(db: Session, url: str) -> Optional[ScrapeJob]:
+    return (
+        db.query(ScrapeJob)
+        .filter(ScrapeJob.url == url, ScrapeJob.status.in_(JOB_ACTIVE_STATUSES))
+        .order_by(ScrapeJob.id)
+        .first()
+    )
+
+def get_job(db: Session, job_id: int) -> Optional[ScrapeJob]:
+    return db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+
+def lease_jobs(db: Session, worker: str, limit: int, visibility_timeout: float) -> List[LeasedJob]:
+    """
+    Claim up to `limit` leasable jobs, oldest available first
+    
+    A job is leasable while queued or running with available_at in the
+    past: running jobs are ones whose worker's lease expired. Leasing counts
+    an attempt and hides the job for visibility_timeout seconds. Expired
+    jobs that have used all their attempts are marked failed instead.
+    
+    PostgreSQL claims with SELECT ... FOR UPDATE SKIP LOCKED inside one
+    UPDATE ... RETURNING, so concurrent workers skip each other's rows
+    instead of waiting on them. SQLite runs the same UPDATE without row
+    locks: it holds the database write lock for the whole statement. Other
+    dialects claim job by job, conditional on the attempt count being
+    unchanged.
+    """
+    now = datetime.utcnow()
+    lease_id = uuid.uuid4().hex
+    db.execute(
+        update(ScrapeJob)
+        .where(
+            ScrapeJob.status == 'running',
+            ScrapeJob.available_at <= now,
+            ScrapeJob.attempts >= ScrapeJob.max_attempts
+        )
+        .values(
+            status='failed', lease_id=None, finished_at=now,
+            error=func.coalesce(ScrapeJob.error, 'Lease expired on the last attempt')
+        )
+        .execution_options(synchronize_session=False)
+    )
+    leasable = and_(
+        ScrapeJob.status.in_(JOB_ACTIVE_STATUSES),
+        ScrapeJob.available_at <= now,
+        ScrapeJob.attempts < ScrapeJob.max_attempts
+    )
+    values = dict(
+        status='running', attempts=ScrapeJob.attempts + 1, lease_id=lease_id, worker=worker,
+        available_at=now + timedelta(seconds=visibility_timeout), started_at=now
+    )
+    returning = (ScrapeJob.id, ScrapeJob.url, ScrapeJob.attempts, ScrapeJob.max_attempts)
+    
+    name = db.get_bind().dialect.name
+    if name in ('postgresql', 'sqlite'):
+        candidates = (
+            select(ScrapeJob.id)
+            .where(leasable)
+            .order_by(ScrapeJob.available_at, ScrapeJob.id)
+            .limit(limit)
+        )
+        if name == 'postgresql':
+            candidates = candidates.with_for_update(skip_locked=True)
+        rows = db.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id.in_(candidates), leasable)
+            .values(**values)
+            .returning(*returning)
+            .execution_options(synchronize_session=False)
+        ).all()
+    else:
+        rows = []
+        candidates = db.execute(
+            select(*returning).where(leasable).order_by(ScrapeJob.available_at, ScrapeJob.id).limit(limit)
+        ).all()
+        for job_id, url, attempts, max_attempts in candidates:
+            claimed = db.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.id == job_id, ScrapeJob.attempts == attempts, leasable)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount == 1:
+                rows.append((job_id, url, attempts + 1, max_attempts))
+    db.commit()
+    return [(job_id, url, lease_id, attempts, max_attempts) for job_id, url, attempts, max_attempts in rows]
+
+def extend_leases(db: Session, leases: List[Tuple[int, str]], visibility_timeout: float) -> int:
+    """
+    Push back the expiry of (job id, lease id) leases still held
+    
+    Returns:
+        Number extended; fewer than len(leases) means some were lost
+    """
+    if not leases:
+        return 0
+    extended = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.status == 'running', tuple_(ScrapeJob.id, ScrapeJob.lease_id).in_(leases))
+        .values(available_at=datetime.utcnow() + timedelta(seconds=visibility_timeout))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return extended
+
+def finish_job(
+    db: Session,
+    job_id: int,
+    lease_id: str,
+    product_id: Optional[int] = None,
+    error: Optional[str] = None,
+    retry_at: Optional[datetime] = None
+) -> bool:
+    """
+    Record the outcome of a leased job
+    
+    Succeeded without an error; with one, queued again at retry_at, or
+    failed for good when retry_at is None. Nothing changes if the lease
+    was lost (expired and taken by another worker).
+    
+    Returns:
+        Whether the lease was still held
+    """
+    now = datetime.utcnow()
+    if error is None:
+        values = dict(status='succeeded', product_id=product_id, error=None, finished_at=now)
+    elif retry_at is not None:
+        values = dict(status='queued', error=error, available_at=retry_at)
+    else:
+        values = dict(status='failed', error=error, finished_at=now)
+    finished = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.id == job_id, ScrapeJob.lease_id == lease_id, ScrapeJob.status == 'running')
+        .values(lease_id=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return finished == 1
+
+def merge_products(db: Session, survivor: Product, duplicates: List[Product]) -> int:
+    """
+    Fold duplicate rows of one product into survivor
+    
+    History rows are re-pointed at the survivor, lowest/highest prices and
+    timestamps are combined, and the most recently checked row supplies the
+    current price. Does not commit.
+    
+    Returns:
+        Number of history rows moved
+    """
+    duplicate_ids = [product.id for product in duplicates]
+    if not duplicate_ids:
+        return 0
+    
+    moved = db.query(PriceHistory).filter(
+        PriceHistory.product_id.in_(duplicate_ids)
+    ).update({PriceHistory.product_id: survivor.id}, synchronize_session=False)
+    db.query(PriceAlert).filter(
+        PriceAlert.product_id.in_(duplicate_ids)
+    ).update({PriceAlert.product_id: survivor.id}, synchronize_session=False)
+    
+    rows = [survivor] + duplicates
+    latest = max(rows, key=lambda product: product.last_checked_at or datetime.min)
+    lows = [product.lowest_price for product in rows if product.lowest_price is not None]
+    highs = [product.highest_price for product in rows if product.highest_price is not None]
+    due = [product.next_check_at for product in rows if product.next_check_at is not None]
+    
+    survivor.name = latest.name
+    survivor.current_price = latest.current_price
+    survivor.currency = latest.currency
+    survivor.last_checked_at = latest.last_checked_at
+    survivor.unchanged_checks = latest.unchanged_checks or 0
+    survivor.lowest_price = min(lows) if lows else None
+    survivor.highest_price = max(highs) if highs else None
+    survivor.next_check_at = min(due) if due else None
+    created = [product.created_at for product in rows if product.created_at is not None]
+    if created:
+        survivor.created_at = min(created)
+    survivor.updated_at = datetime.utcnow()
+    
+    # Buckets of different rows can overlap, so rebuild them from the merged history
+    for model in ROLLUP_MODELS.values():
+        db.query(model).filter(model.product_id.in_(duplicate_ids)).delete(synchronize_session=False)
+    rebuild_rollups(db, [survivor.id])
+    
+    # Bulk delete so the cascade doesn't reload the (already moved) history
+    for product in duplicates:
+        db.expunge(product)
+    db.query(Product).filter(Product.id.in_(duplicate_ids)).delete(synchronize_session=False)
+    return moved
@@ -0,0 +1,258 @@
+# backend/export.py
+"""
+Streaming bulk export of products and price history
+
+Rows are read through a server-side cursor (yield_per) in batches of
+EXPORT_BATCH_ROWS and encoded batch by batch, so memory stays constant
+however large the export is. No ORM objects or Pydantic models are built.
+
+Formats: NDJSON, CSV, and Parquet when pyarrow is installed. History is
+exported as stored: one row per run of identical prices, from
+first_seen_at to last_seen_at (see models.PriceHistory).
+
+Served at GET /api/export/{dataset}, or from the command line:
+
+    python export.py history --format csv --since 2024-01-01 -o history.csv
+    python export.py products --product-id 1 --product-id 2
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Product, PriceHistory
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+# (column, parquet type) per dataset, in output order
+Columns = List[Tuple[Any, str]]
+DATASETS: Dict[str, Columns] = {
+    "products": [
+        (Product.id, "int64"),
+        (Product.url, "string"),
+        (Product.marketplace, "string"),
+        (Product.asin, "string"),
+        (Product.name, "string"),
+        (Product.retailer, "string"),
+        (Product.currency, "string"),
+        (Product.current_price, "float64"),
+        (Product.lowest_price, "float64"),
+        (Product.highest_price, "float64"),
+        (Product.created_at, "timestamp"),
+        (Product.updated_at, "timestamp"),
+        (Product.last_checked_at, "timestamp"),
+    ],
+    "history": [
+        (PriceHistory.id, "int64"),
+        (PriceHistory.product_id, "int64"),
+        (PriceHistory.price, "float64"),
+        (PriceHistory.currency, "string"),
+        (PriceHistory.first_seen_at, "timestamp"),
+        (PriceHistory.last_seen_at, "timestamp"),
+    ],
+}
+
+Batches = Iterable[Sequence[Sequence[Any]]]
+
+
+def column_names(dataset: str) -> List[str]:
+    return [column.key for column, _ in DATASETS[dataset]]
+
+
+def export_query(
+    dataset: str,
+    product_ids: Optional[Sequence[int]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Select statement for a dataset
+
+    Products are filtered by updated_at; history intervals are included if
+    they overlap [since, until). Both are ordered so the scan follows an
+    index: products by id, history by (product_id, first_seen_at).
+    """
+    stmt = select(*[column for column, _ in DATASETS[dataset]])
+    if dataset == "products":
+        if product_ids:
+            stmt = stmt.where(Product.id.in_(product_ids))
+        if since is not None:
+            stmt = stmt.where(Product.updated_at >= since)
+        if until is not None:
+            stmt = stmt.where(Product.updated_at < until)
+        return stmt.order_by(Product.id)
+
+    if product_ids:
+        stmt = stmt.where(PriceHistory.product_id.in_(product_ids))
+    if since is not None:
+        stmt = stmt.where(func.coalesce(PriceHistory.last_seen_at, PriceHistory.first_seen_at) >= since)
+    if until is not None:
+        stmt = stmt.where(PriceHistory.first_seen_at < until)
+    return stmt.order_by(PriceHistory.product_id, PriceHistory.first_seen_at, PriceHistory.id)
+
+
+def iter_batches(
+    stmt,
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[Sequence[Sequence[Any]]]:
+    """Execute stmt on its own session and yield rows batch_rows at a time"""
+    with session_factory() as db:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_rows))
+        for batch in result.partitions():
+            yield batch
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_ndjson(names: List[str], batches: Batches) -> Iterator[bytes]:
+    """One JSON object per row"""
+    for batch in batches:
+        lines = [json.dumps(dict(zip(names, row)), default=_json_default) for row in batch]
+        lines.append("")
+        yield "\n".join(lines).encode()
+
+
+def encode_csv(names: List[str], batches: Batches) -> Iterator[bytes]:
+    """Header row, then one line per row; NULL is an empty field"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects bytes until they are taken"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def encode_parquet(names: List[str], types: List[str], batches: Batches) -> Iterator[bytes]:
+    """One Parquet row group per batch (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in zip(names, types)])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            columns = zip(*batch)
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def check_format(fmt: str) -> None:
+    """Raise ValueError if the format can't be produced here"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export requires the pyarrow package")
+
+
+def stream_export(
+    dataset: str,
+    fmt: str = "ndjson",
+    product_ids: Optional[Sequence[int]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_rows: int = EXPORT_BATCH_ROWS
+) -> Iterator[bytes]:
+    """
+    Encoded export of a dataset, as chunks of bytes
+
+    Args:
+        dataset: "products" or "history"
+        fmt: "ndjson", "csv" or "parquet"
+        product_ids: Only these products (or their history)
+        since, until: Time range, see export_query
+    """
+    check_format(fmt)
+    names = column_names(dataset)
+    batches = iter_batches(export_query(dataset, product_ids, since, until), session_factory, batch_rows)
+    if fmt == "parquet":
+        return encode_parquet(names, [kind for _, kind in DATASETS[dataset]], batches)
+    if fmt == "csv":
+        return encode_csv(names, batches)
+    return encode_ndjson(names, batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PriceFighter products or price history")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--product-id", type=int, action="append", help="only this product (repeatable)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO timestamp, inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO timestamp, exclusive")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        chunks = stream_export(args.dataset, args.format, args.product_id, args.since, args.until)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
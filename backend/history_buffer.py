@@ -0,0 +1,222 @@
+# backend/history_buffer.py
+"""
+Write-behind buffer for price history observations
+
+The refresh scheduler and the bulk tracking endpoint update many products
+in a short time. With a HistoryBuffer, their product rows are still
+written immediately, but history observations are queued in memory and
+written in bulk (one open-interval lookup and one commit per flush) every
+HISTORY_BUFFER_MAX_SECONDS or once HISTORY_BUFFER_MAX_ROWS are queued.
+
+When a flush fails, observations for products deleted meanwhile are
+dropped and the rest are written one at a time, so one bad row can't hold
+back the others. Rows that still fail go back to the front of the queue,
+up to HISTORY_BUFFER_MAX_RETRIES times. The queue holds at most
+HISTORY_BUFFER_MAX_PENDING observations (oldest dropped first) while the
+database is unavailable. Dropped observations are counted and logged.
+Observations still queued when the process dies are lost, so this is
+opt-in via HISTORY_WRITE_BEHIND.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+HISTORY_BUFFER_MAX_ROWS = int(os.getenv("HISTORY_BUFFER_MAX_ROWS", "1000"))
+HISTORY_BUFFER_MAX_SECONDS = float(os.getenv("HISTORY_BUFFER_MAX_SECONDS", "5"))
+HISTORY_BUFFER_MAX_RETRIES = int(os.getenv("HISTORY_BUFFER_MAX_RETRIES", "5"))
+HISTORY_BUFFER_MAX_PENDING = int(os.getenv("HISTORY_BUFFER_MAX_PENDING", "100000"))
+
+# (product_id, price, currency, seen_at)
+Observation = Tuple[int, float, str, datetime]
+
+
+class HistoryBuffer:
+    """Thread-safe queue of history observations flushed in bulk"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_rows: int = HISTORY_BUFFER_MAX_ROWS,
+        max_seconds: float = HISTORY_BUFFER_MAX_SECONDS,
+        max_retries: int = HISTORY_BUFFER_MAX_RETRIES,
+        max_pending: int = HISTORY_BUFFER_MAX_PENDING,
+    ):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.stats = {"queued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "dropped": 0}
+        self._pending: List[Observation] = []
+        # Failed writes per observation still queued
+        self._attempts: Dict[Observation, int] = {}
+        # Warn once per overflow, not on every add
+        self._overflowing = False
+        self._lock = threading.Lock()
+        # Serializes flushes so observations for one product land in order
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # After a failed flush, add() leaves retries to the periodic flush until then
+        self._retry_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, product_id: int, price: float, currency: str, seen_at: datetime) -> None:
+        """Queue an observation; flushes inline once max_rows are waiting"""
+        with self._lock:
+            self._pending.append((product_id, price, currency, seen_at))
+            self.stats["queued"] += 1
+            overflow = self._trim()
+            full = len(self._pending) >= self.max_rows and time.monotonic() >= self._retry_at
+        if overflow and not self._overflowing:
+            self._overflowing = True
+            logger.warning(f"History buffer full ({self.max_pending}), dropping the oldest observations")
+        if full:
+            self.flush()
+
+    def _trim(self) -> int:
+        """Drop the oldest observations past max_pending (holding _lock); returns how many"""
+        overflow = len(self._pending) - self.max_pending
+        if overflow <= 0:
+            return 0
+        for observation in self._pending[:overflow]:
+            self._attempts.pop(observation, None)
+        del self._pending[:overflow]
+        self.stats["dropped"] += overflow
+        return overflow
+
+    def flush(self) -> int:
+        """Write every queued observation, in one transaction unless that fails; returns the count written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            db = self.session_factory()
+            try:
+                crud.append_price_observations(db, pending)
+                db.commit()
+                written, failed = pending, []
+            except Exception as e:
+                db.rollback()
+                self.stats["failed_flushes"] += 1
+                logger.error(f"History flush of {len(pending)} observations failed, retrying one by one: {str(e)}")
+                written, failed = self._write_one_by_one(db, pending)
+            finally:
+                db.close()
+
+            if failed:
+                self._requeue(failed)
+            for observation in written:
+                self._attempts.pop(observation, None)
+            if not failed:
+                self._overflowing = False
+            self.stats["flushed"] += len(written)
+            self.stats["flushes"] += 1
+            if written:
+                crud.notify_write("history", {product_id for product_id, *_ in written})
+            return len(written)
+
+    def _write_one_by_one(self, db: Session, pending: List[Observation]) -> Tuple[List[Observation], List[Observation]]:
+        """After a failed flush: drop deleted products' rows, write the rest singly; (written, failed)"""
+        try:
+            product_ids = list({product_id for product_id, *_ in pending})
+            existing = {row.id for row in crud.get_product_rows(db, product_ids, [crud.Product.id])}
+        except Exception as e:
+            db.rollback()
+            logger.error(f"History retry could not reach the database: {str(e)}")
+            return [], pending
+
+        deleted = [observation for observation in pending if observation[0] not in existing]
+        if deleted:
+            self._drop(deleted, "their products were deleted")
+        written, failed = [], []
+        for observation in pending:
+            if observation[0] not in existing:
+                continue
+            try:
+                crud.append_price_observations(db, [observation])
+                db.commit()
+                written.append(observation)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"History observation {observation} failed: {str(e)}")
+                failed.append(observation)
+        return written, failed
+
+    def _requeue(self, failed: List[Observation]) -> None:
+        """Put failed observations back at the front of the queue, dropping ones out of retries"""
+        retry, exhausted = [], []
+        for observation in failed:
+            attempts = self._attempts.get(observation, 0) + 1
+            if attempts > self.max_retries:
+                exhausted.append(observation)
+            else:
+                self._attempts[observation] = attempts
+                retry.append(observation)
+        if exhausted:
+            self._drop(exhausted, f"they failed {self.max_retries + 1} times")
+        with self._lock:
+            self._pending = retry + self._pending
+            overflow = self._trim()
+        if overflow:
+            logger.warning(f"History buffer full ({self.max_pending}), dropped {overflow} oldest observations")
+        self._retry_at = time.monotonic() + self.max_seconds
+
+    def _drop(self, observations: List[Observation], reason: str) -> None:
+        for observation in observations:
+            self._attempts.pop(observation, None)
+        self.stats["dropped"] += len(observations)
+        logger.error(f"Dropped {len(observations)} history observations, {reason}")
+
+    async def run(self) -> None:
+        """Flush every max_seconds until cancelled, then flush what is left"""
+        try:
+            while True:
+                await asyncio.sleep(self.max_seconds)
+                await asyncio.to_thread(self.flush)
+        finally:
+            await asyncio.to_thread(self.flush)
+
+    def start(self) -> None:
+        """Start periodic flushing as a task on the running event loop"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop periodic flushing and write out the remaining observations"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        else:
+            await asyncio.to_thread(self.flush)
+
+
+_shared_buffer: Optional[HistoryBuffer] = None
+
+
+def get_history_buffer() -> Optional[HistoryBuffer]:
+    """Shared buffer if HISTORY_WRITE_BEHIND is on, else None to write inline"""
+    global _shared_buffer
+    if not HISTORY_WRITE_BEHIND:
+        return None
+    if _shared_buffer is None:
+        _shared_buffer = HistoryBuffer()
+    return _shared_buffer
@@ -1,24 +1,115 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Union
+from datetime import datetime
 
 import schemas
 import crud
+import export
+import fast_json
+import metrics
+import profiler
+import sql_metrics
 from database import get_db, engine, Base
 from scraper import AmazonScraper
+from scheduler import RefreshScheduler, REFRESH_SCHEDULER_ENABLED
+from worker import JobWorker, JOB_MAX_ATTEMPTS, JOB_WORKER_ENABLED
+from parse_pool import get_parse_pool, shutdown_parse_pool
+from scrape_cache import get_scrape_cache, close_scrape_cache
+from canonical import canonical_url
+from history_buffer import get_history_buffer
+from response_cache import cache_middleware, close_response_cache, get_response_cache
+from alerts import close_alert_engine, get_alert_engine
+from analytics import ANALYTICS_LOW_DAYS, close_analytics_cache, get_analytics_cache
+from stream import StreamFull, close_stream_hub, get_stream_hub
+from pagination import NEXT_CURSOR_HEADER, InvalidCursor, decode_cursor, encode_cursor
 
+import asyncio
 import logging
+import os
 
 logging.basicConfig(level=logging. INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="PriceFighter API", version="0.2. 0")
+# Bulk tracking limits
+TRACK_BATCH_MAX_URLS = int(os.getenv("TRACK_BATCH_MAX_URLS", "5000"))
+TRACK_BATCH_CONCURRENCY = int(os.getenv("TRACK_BATCH_CONCURRENCY", "20"))
+
+# POST /api/track queues the scrape for a worker (worker.py) unless ?queue= says otherwise
+TRACK_QUEUE_DEFAULT = os.getenv("TRACK_QUEUE_DEFAULT", "false").lower() in ("1", "true", "yes")
+
+# Price history points embedded in GET /api/products/{id}
+PRODUCT_HISTORY_EMBED_LIMIT = int(os.getenv("PRODUCT_HISTORY_EMBED_LIMIT", "100"))
+PRODUCT_HISTORY_EMBED_MAX = int(os.getenv("PRODUCT_HISTORY_EMBED_MAX", "1000"))
+
+# Largest page a listing returns
+PRODUCT_PAGE_MAX = int(os.getenv("PRODUCT_PAGE_MAX", "1000"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "1000"))
+ANALYTICS_PAGE_MAX = int(os.getenv("ANALYTICS_PAGE_MAX", "1000"))
+
+# Most products one /api/stream subscription can follow
+STREAM_PRODUCTS_MAX = int(os.getenv("STREAM_PRODUCTS_MAX", "1000"))
+
+# Columns read by the fast JSON path, in response schema order
+PRODUCT_FIELDS = fast_json.schema_fields(schemas.ProductResponse)
+PRODUCT_COLUMNS = fast_json.schema_columns(schemas.ProductResponse, crud.Product)
+BUCKET_FIELDS = fast_json.schema_fields(schemas.PriceBucketResponse)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    history = get_history_buffer()
+    if history:
+        history.start()
+    # Load the alert index and start evaluating price writes
+    get_alert_engine()
+    # Publish writes to /api/stream subscribers
+    get_stream_hub().start()
+    scheduler = None
+    if REFRESH_SCHEDULER_ENABLED:
+        scheduler = RefreshScheduler()
+        scheduler.start()
+    job_worker = None
+    if JOB_WORKER_ENABLED:
+        job_worker = JobWorker()
+        job_worker.start()
+    yield
+    if job_worker:
+        await job_worker.stop()
+    if scheduler:
+        await scheduler.stop()
+    if history:
+        await history.stop()
+    await close_stream_hub()
+    shutdown_parse_pool()
+    await close_scrape_cache()
+    close_response_cache()
+    close_alert_engine()
+    close_analytics_cache()
+    # Release pooled keep-alive connections held by the scraper
+    await AmazonScraper.close_async_client()
+
+app = FastAPI(title="PriceFighter API", version="0.2. 0", lifespan=lifespan)
 
 # Create tables on startup
 Base.metadata.create_all(bind=engine)
 
+# Statements per request (innermost, so cache hits aren't counted as requests)
+app.middleware("http")(sql_metrics.request_middleware)
+
+# Cached product reads, inside CORS so cached responses get CORS headers too
+app.middleware("http")(cache_middleware)
+
+# Request latency and debug profiling, outside the cache so hits are measured
+if metrics.METRICS_ENABLED:
+    app.middleware("http")(metrics.request_middleware)
+if profiler.DEBUG_PROFILE_TOKEN:
+    app.middleware("http")(profiler.profile_middleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +117,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", profiler.PROFILE_ID_HEADER],
 )
 
 @app.get("/")
@@ -36,12 +128,17 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
-@app.post("/api/track", response_model=schemas.ProductTrackResponse)
+@app.post(
+    "/api/track",
+    response_model=schemas.ProductTrackResponse,
+    responses={202: {"model": schemas.JobResponse, "description": "Scrape queued; poll /api/jobs/{id}"}}
+)
 async def track_product(
     request: schemas.TrackProductRequest,
+    queue: Optional[bool] = Query(None, description="Queue the scrape for a worker, default TRACK_QUEUE_DEFAULT"),
     db: Session = Depends(get_db)
 ):
-    """Track Amazon product - saves to database"""
+    """Track Amazon product - saves to database, or queues the scrape with ?queue=true"""
     url_str = str(request.url)
     
     logger.info(f"Tracking product: {url_str}")
@@ -52,11 +149,38 @@ async def track_product(
             detail="Currently only Amazon URLs are supported"
         )
     
+    # Tracking parameters and URL variants all fetch the same product page
+    url_str = canonical_url(url_str)
+    
+    if queue is None:
+        queue = TRACK_QUEUE_DEFAULT
+    if queue:
+        job, created = await run_in_threadpool(crud.enqueue_job, db, url_str, JOB_MAX_ATTEMPTS)
+        logger.info(f"{'Queued' if created else 'Already queued'} job #{job.id} for {url_str}")
+        return JSONResponse(
+            status_code=202,
+            content=schemas.JobResponse.model_validate(job).model_dump(mode="json"),
+            headers={"Location": f"/api/jobs/{job.id}"}
+        )
+    
     scraper = AmazonScraper()
     
     try:
-        # Scrape product data
-        product_data = scraper.scrape(url_str)
+        # Scrape product data without blocking the event loop. Concurrent and
+        # recent requests for the same URL share one fetch; the fetching request
+        # saves before waiters are released, so they find the product in place.
+        saved = {}
+        
+        async def scrape_and_save():
+            data = await scraper.scrape_async(url_str)
+            if data:
+                # Database work is synchronous, so run it in the threadpool
+                saved["result"] = await run_in_threadpool(
+                    crud.save_scraped_product, db, url_str, data
+                )
+            return data
+        
+        product_data, _ = await get_scrape_cache().get_or_fetch(url_str, scrape_and_save)
         
         if not product_data:
             raise HTTPException(
@@ -64,85 +188,382 @@ async def track_product(
                 detail="Could not extract product information"
             )
         
-        # Check if product already exists
-        existing_product = crud.get_product_by_url(db, url_str)
-        
-        if existing_product:
-            # Update existing product with new price
-            updated_product = crud. update_product_price(
-                db,
-                existing_product,
-                product_data['price'],
-                product_data['currency']
-            )
-            logger.info(f"Updated product #{updated_product.id}")
-            
-            return schemas.ProductTrackResponse(
-                name=updated_product.name,
-                price=updated_product.current_price,
-                currency=updated_product.currency,
-                url=updated_product.url,
-                retailer=updated_product.retailer,
-                tracked=True,
-                product_id=updated_product.id
-            )
+        if "result" in saved:
+            product, created = saved["result"]
         else:
-            # Create new product
-            new_product = crud.create_product(
-                db,
-                url=url_str,
-                name=product_data['name'],
-                price=product_data['price'],
-                currency=product_data['currency'],
-                retailer=product_data['retailer']
-            )
-            logger.info(f"Created new product #{new_product.id}")
-            
-            return schemas.ProductTrackResponse(
-                name=new_product.name,
-                price=new_product.current_price,
-                currency=new_product.currency,
-                url=new_product.url,
-                retailer=new_product.retailer,
-                tracked=True,
-                product_id=new_product.id
+            product, created = await run_in_threadpool(
+                crud.save_scraped_product, db, url_str, product_data, True
             )
         
+        if created:
+            logger.info(f"Created new product #{product.id}")
+        else:
+            logger.info(f"Updated product #{product.id}")
+        
+        return _track_response(product)
+        
+    except HTTPException:
+        raise
     except Exception as e: 
         logger.error(f"Scraping error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
 
+@app.post("/api/track/batch", response_model=schemas.TrackBatchResponse)
+async def track_products_batch(
+    request: schemas.TrackBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """Track many Amazon products - concurrent scrape, single database transaction"""
+    urls = [str(url) for url in request.urls]
+    
+    if len(urls) > TRACK_BATCH_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {TRACK_BATCH_MAX_URLS} URLs per batch"
+        )
+    
+    logger.info(f"Tracking batch of {len(urls)} products")
+    
+    scraper = AmazonScraper(parse_pool=get_parse_pool())
+    scrape_cache = get_scrape_cache()
+    semaphore = asyncio.Semaphore(TRACK_BATCH_CONCURRENCY)
+    reused_urls = set()
+    
+    async def scrape(url: str):
+        async with semaphore:
+            return await scraper.scrape_async(url)
+    
+    async def fetch(url: str):
+        try:
+            product_data, cache_status = await scrape_cache.get_or_fetch(url, lambda: scrape(url))
+        except Exception as e:
+            return None, f"Scraping failed: {str(e)}"
+        if not product_data:
+            return None, "Could not extract product information"
+        if cache_status != "miss":
+            reused_urls.add(url)
+        return product_data, None
+    
+    # Each distinct product is fetched once even if repeated in the batch
+    unsupported = (None, "Currently only Amazon URLs are supported")
+    canonical = {url: canonical_url(url) for url in urls if "amazon" in url.lower()}
+    unique_urls = list(dict.fromkeys(canonical.values()))
+    fetched = dict(zip(unique_urls, await asyncio.gather(*(fetch(url) for url in unique_urls))))
+    
+    scraped = [(url, data) for url, (data, _) in fetched.items() if data]
+    saved = {}
+    if scraped:
+        try:
+            saved = await run_in_threadpool(
+                crud.bulk_save_scraped_products, db, scraped, reused_urls, get_history_buffer()
+            )
+        except Exception as e:
+            logger.error(f"Batch save error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Saving batch failed: {str(e)}")
+    
+    results = []
+    for url in urls:
+        if canonical.get(url) in saved:
+            product, created = saved[canonical[url]]
+            results.append(schemas.TrackBatchItemResult(
+                url=url,
+                success=True,
+                created=created,
+                product_id=product.id,
+                name=product.name,
+                price=product.current_price,
+                currency=product.currency
+            ))
+        else:
+            results.append(schemas.TrackBatchItemResult(url=url, success=False, error=fetched.get(canonical.get(url), unsupported)[1]))
+    
+    succeeded = sum(1 for result in results if result.success)
+    logger.info(f"Batch tracked: {succeeded}/{len(results)} succeeded")
+    
+    return schemas.TrackBatchResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+@app.get("/api/jobs/{job_id}", response_model=schemas.JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Status of a scrape queued by POST /api/track?queue=true"""
+    job = crud.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/scrape-cache/stats")
+def scrape_cache_stats():
+    """Scrape cache hit/miss/coalesced counters"""
+    return get_scrape_cache().snapshot()
+
+@app.get("/api/metrics/sql")
+def sql_metrics_snapshot(top: int = Query(20, ge=1, le=200)):
+    """Statement latency, slow query and N+1 counters, heaviest statements first"""
+    return sql_metrics.get_sql_metrics().snapshot(top=top)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+metrics.register_collector(lambda: metrics.counter_lines(
+    "pricefighter_scrape_cache_total", "Scrape cache lookups by result", "result", get_scrape_cache().stats
+))
+metrics.register_collector(lambda: metrics.counter_lines(
+    "pricefighter_response_cache_total", "Response cache lookups by result", "result", get_response_cache().stats
+))
+metrics.register_collector(lambda: metrics.counter_lines(
+    "pricefighter_alerts_total", "Alert engine evaluations, candidates, fired, suppressed, rearmed and failed saves", "kind",
+    get_alert_engine().stats
+))
+def _stream_event_lines():
+    """Stream hub counters, looked up on every scrape: a lifespan restart replaces the hub"""
+    hub = get_stream_hub()
+    return metrics.counter_lines(
+        "pricefighter_stream_events_total", "Stream events published, delivered, dropped for lagging clients, resumes",
+        "kind", hub.stats
+    )
+
+metrics.register_collector(_stream_event_lines)
+metrics.register_collector(lambda: metrics.counter_lines(
+    "pricefighter_analytics_cache_total", "Analytics reads by result (hits, partial, full recompute)", "result",
+    get_analytics_cache().stats
+))
+
+@app.get("/api/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_request_profile(profile_id: str, request: Request):
+    """Collapsed stacks sampled while a profiled request ran (debug header required)"""
+    if not profiler.is_authorized(request):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the debug token is wrong")
+    profile = profiler.get_profile_store().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed, headers=profiler.profile_headers(profile))
+
+@app.get("/api/response-cache/stats")
+def response_cache_stats():
+    """Response cache hit/miss/304 counters"""
+    return get_response_cache().snapshot()
+
+def _track_response(product) -> schemas.ProductTrackResponse:
+    return schemas.ProductTrackResponse(
+        name=product.name,
+        price=product.current_price,
+        currency=product.currency,
+        url=product.url,
+        retailer=product.retailer,
+        tracked=True,
+        product_id=product.id
+    )
+
+def _next_cursor_headers(response: Response) -> dict:
+    """The X-Next-Cursor header set on an injected Response, for a response built by hand"""
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+
 @app.get("/api/products", response_model=List[schemas.ProductResponse])
 def get_products(
-    skip:  int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=PRODUCT_PAGE_MAX),
+    cursor: Optional[str] = None,
+    retailer: Optional[str] = None,
+    currency: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all tracked products"""
-    products = crud. get_all_products(db, skip=skip, limit=limit)
+    """
+    Get tracked products, most recently updated first
+    
+    Paginated by cursor: when more products match, the X-Next-Cursor
+    response header holds the token to pass as ?cursor= for the next page.
+    skip still works for the first pages, but gets slower the deeper it goes.
+    """
+    filters = dict(retailer=retailer, currency=currency, min_price=min_price, max_price=max_price)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, "products", **filters)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif skip:
+        if any(value is not None for value in filters.values()):
+            raise HTTPException(status_code=400, detail="Filters require cursor pagination, not skip")
+        if fast_json.FAST_JSON_RESPONSES:
+            rows = crud.get_all_products(db, skip=skip, limit=limit, columns=PRODUCT_COLUMNS)
+            return fast_json.json_response(fast_json.rows_to_json(PRODUCT_FIELDS, rows))
+        return crud.get_all_products(db, skip=skip, limit=limit)
+    
+    # One more row than needed tells us whether there is a next page; the
+    # fast path reads the response fields as plain rows, skipping the ORM
+    columns = PRODUCT_COLUMNS if fast_json.FAST_JSON_RESPONSES else None
+    products = crud.get_products_page(db, limit=limit + 1, after=after, columns=columns, **filters)
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor("products", last.updated_at, last.id, **filters)
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.json_response(fast_json.rows_to_json(PRODUCT_FIELDS, products), _next_cursor_headers(response))
     return products
 
 @app. get("/api/products/{product_id}", response_model=schemas. ProductWithHistoryResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get product details with price history"""
+def get_product(
+    product_id: int,
+    history_limit: int = Query(PRODUCT_HISTORY_EMBED_LIMIT, ge=0, le=PRODUCT_HISTORY_EMBED_MAX),
+    db: Session = Depends(get_db)
+):
+    """
+    Get product details with its most recent price history
+    
+    Only the newest history_limit points are embedded (oldest first);
+    history_truncated says whether there are more, which can be paged
+    through with /api/products/{id}/history
+    """
     product = crud.get_product_by_id(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    # One more point than needed tells us whether the window is truncated
+    points = crud.get_price_history(db, product_id, limit=history_limit + 1)
+    return schemas.ProductWithHistoryResponse(
+        **schemas.ProductResponse.model_validate(product).model_dump(),
+        price_history=list(reversed(points[:history_limit])),
+        history_truncated=len(points) > history_limit
+    )
 
-@app.get("/api/products/{product_id}/history", response_model=List[schemas. PriceHistoryResponse])
+@app.get(
+    "/api/products/{product_id}/history",
+    response_model=Union[List[schemas.PriceHistoryResponse], List[schemas.PriceBucketResponse]]
+)
 def get_product_history(
     product_id: int,
-    limit: int = 100,
+    response: Response,
+    limit: int = Query(100, ge=1, le=HISTORY_PAGE_MAX),
+    resolution: Literal["raw", "hour", "day"] = "raw",
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     db:  Session = Depends(get_db)
 ):
-    """Get price history for a product"""
+    """
+    Get price history for a product, newest first
+    
+    resolution=raw returns the observed price points; hour and day return
+    precomputed open/low/high/close buckets. When there are older entries,
+    the X-Next-Cursor response header holds the token to pass as ?cursor=
+    for the next page. `before` starts a listing at a point in time.
+    """
     product = crud.get_product_by_id(db, product_id)
     if not product: 
         raise HTTPException(status_code=404, detail="Product not found")
     
-    history = crud.get_price_history(db, product_id, limit=limit)
-    return history
+    kind = f"history-{resolution}"
+    scope = dict(product_id=product_id, since=since.isoformat() if since else None)
+    before_id = None
+    if cursor:
+        try:
+            before, before_id = decode_cursor(cursor, kind, **scope)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # One more entry than needed tells us whether there is a next page
+    if resolution != "raw":
+        columns = None
+        if fast_json.FAST_JSON_RESPONSES:
+            model = crud.ROLLUP_MODELS[resolution]
+            columns = fast_json.schema_columns(schemas.PriceBucketResponse, model) + [model.id]
+        entries = crud.get_price_rollups(
+            db, product_id, resolution, limit=limit + 1, since=since, before=before, columns=columns
+        )
+    else:
+        entries = crud.get_price_history(db, product_id, limit=limit + 1, since=since, before=before, before_id=before_id)
+    
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        if resolution == "raw":
+            last_at, last_id = last['recorded_at'], last['id']
+        elif fast_json.FAST_JSON_RESPONSES:
+            last_at, last_id = last.recorded_at, last.id
+        else:
+            last_at, last_id = last.bucket_start, last.id
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(kind, last_at, last_id, **scope)
+    
+    if fast_json.FAST_JSON_RESPONSES:
+        if resolution == "raw":
+            # Points are already dicts of exactly the PriceHistoryResponse fields
+            body = fast_json.dumps(entries)
+        else:
+            body = fast_json.rows_to_json(BUCKET_FIELDS, entries)
+        return fast_json.json_response(body, _next_cursor_headers(response))
+    return entries
+
+@app.get("/api/export/{dataset}")
+def export_dataset(
+    dataset: Literal["products", "history"],
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    product_id: Optional[List[int]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Stream every product or price history row, for bulk analysis
+    
+    Rows are streamed from a server-side cursor as they are read, so the
+    export uses constant memory. See export.py for the columns.
+    """
+    try:
+        chunks = export.stream_export(dataset, format, product_id, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = "jsonl" if format == "ndjson" else format
+    return StreamingResponse(
+        chunks,
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'}
+    )
+
+@app.get("/api/analytics", response_model=schemas.AnalyticsResponse)
+def get_analytics(
+    product_id: Optional[List[int]] = Query(None),
+    lowest_in: Optional[int] = None,
+    min_percent_off: Optional[float] = None,
+    sort: Literal["product_id", "percent_off_high", "volatility"] = "product_id",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=ANALYTICS_PAGE_MAX)
+):
+    """
+    Moving averages, volatility, percent-off-high and lowest-in-N-days
+    flags for every product
+
+    Computed for all products at once and cached until the next writes,
+    which recompute only the products they touched (see analytics.py).
+    lowest_in keeps products at their lowest price in that many days and
+    must be one of the configured windows.
+    """
+    if lowest_in is not None and lowest_in not in ANALYTICS_LOW_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"lowest_in must be one of {', '.join(map(str, ANALYTICS_LOW_DAYS))}"
+        )
+    page = get_analytics_cache().query(
+        product_ids=product_id,
+        lowest_in=lowest_in,
+        min_percent_off=min_percent_off,
+        sort=sort,
+        skip=skip,
+        limit=limit
+    )
+    return fast_json.json_response(fast_json.dumps(page))
+
+@app.get("/api/analytics/stats")
+def analytics_stats():
+    """Analytics cache hits, partial and full recomputes"""
+    return get_analytics_cache().snapshot()
 
 @app.delete("/api/products/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(get_db)):
@@ -150,4 +571,69 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     success = crud.delete_product(db, product_id)
     if not success:
         raise HTTPException(status_code=404, detail="Product not found")
-    return {"status": "deleted", "product_id": product_id}
\ No newline at end of file
+    return {"status": "deleted", "product_id": product_id}
+
+@app.post("/api/alerts", response_model=schemas.AlertResponse, status_code=201)
+def create_alert(request: schemas.AlertCreateRequest, db: Session = Depends(get_db)):
+    """Register a price-drop alert, evaluated on the product's next price writes"""
+    if crud.get_product_by_id(db, request.product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    alert = crud.create_alert(
+        db,
+        product_id=request.product_id,
+        target_price=request.target_price,
+        percent_off_high=request.percent_off_high,
+        cooldown_seconds=request.cooldown_seconds
+    )
+    get_alert_engine().add(
+        alert.id, alert.product_id, alert.target_price, alert.percent_off_high, alert.cooldown_seconds
+    )
+    return alert
+
+@app.get("/api/alerts", response_model=List[schemas.AlertResponse])
+def get_alerts(
+    product_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Registered alerts, optionally for one product"""
+    return crud.get_alerts(db, product_id=product_id, skip=skip, limit=limit)
+
+@app.get("/api/alerts/stats")
+def alert_stats():
+    """Alert index size and evaluation/fire/cooldown counters"""
+    return get_alert_engine().snapshot()
+
+@app.get("/api/stream")
+async def stream_events(
+    request: Request,
+    product_id: Optional[List[int]] = Query(None),
+    last_event_id: Optional[str] = Query(None, description="Resume point, for clients that can't send Last-Event-ID")
+):
+    """Server-sent events for product creates, updates, deletes and price changes (see stream.py)"""
+    if product_id and len(product_id) > STREAM_PRODUCTS_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {STREAM_PRODUCTS_MAX} products per stream")
+    try:
+        events = get_stream_hub().subscribe(product_id, request.headers.get("last-event-id") or last_event_id)
+    except StreamFull:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers")
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # No proxy buffering or caching of the event stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/stream/stats")
+def stream_stats():
+    """Stream subscribers, replay size and event counters"""
+    return get_stream_hub().snapshot()
+
+@app.delete("/api/alerts/{alert_id}")
+def delete_alert(alert_id: int, db: Session = Depends(get_db)):
+    """Remove an alert"""
+    if not crud.delete_alert(db, alert_id):
+        raise HTTPException(status_code=404, detail="Alert not found")
+    get_alert_engine().remove(alert_id)
+    return {"status": "deleted", "alert_id": alert_id}
@@ -0,0 +1,288 @@
+# backend/metrics.py
+"""
+In-process metrics in Prometheus text format
+
+Histograms and counters for the stages of a scrape, the database write
+path and HTTP requests, served at GET /metrics. With METRICS_ENABLED off,
+observe()/inc() return immediately and time() hands back a shared no-op
+context manager, so instrumented code costs next to nothing.
+
+Only the HTTP middleware needs registering; main.py skips it when
+metrics are disabled.
+
+Parse pool workers run in other processes: ParsePool.parse captures what
+a worker observes and replays it into the parent's registry (see
+capture() and replay()).
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = nullcontext()
+
+
+class Distribution:
+    """Observations in fixed buckets, plus count, sum and max"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, capped at max"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self, scale: float = 1000, suffix: str = "_ms") -> Dict[str, Any]:
+        """Summary with values multiplied by scale (seconds to ms by default)"""
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            f"total{suffix}": round(self.total * scale, 3),
+            f"mean{suffix}": round(mean * scale, 3),
+            f"p50{suffix}": round(self.quantile(0.5) * scale, 3),
+            f"p99{suffix}": round(self.quantile(0.99) * scale, 3),
+            f"max{suffix}": round(self.max * scale, 3),
+        }
+
+    def prometheus_lines(self, name: str, labels: str) -> Iterator[str]:
+        """_bucket/_sum/_count samples; labels is the rendered label list"""
+        prefix = f"{labels}," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.total}"
+        yield f"{name}_count{suffix} {self.count}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _labels(self, values: Tuple[str, ...]) -> str:
+        return ",".join(f'{label}="{_escape(value)}"' for label, value in zip(self.labelnames, values))
+
+    def prometheus_lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        if _capturing(self.name, labels, amount):
+            return
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def prometheus_lines(self) -> Iterator[str]:
+        yield from super().prometheus_lines()
+        with self._lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            rendered = self._labels(labels)
+            yield f"{self.name}{{{rendered}}} {value}" if rendered else f"{self.name} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self.values: Dict[Tuple[str, ...], Distribution] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        if _capturing(self.name, labels, value):
+            return
+        with self._lock:
+            distribution = self.values.get(labels)
+            if distribution is None:
+                distribution = self.values[labels] = Distribution(self.buckets)
+            distribution.observe(value)
+
+    def time(self, *labels: str):
+        """Context manager observing the seconds spent inside it"""
+        if not METRICS_ENABLED:
+            return _NULL_TIMER
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: Tuple[str, ...]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def prometheus_lines(self) -> Iterator[str]:
+        yield from super().prometheus_lines()
+        with self._lock:
+            values = [(labels, distribution) for labels, distribution in self.values.items()]
+        for labels, distribution in values:
+            yield from distribution.prometheus_lines(self.name, self._labels(labels))
+
+
+_registry: Dict[str, _Metric] = {}
+# Functions returning extra exposition lines (e.g. cache counters kept elsewhere)
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[str]]) -> None:
+    _collectors.append(collector)
+
+
+def counter_lines(name: str, documentation: str, label: str, values: Dict[str, float]) -> Iterator[str]:
+    """Exposition lines for counters kept as a plain dict elsewhere"""
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} counter"
+    for key, value in list(values.items()):
+        yield f'{name}{{{label}="{_escape(key)}"}} {value}'
+
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in list(_registry.values()):
+        lines.extend(metric.prometheus_lines())
+    for collector in _collectors:
+        lines.extend(collector())
+    lines.append("")
+    return "\n".join(lines)
+
+
+async def request_middleware(request, call_next):
+    """HTTP middleware observing request latency by route template"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        # Unmatched paths share one label so scanners can't grow the series
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        )
+
+
+# ---- capture/replay across processes ----
+
+_capture = threading.local()
+
+
+def _capturing(name: str, labels: Tuple[str, ...], value: float) -> bool:
+    observations = getattr(_capture, "observations", None)
+    if observations is None:
+        return False
+    observations.append((name, labels, value))
+    return True
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, Tuple[str, ...], float]]]:
+    """Collect observations made in this thread instead of recording them"""
+    previous = getattr(_capture, "observations", None)
+    _capture.observations = []
+    try:
+        yield _capture.observations
+    finally:
+        _capture.observations = previous
+
+
+def replay(observations: Optional[Iterable[Tuple[str, Tuple[str, ...], float]]]) -> None:
+    """Record observations captured elsewhere (e.g. in a parse pool worker)"""
+    for name, labels, value in observations or ():
+        metric = _registry.get(name)
+        if isinstance(metric, Histogram):
+            metric.observe(value, *labels)
+        elif isinstance(metric, Counter):
+            metric.inc(*labels, amount=value)
+
+
+# ---- application metrics ----
+
+SCRAPE_STAGE_SECONDS = Histogram(
+    "pricefighter_scrape_stage_seconds",
+    "Time spent per scrape stage: connect (DNS + TCP), tls, wait (time to first byte), "
+    "download, prescan, parse (HTML tree), extract (name and price)",
+    ("stage",),
+)
+PRICE_STRATEGY_TOTAL = Counter(
+    "pricefighter_price_strategy_total",
+    "Parsed pages by the price extraction strategy that succeeded "
+    "(offscreen, whole_fraction, text_scan, none)",
+    ("strategy",),
+)
+SCRAPES_TOTAL = Counter(
+    "pricefighter_scrapes_total",
+    "Scrapes by outcome (ok, no_data, error)",
+    ("outcome",),
+)
+WRITE_STAGE_SECONDS = Histogram(
+    "pricefighter_write_stage_seconds",
+    "Time spent per stage of the crud write path",
+    ("operation", "stage"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "pricefighter_http_request_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
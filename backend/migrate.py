@@ -0,0 +1,312 @@
+# backend/migrate.py
+"""
+Lightweight schema migrations
+
+Base.metadata.create_all() only creates missing tables. This script also
+adds columns and indexes that were introduced on existing tables, then runs
+the data migrations in MIGRATIONS. Every step is idempotent, so it is safe
+to run on each deploy:
+
+    python migrate.py
+    python migrate.py --merge-dry-run   # list duplicate products without merging
+"""
+import argparse
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import and_, exists, func, inspect, text, update
+from sqlalchemy.schema import CreateColumn
+
+import crud
+import recheck
+from canonical import canonicalize
+from database import engine, Base, SessionLocal
+from models import Product, PriceHistory, PriceRollupDaily, ScrapeJob
+
+BACKFILL_CHUNK = 1000
+
+# (table, old name, new name), applied before missing columns are added
+RENAMED_COLUMNS = [
+    ("price_history", "recorded_at", "first_seen_at"),
+]
+
+
+def rename_columns():
+    """Rename columns whose model attribute was renamed, keeping their data"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table, old, new in RENAMED_COLUMNS:
+        if table not in tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        if old in existing and new not in existing:
+            print(f"Renaming column {table}.{old} to {new}")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}"))
+
+
+def sync_schema():
+    """Create missing tables, then add missing columns and indexes"""
+    rename_columns()
+    Base.metadata.create_all(bind=engine)
+    fail_duplicate_jobs()
+    inspector = inspect(engine)
+    
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            print(f"Adding column {table.name}.{column.name}")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def fail_duplicate_jobs():
+    """
+    Leave one queued or running job per URL, the oldest
+    
+    Needed before ix_scrape_jobs_active_url can be created: concurrent
+    enqueues could insert several jobs for one URL before it existed.
+    """
+    db = SessionLocal()
+    try:
+        active = ScrapeJob.status.in_(crud.JOB_ACTIVE_STATUSES)
+        keep = (
+            db.query(ScrapeJob.url, func.min(ScrapeJob.id).label('id'))
+            .filter(active)
+            .group_by(ScrapeJob.url)
+            .having(func.count() > 1)
+            .all()
+        )
+        failed = 0
+        for url, job_id in keep:
+            failed += db.query(ScrapeJob).filter(active, ScrapeJob.url == url, ScrapeJob.id != job_id).update(
+                {'status': 'failed', 'error': f"Duplicate of job {job_id}", 'finished_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+        db.commit()
+        
+        if failed:
+            print(f"Marked {failed} duplicate scrape jobs failed")
+    finally:
+        db.close()
+
+
+def backfill_next_check_at():
+    """Give products created before adaptive re-checks a schedule from their history"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            products = (
+                db.query(Product)
+                .filter(Product.next_check_at.is_(None))
+                .order_by(Product.id)
+                .limit(BACKFILL_CHUNK)
+                .all()
+            )
+            if not products:
+                break
+            
+            points = crud.get_recent_price_points(
+                db, [product.id for product in products], recheck.lookback_start(now)
+            )
+            for product in products:
+                product.unchanged_checks = product.unchanged_checks or 0
+                product.next_check_at = recheck.next_check_at(
+                    points.get(product.id, []), 0, product.last_checked_at
+                )
+            db.commit()
+            total += len(products)
+        
+        if total:
+            print(f"Scheduled next check for {total} products")
+    finally:
+        db.close()
+
+
+def merge_duplicate_products(dry_run: bool = False):
+    """
+    Key products by (marketplace, ASIN) and merge URL variants of one product
+    
+    Each group keeps the row that already has the key, else the oldest one;
+    the others' history is moved onto it and they are deleted.
+    """
+    db = SessionLocal()
+    try:
+        groups: Dict[Tuple[str, str], List[Tuple[int, bool]]] = {}
+        rows = db.query(Product.id, Product.url, Product.asin).order_by(Product.id).yield_per(BACKFILL_CHUNK)
+        for product_id, url, asin in rows:
+            canonical = canonicalize(url)
+            if canonical:
+                groups.setdefault((canonical.marketplace, canonical.asin), []).append((product_id, asin is not None))
+        
+        pending = {key: ids for key, ids in groups.items() if len(ids) > 1 or not ids[0][1]}
+        merged = moved = keyed = 0
+        for n, ((marketplace, asin), ids) in enumerate(pending.items(), 1):
+            survivor_id = next((product_id for product_id, has_key in ids if has_key), ids[0][0])
+            duplicate_ids = [product_id for product_id, _ in ids if product_id != survivor_id]
+            if dry_run:
+                if duplicate_ids:
+                    print(f"Would merge products {duplicate_ids} into #{survivor_id} ({marketplace} {asin})")
+                merged += len(duplicate_ids)
+                continue
+            
+            products = db.query(Product).filter(Product.id.in_([product_id for product_id, _ in ids])).all()
+            by_id = {product.id: product for product in products}
+            survivor = by_id[survivor_id]
+            moved += crud.merge_products(db, survivor, [by_id[product_id] for product_id in duplicate_ids])
+            # Duplicates are gone, so the canonical URL and key are free to take
+            db.flush()
+            canonical = canonicalize(survivor.url)
+            survivor.url = canonical.url
+            survivor.marketplace = marketplace
+            survivor.asin = asin
+            merged += len(duplicate_ids)
+            keyed += 1
+            if n % BACKFILL_CHUNK == 0:
+                db.commit()
+        db.commit()
+        
+        if dry_run:
+            print(f"{merged} duplicate products would be merged")
+        elif keyed:
+            print(f"Keyed {keyed} products by ASIN, merged {merged} duplicates ({moved} history rows moved)")
+    finally:
+        db.close()
+
+
+def compact_price_history():
+    """
+    Collapse runs of identical history rows into change intervals
+    
+    Rows written before change-only storage hold one observation each; each
+    run of equal (price, currency) rows becomes its first row with
+    last_seen_at set to the run's last observation.
+    """
+    db = SessionLocal()
+    try:
+        removed = 0
+        last_id = 0
+        while True:
+            product_ids = [
+                product_id for (product_id,) in
+                db.query(PriceHistory.product_id)
+                .filter(PriceHistory.product_id > last_id)
+                .group_by(PriceHistory.product_id)
+                .order_by(PriceHistory.product_id)
+                .limit(BACKFILL_CHUNK)
+            ]
+            if not product_ids:
+                break
+            last_id = product_ids[-1]
+            
+            rows = (
+                db.query(PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.currency,
+                         PriceHistory.first_seen_at, PriceHistory.last_seen_at)
+                .filter(PriceHistory.product_id.in_(product_ids))
+                .order_by(PriceHistory.product_id, PriceHistory.first_seen_at, PriceHistory.id)
+            )
+            updates, deletes = [], []
+            run = None
+            for row_id, product_id, price, currency, first_seen_at, last_seen_at in rows:
+                seen_until = last_seen_at or first_seen_at
+                if run and run['product_id'] == product_id and run['key'] == (price, currency):
+                    run['last_seen_at'] = max(run['last_seen_at'], seen_until)
+                    run['changed'] = True
+                    deletes.append(row_id)
+                    continue
+                if run and run['changed']:
+                    updates.append({'id': run['id'], 'last_seen_at': run['last_seen_at']})
+                run = {
+                    'id': row_id,
+                    'product_id': product_id,
+                    'key': (price, currency),
+                    'last_seen_at': seen_until,
+                    'changed': last_seen_at is None,
+                }
+            if run and run['changed']:
+                updates.append({'id': run['id'], 'last_seen_at': run['last_seen_at']})
+            
+            if updates:
+                db.execute(update(PriceHistory), updates)
+            for i in range(0, len(deletes), BACKFILL_CHUNK):
+                db.query(PriceHistory).filter(
+                    PriceHistory.id.in_(deletes[i:i + BACKFILL_CHUNK])
+                ).delete(synchronize_session=False)
+            db.commit()
+            removed += len(deletes)
+        
+        if removed:
+            print(f"Compacted price history, removed {removed} unchanged observations")
+    finally:
+        db.close()
+
+
+def backfill_price_rollups():
+    """
+    Build hourly/daily rollups from history for products that have none
+    
+    Checked per product, not per table: earlier migrations (e.g. merging
+    duplicates) already rebuild rollups for the products they touch.
+    Every observation lands in both tables, so a product without daily
+    rows has no rollups at all.
+    """
+    db = SessionLocal()
+    try:
+        missing = and_(
+            exists().where(PriceHistory.product_id == Product.id),
+            ~exists().where(PriceRollupDaily.product_id == Product.id)
+        )
+        total = 0
+        last_id = 0
+        while True:
+            product_ids = [
+                product_id for (product_id,) in
+                db.query(Product.id).filter(Product.id > last_id, missing).order_by(Product.id).limit(BACKFILL_CHUNK)
+            ]
+            if not product_ids:
+                break
+            last_id = product_ids[-1]
+            total += crud.rebuild_rollups(db, product_ids)
+            db.commit()
+        
+        if total:
+            print(f"Built price rollups from {total} history observations")
+    finally:
+        db.close()
+
+
+# Data migrations, run in order after sync_schema()
+MIGRATIONS: List[Callable[[], None]] = [
+    backfill_next_check_at,
+    merge_duplicate_products,
+    compact_price_history,
+    backfill_price_rollups,
+]
+
+
+def run_migrations():
+    print("Migrating database schema...")
+    sync_schema()
+    for migration in MIGRATIONS:
+        migration()
+    print("✅ Database is up to date!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the PriceFighter database")
+    parser.add_argument("--merge-dry-run", action="store_true", help="only list products that would be merged")
+    args = parser.parse_args()
+    
+    if args.merge_dry_run:
+        sync_schema()
+        merge_duplicate_products(dry_run=True)
+    else:
+        run_migrations()
@@ -1,6 +1,6 @@
 # backend/models.py
 from __future__ import annotations
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, Index, Text, text, true
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from database import Base
 from datetime import datetime
@@ -8,6 +8,16 @@ from typing import Optional, List
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # One row per product: every URL variant of an ASIN maps here (see canonical.py)
+        Index("ix_products_marketplace_asin", "marketplace", "asin", unique=True),
+        # Keyset pagination of the listing, newest first, optionally per retailer/currency
+        Index("ix_products_updated_id", "updated_at", "id"),
+        Index("ix_products_retailer_updated_id", "retailer", "updated_at", "id"),
+        Index("ix_products_currency_updated_id", "currency", "updated_at", "id"),
+        # Selective price range filters
+        Index("ix_products_current_price", "current_price"),
+    )
     
     # Use Mapped[] for proper type hints
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -22,21 +32,138 @@ class Product(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_checked_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
+    # Canonical identity, NULL for URLs that don't carry an ASIN
+    marketplace: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    asin: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    
+    # Adaptive re-check schedule (see recheck.py), indexed for "what's due now"
+    next_check_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    unchanged_checks: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    
     # Relationship
     price_history: Mapped[List["PriceHistory"]] = relationship(
         "PriceHistory", 
         back_populates="product",
         cascade="all, delete-orphan"
     )
+    hourly_rollups: Mapped[List["PriceRollupHourly"]] = relationship(
+        "PriceRollupHourly",
+        cascade="all, delete-orphan"
+    )
+    daily_rollups: Mapped[List["PriceRollupDaily"]] = relationship(
+        "PriceRollupDaily",
+        cascade="all, delete-orphan"
+    )
+    alerts: Mapped[List["PriceAlert"]] = relationship(
+        "PriceAlert",
+        cascade="all, delete-orphan"
+    )
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
+    __table_args__ = (
+        # Per-product history reads filter on product_id and order by time
+        Index("ix_price_history_product_first_seen", "product_id", "first_seen_at"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id"))
     price: Mapped[float] = mapped_column(Float)
     currency: Mapped[str] = mapped_column(String)
-    recorded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Each row is a run of identical observations: the price was seen at
+    # first_seen_at and at every check until last_seen_at. An unchanged check
+    # extends the product's latest row instead of adding one.
+    first_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_seen_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
     # Relationship
-    product: Mapped["Product"] = relationship("Product", back_populates="price_history")
\ No newline at end of file
+    product: Mapped["Product"] = relationship("Product", back_populates="price_history")
+
+class PriceRollup:
+    """
+    Columns shared by the rollup tables: one row per product per time bucket,
+    updated on every observation (see crud.record_rollups)
+    """
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id"))
+    bucket_start: Mapped[datetime] = mapped_column(DateTime)
+    currency: Mapped[str] = mapped_column(String)
+    open: Mapped[float] = mapped_column(Float)
+    low: Mapped[float] = mapped_column(Float)
+    high: Mapped[float] = mapped_column(Float)
+    close: Mapped[float] = mapped_column(Float)
+    # Time of the observation that set close
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime)
+    samples: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+
+class PriceRollupHourly(PriceRollup, Base):
+    __tablename__ = "price_rollup_hourly"
+    __table_args__ = (
+        Index("ix_price_rollup_hourly_product_bucket", "product_id", "bucket_start", unique=True),
+    )
+
+class PriceRollupDaily(PriceRollup, Base):
+    __tablename__ = "price_rollup_daily"
+    __table_args__ = (
+        Index("ix_price_rollup_daily_product_bucket", "product_id", "bucket_start", unique=True),
+    )
+
+class PriceAlert(Base):
+    """
+    Price-drop alert on one product, evaluated on every price write (see alerts.py)
+    
+    Fires when the price is at or below target_price, or at least
+    percent_off_high percent below the product's highest_price, whichever
+    is set. After firing it stays disarmed until the condition clears, and
+    never fires again within cooldown_seconds.
+    """
+    __tablename__ = "price_alerts"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id"), index=True)
+    target_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    percent_off_high: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # NULL uses ALERT_COOLDOWN_SECONDS
+    cooldown_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    armed: Mapped[bool] = mapped_column(Boolean, default=True, server_default=true())
+    last_fired_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_fired_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class ScrapeJob(Base):
+    """
+    Queued scrape of one URL, run by worker processes (see worker.py)
+    
+    A job can be leased while status is queued or running and available_at
+    has passed. Leasing sets status to running and pushes available_at out
+    by the visibility timeout, so the job becomes leasable again if its
+    worker dies without finishing it. lease_id identifies the current lease.
+    Only that lease can complete the job or extend it.
+    """
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        # Lease scans: leasable jobs, oldest available first
+        Index("ix_scrape_jobs_status_available", "status", "available_at"),
+        # At most one queued or running job per URL (see crud.enqueue_job)
+        Index(
+            "ix_scrape_jobs_active_url", "url", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    url: Mapped[str] = mapped_column(String, index=True)
+    # queued, running, succeeded or failed
+    status: Mapped[str] = mapped_column(String, default="queued", server_default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer)
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    lease_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    worker: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    product_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,69 @@
+# backend/pagination.py
+"""
+Opaque continuation tokens for keyset pagination
+
+A cursor records the sort key of the last row a client has seen, e.g.
+(updated_at, id) for the product listing, so the next page is a range
+scan on an index starting right after that row. Unlike OFFSET, the cost
+of a page doesn't grow with its depth.
+
+Tokens are URL-safe base64 JSON. They are opaque to clients, who pass
+back the X-Next-Cursor header of one page as ?cursor= to get the next.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Cursor token that wasn't issued by this API, or is for another listing"""
+
+
+def encode_cursor(kind: str, last_at: datetime, last_id: int, **scope: Any) -> str:
+    """
+    Encode the sort key of the last row on a page
+
+    Args:
+        kind: Listing the cursor belongs to, checked on decode
+        last_at: Timestamp the listing is ordered by
+        last_id: Row id, breaks ties between equal timestamps
+        scope: Filters the cursor is only valid with
+    """
+    payload = {"k": kind, "t": last_at.isoformat(), "i": last_id}
+    scope = _set_filters(scope)
+    if scope:
+        payload["s"] = scope
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, kind: str, **scope: Any) -> Tuple[datetime, int]:
+    """
+    Decode a cursor issued by encode_cursor for the same listing and filters
+
+    Returns:
+        Tuple of (last_at, last_id)
+
+    Raises:
+        InvalidCursor: If the token is malformed or doesn't match kind/scope
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload: Dict[str, Any] = json.loads(raw)
+        last_at = datetime.fromisoformat(payload["t"])
+        last_id = int(payload["i"])
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if payload.get("k") != kind:
+        raise InvalidCursor("Cursor belongs to a different listing")
+    if payload.get("s", {}) != _set_filters(scope):
+        raise InvalidCursor("Cursor was issued for different filters")
+    return last_at, last_id
+
+
+def _set_filters(scope: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in scope.items() if value is not None}
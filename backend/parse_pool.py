@@ -0,0 +1,135 @@
+# backend/parse_pool.py
+"""
+Multi-core parse pool for scraper workers
+
+BeautifulSoup parsing is CPU-bound and holds the GIL, so one process can
+only parse one page at a time. ParsePool hands raw page bytes to a pool of
+warm worker processes that run AmazonScraper.parse and send back only the
+small result dict. The number of pages waiting for a worker is bounded, so
+a flood of fetched pages applies backpressure to the fetchers instead of
+piling up in memory.
+
+Enable with PARSE_POOL_WORKERS > 0; the shared pool is used by the bulk
+tracking endpoint and the refresh scheduler.
+
+Stage timings and strategy counts observed in a worker are shipped back
+with the result and recorded in the parent's metrics.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from scraper import AmazonScraper, SCRAPER_PARSER
+
+logger = logging.getLogger(__name__)
+
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", "0"))
+# Pages queued or in flight at once; defaults to 4 per worker
+PARSE_POOL_MAX_PENDING = int(os.getenv("PARSE_POOL_MAX_PENDING", "0"))
+
+# Per-process scraper, created by the pool initializer
+_worker_scraper: Optional[AmazonScraper] = None
+
+_WARMUP_PAGE = (
+    b'<html><body><span id="productTitle">warmup</span>'
+    b'<span class="a-price"><span class="a-offscreen">$1.00</span></span></body></html>'
+)
+
+
+def _init_worker(parser: str) -> None:
+    """Build the scraper and exercise the parser once so imports are paid up front"""
+    global _worker_scraper
+    logging.getLogger("scraper").setLevel(logging.ERROR)
+    _worker_scraper = AmazonScraper(parser=parser)
+    with metrics.capture():
+        _worker_scraper.parse(_WARMUP_PAGE, "warmup")
+
+
+def _parse_in_worker(content: bytes, url: str) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """Parse result plus the metric observations made while parsing"""
+    with metrics.capture() as observations:
+        result = _worker_scraper.parse(content, url)
+    return result, observations
+
+
+def _ping(delay: float) -> int:
+    time.sleep(delay)
+    return os.getpid()
+
+
+class ParsePool:
+    """Process pool running AmazonScraper.parse with bounded pending work"""
+    
+    def __init__(
+        self,
+        workers: int,
+        max_pending: Optional[int] = None,
+        parser: str = SCRAPER_PARSER,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(parser,),
+        )
+        self._sync_slots = threading.BoundedSemaphore(self.max_pending)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._async_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def warm(self) -> None:
+        """Start every worker process now instead of on first use"""
+        futures = [self._executor.submit(_ping, 0.05) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"Parse pool ready: {len(pids)} worker processes")
+    
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._async_slots is None or self._async_slots_loop is not loop:
+            self._async_slots = asyncio.Semaphore(self.max_pending)
+            self._async_slots_loop = loop
+        return self._async_slots
+    
+    async def parse(self, content: bytes, url: str) -> Optional[Dict[str, Any]]:
+        """Parse a page in a worker process, waiting for a free slot first"""
+        async with self._slots():
+            loop = asyncio.get_running_loop()
+            result, observations = await loop.run_in_executor(self._executor, _parse_in_worker, content, url)
+        metrics.replay(observations)
+        return result
+    
+    def parse_sync(self, content: bytes, url: str) -> Optional[Dict[str, Any]]:
+        """Blocking variant of parse() for threaded callers"""
+        with self._sync_slots:
+            result, observations = self._executor.submit(_parse_in_worker, content, url).result()
+        metrics.replay(observations)
+        return result
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared_pool: Optional[ParsePool] = None
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    """Shared pool sized by PARSE_POOL_WORKERS, or None to parse in-process"""
+    global _shared_pool
+    if PARSE_POOL_WORKERS <= 0:
+        return None
+    if _shared_pool is None:
+        _shared_pool = ParsePool(PARSE_POOL_WORKERS, PARSE_POOL_MAX_PENDING or None)
+        _shared_pool.warm()
+    return _shared_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _shared_pool
+    if _shared_pool is not None:
+        _shared_pool.shutdown()
+        _shared_pool = None
@@ -0,0 +1,180 @@
+# backend/prescan.py
+"""
+Targeted pre-scan of Amazon product pages
+
+Building a full BeautifulSoup tree for a 1-2 MB product page is the most
+expensive part of a scrape, yet extraction only looks at the title element
+and the `a-price*` elements. These helpers slice those elements (with their
+full subtree) out of the raw HTML so only a few KB need to be parsed.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Opening tag of the first #productTitle / #title element (same priority as
+# AmazonScraper._extract_name), tried at a '<' found ahead of a cheap str.find
+_TITLE_MARKERS = [
+    ('productTitle', re.compile(r'<([a-zA-Z][\w-]*)\b[^>]*?\bid\s*=\s*["\']?productTitle\b', re.I)),
+    ('title', re.compile(r'<([a-zA-Z][\w-]*)\b[^>]*?\bid\s*=\s*["\']?title["\'\s>]', re.I)),
+]
+
+# Opening tag of any element carrying an a-price, a-price-whole, ... class
+_PRICE_MARKER = 'a-price'
+_PRICE_RE = re.compile(r'<([a-zA-Z][\w-]*)\b[^>]*?\bclass\s*=\s*["\']?[^"\'>]*?\ba-price', re.I)
+
+_TAG_RES = {}
+
+
+def _tag_re(tag: str) -> "re.Pattern[str]":
+    pattern = _TAG_RES.get(tag)
+    if pattern is None:
+        pattern = _TAG_RES[tag] = re.compile(r'<(/?)' + re.escape(tag) + r'\b[^>]*?(/?)>', re.I)
+    return pattern
+
+
+def element_end(html: str, start: int, tag: str) -> Optional[int]:
+    """
+    Index just past the closing tag of the element opened at `start`
+    
+    Returns None if the element is not closed within `html` (malformed
+    markup, or a truncated page while streaming).
+    """
+    depth = 0
+    for match in _tag_re(tag.lower()).finditer(html, start):
+        if match.group(1):
+            depth -= 1
+        elif not match.group(2):
+            depth += 1
+        if depth == 0:
+            return match.end()
+    return None
+
+
+def _find_tag(html: str, marker: str, pattern: "re.Pattern[str]", pos: int = 0) -> Optional["re.Match[str]"]:
+    """
+    First opening tag at or after `pos` matching `pattern` that contains `marker`
+    
+    Scanning for the marker string and only running the regex on the
+    enclosing tag is far cheaper than running the regex at every '<'.
+    """
+    while True:
+        found = html.find(marker, pos)
+        if found == -1:
+            return None
+        lt = html.rfind('<', pos, found)
+        if lt != -1 and html.rfind('>', lt, found) == -1:
+            match = pattern.match(html, lt)
+            if match and match.end() > found:
+                return match
+        pos = found + len(marker)
+
+
+def find_title(html: str) -> Optional[Tuple[int, int]]:
+    """(start, end) of the title element, or None if absent/unclosed"""
+    for marker, pattern in _TITLE_MARKERS:
+        match = _find_tag(html, marker, pattern)
+        if match:
+            end = element_end(html, match.start(), match.group(1))
+            return (match.start(), end) if end is not None else None
+    return None
+
+
+def find_price_regions(html: str, start: int = 0) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Outermost a-price* elements from `start` on, in document order
+    
+    Returns:
+        Tuple of (regions, complete). complete is False if an element was
+        left unclosed, in which case later regions are unknown.
+    """
+    regions = []
+    pos = start
+    while True:
+        match = _find_tag(html, _PRICE_MARKER, _PRICE_RE, pos)
+        if not match:
+            return regions, True
+        end = element_end(html, match.start(), match.group(1))
+        if end is None:
+            return regions, False
+        regions.append((match.start(), end))
+        pos = end
+
+
+def prescan_fragment(html: str) -> Optional[str]:
+    """
+    Small HTML fragment holding the title and every price element
+    
+    Selectors run against the fragment give the same first match as
+    against the whole page, because every candidate element is kept
+    whole and in document order. Returns None if the page could not be
+    sliced reliably; callers should then parse the full page.
+    """
+    title = find_title(html)
+    regions, complete = find_price_regions(html)
+    if title is None or not complete:
+        return None
+    
+    return _join_spans(html, [title] + regions)
+
+
+def _join_spans(html: str, spans: List[Tuple[int, int]]) -> str:
+    """Concatenate spans in document order, dropping spans nested in an earlier one"""
+    parts = []
+    last_end = -1
+    for start, end in sorted(spans):
+        if start >= last_end:
+            parts.append(html[start:end])
+            last_end = end
+    return "\n".join(parts)
+
+
+class StreamingPrescan:
+    """
+    Incremental pre-scan over a page that arrives in chunks
+    
+    Tracks the #productTitle element and every completed a-price* element
+    seen so far without rescanning the whole buffer on each chunk. Only
+    #productTitle counts as a title here: a #title element in the prefix
+    could still be pre-empted by a #productTitle further down the page.
+    """
+    
+    def __init__(self):
+        self.html = ""
+        self.title: Optional[Tuple[int, int]] = None
+        self.regions: List[Tuple[int, int]] = []
+        self._title_pos = 0
+        self._price_pos = 0
+    
+    def feed(self, text: str) -> bool:
+        """Append decoded text; True if the title or a new price element completed"""
+        self.html += text
+        changed = False
+        
+        if self.title is None:
+            marker, pattern = _TITLE_MARKERS[0]
+            match = _find_tag(self.html, marker, pattern, self._title_pos)
+            if match:
+                end = element_end(self.html, match.start(), match.group(1))
+                if end is not None:
+                    self.title = (match.start(), end)
+                    changed = True
+                else:
+                    self._title_pos = match.start()
+            else:
+                self._title_pos = max(self._title_pos, self.html.rfind('<'))
+        
+        regions, complete = find_price_regions(self.html, self._price_pos)
+        if regions:
+            self.regions.extend(regions)
+            self._price_pos = regions[-1][1]
+            changed = True
+        if complete:
+            # Nothing open: later markers can only belong to tags from the last '<' on
+            self._price_pos = max(self._price_pos, self.html.rfind('<'))
+        
+        return changed
+    
+    def fragment(self) -> Optional[str]:
+        """Title plus completed price elements so far, or None before the title completes"""
+        if self.title is None:
+            return None
+        return _join_spans(self.html, [self.title] + self.regions)
@@ -0,0 +1,220 @@
+# backend/price_engine.py
+"""
+Precompiled currency and price extraction
+
+PriceEngine compiles a currency map into regexes once: an alternation of
+every symbol ordered longest first (so "Rs." wins over "Rs" over "R" at
+the same position), and an anchor alternation used with a str.find()
+prefilter to scan page text for the first symbol-adjacent amount. Amounts
+are parsed locale-aware, so "1.234,56", "1,234.56" and "1 234,56"
+(no-break space) all read as 1234.56.
+"""
+import heapq
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Grouped amounts (1,234 / 1.234,56 / 1 234,56) or plain ones (2164.45 / 12,5)
+_NUMBER = r'\d{1,3}(?:[.,\u00a0\u202f]\d{3})+(?:[.,]\d{1,2})?(?!\d)|\d+(?:[.,]\d{1,2})?(?!\d)'
+_NUMBER_RE = re.compile(_NUMBER)
+_DECIMAL_TAIL_RE = re.compile(r'[.,](\d{1,2})$')
+# Longest amount (plus spacing) looked for in front of a suffix symbol
+_MAX_AMOUNT_LENGTH = 32
+_GROUPING_RE = re.compile(r'[.,\u00a0\u202f]')
+# First stretch of page text searched for anchor symbols, grown eightfold as needed
+_SCAN_WINDOW = 4096
+
+
+def parse_amount(token: str) -> Optional[float]:
+    """
+    Parse a matched amount
+    
+    A trailing separator followed by one or two digits is the decimal
+    mark; every other '.', ',' or no-break space is a thousands separator.
+    """
+    tail = _DECIMAL_TAIL_RE.search(token)
+    if tail:
+        whole, fraction = token[:tail.start()], tail.group(1)
+    else:
+        whole, fraction = token, ''
+    whole = _GROUPING_RE.sub('', whole)
+    if not whole.isdigit():
+        return None
+    return float(f"{whole}.{fraction}" if fraction else whole)
+
+
+# Letters from most to least common as a word's first letter, which is where
+# most capitals are
+_INITIAL_FREQUENCY = 'tasoiwcbphfmdrelnguvykjqzx'
+
+
+def _rarity(char: str) -> int:
+    """Lower for characters less likely in page text: symbols, then capitals, then lowercase"""
+    if not (char.isascii() and char.isalpha()):
+        return 0
+    if char.isupper():
+        return len(_INITIAL_FREQUENCY) - _INITIAL_FREQUENCY.index(char.lower())
+    return len(_INITIAL_FREQUENCY) + 1
+
+
+def _alternation(symbols: Iterable[str]) -> str:
+    return '|'.join(re.escape(symbol) for symbol in sorted(set(symbols), key=len, reverse=True))
+
+
+class PriceEngine:
+    """Currency detection and price parsing compiled from a symbol -> code map"""
+    
+    def __init__(
+        self,
+        currency_map: Dict[str, str],
+        scan_prefixes: Iterable[str],
+        scan_suffixes: Iterable[str],
+        default_currency: str = 'USD'
+    ):
+        """
+        Args:
+            currency_map: symbol or code -> ISO currency code
+            scan_prefixes: symbols that mark a price when written before an
+                amount in free page text (Strategy 3)
+            scan_suffixes: symbols that mark a price when written after one
+        """
+        self.currency_map = currency_map
+        self.default_currency = default_currency
+        
+        # Longest symbol at the leftmost position
+        self.symbol_re = re.compile(_alternation(currency_map))
+        
+        # Page scan: anchor symbols are found in document order and the amount is
+        # matched right after a prefix symbol or right before a suffix one. ISO
+        # codes work either way.
+        codes = [s for s in currency_map if s.isalpha() and s.isupper() and len(s) == 3]
+        self.scan_prefixes = set(codes) | set(scan_prefixes)
+        self.scan_suffixes = set(codes) | set(scan_suffixes)
+        anchors = self.scan_prefixes | self.scan_suffixes
+        self.anchor_re = re.compile(_alternation(anchors))
+        # Searching with anchor_re tries the alternation at every position, which is
+        # slow on long pages. Instead each symbol no other symbol is a prefix of ("Rs"
+        # covers "Rs.") gets its rarest character as a key, located with str.find()
+        # (memchr), and anchor_re is only matched where a symbol starts around one.
+        # Lowercase letters are too common to be keys, so such symbols ("kr") are
+        # their own key, searched with a regex (faster than str.find() for those).
+        self.anchor_keys: Dict[str, List[Tuple[int, str]]] = {}
+        for symbol in anchors:
+            if not any(other != symbol and symbol.startswith(other) for other in anchors):
+                offset, key = min(enumerate(symbol), key=lambda item: _rarity(item[1]))
+                if key.isascii() and key.islower():
+                    offset, key = 0, symbol
+                self.anchor_keys.setdefault(key, []).append((offset, symbol))
+        self.key_patterns = {key: re.compile(re.escape(key)) for key in self.anchor_keys if len(key) > 1}
+        self.max_key_offset = max(offset for keyed in self.anchor_keys.values() for offset, _ in keyed)
+        self.amount_after_re = re.compile(rf"\s*({_NUMBER})")
+        self.amount_before_re = re.compile(rf"({_NUMBER})\s*$")
+    
+    def currency_code(self, symbol: str) -> Optional[str]:
+        """Exact symbol lookup, else the longest known symbol the text starts with"""
+        symbol = symbol.strip()
+        code = self.currency_map.get(symbol)
+        if code is not None:
+            return code
+        match = self.symbol_re.match(symbol)
+        return self.currency_map[match.group(0)] if match else None
+    
+    def parse_price_text(self, text: str) -> Tuple[Optional[float], str]:
+        """
+        Parse a price string like "Rs. 2,164.45", "$249.00" or "1.234,56 €"
+        
+        Returns:
+            Tuple of (price, currency_code)
+        """
+        currency = self.default_currency
+        match = self.symbol_re.search(text)
+        if match:
+            currency = self.currency_map[match.group(0)]
+            text = text[:match.start()] + ' ' + text[match.end():]
+        
+        number = _NUMBER_RE.search(text)
+        if number:
+            return parse_amount(number.group(0)), currency
+        return None, currency
+    
+    def _find_key(self, text: str, key: str, pos: int, end: int) -> int:
+        """Position of the first key occurrence within text[pos:end], or -1"""
+        pos = text.find(key[0], pos, end)
+        pattern = self.key_patterns.get(key)
+        if pattern is None or pos < 0:
+            return pos
+        match = pattern.search(text, pos, end)
+        return match.start() if match else -1
+    
+    def _anchors(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        """Yield (symbol, start, end) for every position an anchor symbol starts at, in order"""
+        # Keys are searched for up to limit, which grows until the nearest anchor
+        # is known, so a price near the top doesn't cost a pass over the page
+        limit = 0
+        # Key -> position to search from, for keys with no occurrence before limit
+        waiting = dict.fromkeys(self.anchor_keys, 0)
+        # (position, key) of key occurrences not yet examined, all before limit
+        keys: List[Tuple[int, str]] = []
+        # Starts of symbols found around examined keys
+        starts: List[int] = []
+        last = -1
+        while True:
+            if keys:
+                frontier = keys[0][0]
+            elif limit < len(text):
+                frontier = limit
+            else:
+                frontier = len(text) + self.max_key_offset + 1
+            
+            # Any symbol still to be found starts at frontier - max_key_offset or later
+            if starts and starts[0] + self.max_key_offset < frontier:
+                start = heapq.heappop(starts)
+                if start > last:
+                    last = start
+                    # Longest symbol at this position, as anchor_re.search() would pick
+                    anchor = self.anchor_re.match(text, start)
+                    yield anchor.group(0), start, anchor.end()
+            elif keys:
+                i, key = keys[0]
+                for offset, symbol in self.anchor_keys[key]:
+                    if i >= offset and text.startswith(symbol, i - offset):
+                        heapq.heappush(starts, i - offset)
+                following = self._find_key(text, key, i + 1, limit)
+                if following >= 0:
+                    heapq.heapreplace(keys, (following, key))
+                else:
+                    heapq.heappop(keys)
+                    waiting[key] = max(i + 1, limit - len(key) + 1)
+            elif limit < len(text):
+                limit = min(len(text), limit * 8 or _SCAN_WINDOW)
+                for key, pos in list(waiting.items()):
+                    i = self._find_key(text, key, pos, limit)
+                    if i >= 0:
+                        del waiting[key]
+                        heapq.heappush(keys, (i, key))
+                    else:
+                        waiting[key] = max(pos, limit - len(key) + 1)
+            else:
+                return
+    
+    def scan(self, text: str) -> Tuple[Optional[float], Optional[str]]:
+        """First symbol-adjacent amount in free text, in document order"""
+        for symbol, start, end in self._anchors(text):
+            # Symbols must not be glued to words ("Mrs 5", "10 kroner")
+            if start > 0 and text[start - 1].isalpha() and symbol[0].isalpha():
+                continue
+            
+            amount = None
+            if symbol in self.scan_prefixes:
+                match = self.amount_after_re.match(text, end)
+                if match:
+                    amount = match.group(1)
+            if amount is None and symbol in self.scan_suffixes and not (end < len(text) and text[end].isalpha()):
+                match = self.amount_before_re.search(text, max(0, start - _MAX_AMOUNT_LENGTH), start)
+                if match:
+                    amount = match.group(1)
+            
+            if amount is not None:
+                price = parse_amount(amount)
+                if price is not None:
+                    return price, self.currency_code(symbol)
+        return None, None
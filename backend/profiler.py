@@ -0,0 +1,168 @@
+# backend/profiler.py
+"""
+Sampling profiler for individual requests, behind a debug header
+
+With DEBUG_PROFILE_TOKEN set, a request carrying
+`X-Debug-Profile: <token>` is profiled: while it is handled a background
+thread samples the Python stack of every busy thread each
+DEBUG_PROFILE_INTERVAL_MS. The response gets an X-Profile-Id header, and
+GET /api/debug/profiles/{id} (same header required) returns the samples
+as collapsed stacks, one "frame;frame;frame count" line per distinct
+stack, ready for flamegraph.pl or speedscope.
+
+Samples are process-wide, so concurrent requests show up too; profile on
+a quiet instance when that matters. Requests without the header pay one
+header lookup.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Empty disables profiling
+DEBUG_PROFILE_TOKEN = os.getenv("DEBUG_PROFILE_TOKEN", "")
+DEBUG_PROFILE_INTERVAL_MS = float(os.getenv("DEBUG_PROFILE_INTERVAL_MS", "2"))
+# Finished profiles kept for retrieval, oldest dropped first
+DEBUG_PROFILE_KEEP = int(os.getenv("DEBUG_PROFILE_KEEP", "50"))
+
+PROFILE_HEADER = "X-Debug-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Leaf frames of threads that are waiting, not working
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socket.py", "readinto"),
+    ("socket.py", "accept"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads on a timer until stopped"""
+
+    def __init__(self, interval: float = DEBUG_PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or _is_idle(frame):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile(NamedTuple):
+    route: str
+    duration_ms: float
+    samples: int
+    collapsed: str
+
+
+class ProfileStore:
+    """The last DEBUG_PROFILE_KEEP profiles by id"""
+
+    def __init__(self, keep: int = DEBUG_PROFILE_KEEP):
+        self.keep = keep
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> str:
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+_store = ProfileStore()
+
+
+def get_profile_store() -> ProfileStore:
+    return _store
+
+
+def is_authorized(request: Request) -> bool:
+    """Profiling is enabled and the request carries the debug token"""
+    supplied = request.headers.get(PROFILE_HEADER)
+    if not DEBUG_PROFILE_TOKEN or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode(), DEBUG_PROFILE_TOKEN.encode())
+
+
+async def profile_middleware(request: Request, call_next) -> Response:
+    """HTTP middleware profiling requests that carry the debug header"""
+    if not is_authorized(request):
+        return await call_next(request)
+
+    profiler = SamplingProfiler()
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    duration_ms = (time.perf_counter() - started) * 1000
+    route = request.scope.get("route")
+    profile = Profile(
+        route=f"{request.method} {route.path if route is not None else request.url.path}",
+        duration_ms=round(duration_ms, 1),
+        samples=profiler.samples,
+        collapsed=profiler.collapsed(),
+    )
+    response.headers[PROFILE_ID_HEADER] = _store.add(profile)
+    return response
+
+
+def profile_headers(profile: Profile) -> Dict[str, str]:
+    return {
+        "X-Profile-Route": profile.route,
+        "X-Profile-Duration-Ms": str(profile.duration_ms),
+        "X-Profile-Samples": str(profile.samples),
+    }
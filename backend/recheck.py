@@ -0,0 +1,74 @@
+# backend/recheck.py
+"""
+Volatility-adaptive re-check intervals
+
+The next check time for a product is derived from its recent price points:
+products whose price changes often (or by a lot) are checked sooner,
+products whose price never moves back off geometrically with every
+unchanged check, always within [RECHECK_MIN_SECONDS, RECHECK_MAX_SECONDS].
+"""
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+RECHECK_MIN_SECONDS = float(os.getenv("RECHECK_MIN_SECONDS", str(15 * 60)))
+RECHECK_MAX_SECONDS = float(os.getenv("RECHECK_MAX_SECONDS", str(7 * 24 * 3600)))
+RECHECK_DEFAULT_SECONDS = float(os.getenv("RECHECK_DEFAULT_SECONDS", str(6 * 3600)))
+RECHECK_BACKOFF = float(os.getenv("RECHECK_BACKOFF", "1.5"))
+RECHECK_LOOKBACK_DAYS = float(os.getenv("RECHECK_LOOKBACK_DAYS", "30"))
+# Check this fraction of the mean time between observed changes
+RECHECK_CHANGE_FRACTION = float(os.getenv("RECHECK_CHANGE_FRACTION", "0.5"))
+# How strongly large relative moves shorten the interval
+RECHECK_MAGNITUDE_WEIGHT = float(os.getenv("RECHECK_MAGNITUDE_WEIGHT", "5"))
+
+# (recorded_at, price), oldest first
+PricePoint = Tuple[datetime, float]
+
+
+def lookback_start(now: datetime) -> datetime:
+    """Oldest history timestamp that still influences the interval"""
+    return now - timedelta(days=RECHECK_LOOKBACK_DAYS)
+
+
+def next_check_delay(
+    points: Sequence[PricePoint],
+    unchanged_checks: int,
+    now: datetime,
+    min_seconds: float = RECHECK_MIN_SECONDS,
+    max_seconds: float = RECHECK_MAX_SECONDS,
+    default_seconds: float = RECHECK_DEFAULT_SECONDS,
+    backoff: float = RECHECK_BACKOFF,
+) -> float:
+    """
+    Seconds until a product should be checked again
+    
+    Args:
+        points: price points inside the lookback window, oldest first
+        unchanged_checks: consecutive checks since the price last changed
+        now: time of the check that was just recorded
+    """
+    changes: List[float] = []
+    for (_, previous), (_, price) in zip(points, points[1:]):
+        if price != previous:
+            changes.append(abs(price - previous) / previous if previous else 1.0)
+    
+    if changes:
+        span = (now - points[0][0]).total_seconds()
+        base = span / len(changes) * RECHECK_CHANGE_FRACTION
+        magnitude = sum(changes) / len(changes)
+        base /= 1 + magnitude * RECHECK_MAGNITUDE_WEIGHT
+    else:
+        base = default_seconds
+    
+    delay = base * backoff ** min(unchanged_checks, 32)
+    return max(min_seconds, min(max_seconds, delay))
+
+
+def next_check_at(
+    points: Sequence[PricePoint],
+    unchanged_checks: int,
+    now: Optional[datetime] = None,
+) -> datetime:
+    """Absolute next check time, see next_check_delay()"""
+    now = now or datetime.utcnow()
+    return now + timedelta(seconds=next_check_delay(points, unchanged_checks, now))
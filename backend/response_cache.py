@@ -0,0 +1,306 @@
+# backend/response_cache.py
+"""
+Read-through response cache with ETags for the product read endpoints
+
+Dashboards poll /api/products and /api/products/{id}[/history] far more
+often than the data changes. Successful GET responses of those routes are
+cached as encoded bytes, keyed by path and query string, in a size-bounded
+LRU with a TTL, and served with an ETag; a request whose If-None-Match
+matches gets an empty 304.
+
+Invalidation is driven by crud's write listeners: every cached response
+records the generation of the tags it depends on ("products" for the
+listing, "product:<id>" for one product), and a committed write bumps the
+tags of the products it touched, so stale entries are never served. The
+TTL only bounds staleness from writes made outside this process.
+
+Set RESPONSE_CACHE_REDIS_URL (requires the `redis` package) to share
+entries and generations between API worker processes; without it each
+worker caches, and sees invalidations, on its own.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+import crud
+from scrape_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Optional shared backend, e.g. redis://localhost:6379/1
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "")
+
+# Cached GET routes, and the tags whose writes invalidate them
+CACHED_ROUTES: List[Tuple["re.Pattern[str]", Callable[["re.Match[str]"], Tuple[str, ...]]]] = [
+    (re.compile(r"^/api/products$"), lambda match: ("products",)),
+    (re.compile(r"^/api/products/(\d+)(?:/history)?$"), lambda match: (f"product:{match.group(1)}",)),
+]
+
+# Response headers kept with a cached body
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    generations: Tuple[int, ...]
+
+
+def route_tags(path: str) -> Optional[Tuple[str, ...]]:
+    """Invalidation tags for a cacheable path, None if it isn't cached"""
+    for pattern, tags in CACHED_ROUTES:
+        match = pattern.match(path)
+        if match:
+            return tags(match)
+    return None
+
+
+def write_tags(action: str, product_ids: Sequence[int]) -> List[str]:
+    """Tags a committed write invalidates"""
+    tags = [f"product:{product_id}" for product_id in product_ids]
+    # History-only writes don't change product rows, so the listing stays valid
+    if action != "history":
+        tags.append("products")
+    return tags
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class RedisResponseBackend:
+    """Shared entries and tag generations in Redis"""
+
+    def __init__(self, url: str, ttl: float):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def generations(self, tags: Sequence[str]) -> Tuple[int, ...]:
+        values = self.client.hmget("response-cache:generations", list(tags))
+        return tuple(int(value or 0) for value in values)
+
+    def bump(self, tags: Sequence[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.hincrby("response-cache:generations", tag, 1)
+        pipe.execute()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(f"response-cache:{key}")
+        if not raw:
+            return None
+        # Plain JSON, never pickle: entries come from a shared server
+        try:
+            value = json.loads(raw)
+            return CachedResponse(
+                body=base64.b64decode(value["body"]),
+                etag=str(value["etag"]),
+                headers={str(name): str(header) for name, header in value["headers"].items()},
+                generations=tuple(int(generation) for generation in value["generations"]),
+            )
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring malformed response cache entry {key}: {str(e)}")
+            return None
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        if self.ttl > 0:
+            value = {
+                "body": base64.b64encode(entry.body).decode("ascii"),
+                "etag": entry.etag,
+                "headers": entry.headers,
+                "generations": list(entry.generations),
+            }
+            self.client.set(f"response-cache:{key}", json.dumps(value), px=int(self.ttl * 1000))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class ResponseCache:
+    """Response bodies keyed by request, valid while their tags are unchanged"""
+
+    def __init__(
+        self,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        backend: Optional[RedisResponseBackend] = None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.entries = LRUCache(ttl, max_entries)
+        self.backend = backend
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "stale": 0, "invalidations": 0}
+
+    def generations(self, tags: Sequence[str]) -> Tuple[int, ...]:
+        """Current generation of each tag"""
+        if self.backend is not None:
+            return self.backend.generations(tags)
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get(self, key: str, tags: Sequence[str]) -> Tuple[Optional[CachedResponse], Optional[Tuple[int, ...]]]:
+        """
+        Cached response for key if none of its tags changed since it was stored
+
+        Returns:
+            Tuple of (entry or None, current generations to store a fresh
+            response with). Generations are read before the database, so a
+            write that lands in between makes the stored entry stale, not
+            wrong. They are None if the shared backend is unreachable, in
+            which case nothing should be cached.
+        """
+        try:
+            generations = self.generations(tags)
+            with self._lock:
+                entry = self.entries.get(key)
+            if entry is None and self.backend is not None:
+                entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Shared response cache unavailable: {e}")
+            return None, None
+        if entry is not None and entry.generations != generations:
+            self.stats["stale"] += 1
+            entry = None
+        return entry, generations
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self.entries.set(key, entry)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, entry)
+            except Exception as e:
+                logger.warning(f"Could not store response for {key} in the shared cache: {e}")
+
+    def invalidate(self, action: str, product_ids: List[int]) -> None:
+        """crud write listener: bump the tags of the written products"""
+        tags = write_tags(action, product_ids)
+        self.stats["invalidations"] += 1
+        if self.backend is not None:
+            try:
+                self.backend.bump(tags)
+            except Exception as e:
+                logger.warning(f"Shared response cache unavailable, clearing local entries: {e}")
+                with self._lock:
+                    self.entries.clear()
+            return
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def snapshot(self) -> Dict[str, object]:
+        """Counters plus current size, for the stats endpoint"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "ttl_seconds": self.entries.ttl,
+            "max_entries": self.entries.max_entries,
+            "shared_backend": self.backend is not None,
+        }
+
+    def close(self) -> None:
+        crud.remove_write_listener(self.invalidate)
+        if self.backend is not None:
+            self.backend.close()
+
+
+def cache_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+async def cache_middleware(request: Request, call_next) -> Response:
+    """HTTP middleware serving cached responses for CACHED_ROUTES"""
+    cache = get_response_cache()
+    tags = route_tags(request.url.path) if request.method == "GET" and cache.enabled else None
+    if tags is None:
+        return await call_next(request)
+
+    key = cache_key(request)
+    if_none_match = request.headers.get("if-none-match")
+    # Redis calls block, so they run off the event loop
+    if cache.backend is not None:
+        entry, generations = await run_in_threadpool(cache.get, key, tags)
+    else:
+        entry, generations = cache.get(key, tags)
+
+    if entry is not None:
+        cache.stats["hits"] += 1
+        if etag_matches(if_none_match, entry.etag):
+            cache.stats["not_modified"] += 1
+            return _not_modified(entry.etag)
+        return Response(entry.body, headers={**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"})
+
+    cache.stats["misses"] += 1
+    response = await call_next(request)
+    if response.status_code != 200 or generations is None:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = make_etag(body)
+    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+    entry = CachedResponse(body, etag, headers, generations)
+    if cache.backend is not None:
+        await run_in_threadpool(cache.set, key, entry)
+    else:
+        cache.set(key, entry)
+
+    if etag_matches(if_none_match, etag):
+        cache.stats["not_modified"] += 1
+        return _not_modified(etag)
+    return Response(body, headers={**response.headers, "ETag": etag, "Cache-Control": "no-cache"})
+
+
+_shared_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache, invalidated by crud writes"""
+    global _shared_cache
+    if _shared_cache is None:
+        backend = None
+        if RESPONSE_CACHE_ENABLED and RESPONSE_CACHE_REDIS_URL:
+            try:
+                backend = RedisResponseBackend(RESPONSE_CACHE_REDIS_URL, RESPONSE_CACHE_TTL)
+            except ImportError:
+                logger.warning("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed")
+        _shared_cache = ResponseCache(backend=backend)
+        crud.add_write_listener(_shared_cache.invalidate)
+    return _shared_cache
+
+
+def close_response_cache() -> None:
+    global _shared_cache
+    if _shared_cache is not None:
+        _shared_cache.close()
+        _shared_cache = None
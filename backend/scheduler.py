@@ -0,0 +1,263 @@
+# backend/scheduler.py
+"""
+Background price refresh scheduler
+
+Re-scrapes products whose next_check_at (set adaptively on every price
+write, see recheck.py) has passed. Due products go into a priority queue
+ordered by due time and are drained by a pool of async workers, each
+request first taking a token from its host's bucket so we stay under
+retailer throttling limits.
+
+Due products are claimed when loaded (next_check_at is pushed
+REFRESH_CLAIM_SECONDS out, see crud.claim_due_products), so several
+schedulers - API workers with REFRESH_SCHEDULER_ENABLED and standalone
+ones - never check the same product twice. Failed checks back off by
+moving next_check_at, which survives restarts. Token buckets are per
+process, though: with N schedulers running, a host can see up to N times
+REFRESH_HOST_RATE, so set it to the host's limit divided by N, or enable
+the scheduler in only one process.
+
+Run in-process (REFRESH_SCHEDULER_ENABLED=true) or standalone:
+    python scheduler.py
+    python scheduler.py --once
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+from scraper import AmazonScraper
+from parse_pool import get_parse_pool, shutdown_parse_pool
+from history_buffer import HistoryBuffer, get_history_buffer
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SCHEDULER_ENABLED = os.getenv("REFRESH_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "10"))
+REFRESH_HOST_RATE = float(os.getenv("REFRESH_HOST_RATE", "1.0"))
+REFRESH_HOST_BURST = int(os.getenv("REFRESH_HOST_BURST", "5"))
+REFRESH_POLL_SECONDS = float(os.getenv("REFRESH_POLL_SECONDS", "30"))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "500"))
+REFRESH_RETRY_SECONDS = float(os.getenv("REFRESH_RETRY_SECONDS", "900"))
+# How long a claimed product stays hidden from other schedulers; must
+# cover the wait in this scheduler's queue plus the check itself
+REFRESH_CLAIM_SECONDS = float(os.getenv("REFRESH_CLAIM_SECONDS", "1800"))
+
+# (next_check_at, product_id, url)
+QueueItem = Tuple[datetime, int, str]
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `burst` stored"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RefreshScheduler:
+    """Re-checks due product prices through a rate-limited worker pool"""
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        scraper: Optional[AmazonScraper] = None,
+        concurrency: int = REFRESH_CONCURRENCY,
+        host_rate: float = REFRESH_HOST_RATE,
+        host_burst: int = REFRESH_HOST_BURST,
+        poll_interval: float = REFRESH_POLL_SECONDS,
+        batch_size: int = REFRESH_BATCH_SIZE,
+        retry_after: float = REFRESH_RETRY_SECONDS,
+        claim_seconds: float = REFRESH_CLAIM_SECONDS,
+        history: Optional[HistoryBuffer] = None,
+    ):
+        self.session_factory = session_factory
+        # Write-behind history (HISTORY_WRITE_BEHIND), flushed on every poll
+        self.history = history or get_history_buffer()
+        self.scraper = scraper or AmazonScraper(parse_pool=get_parse_pool())
+        self.concurrency = concurrency
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retry_after = retry_after
+        self.claim_seconds = claim_seconds
+        
+        self.stats = {"checked": 0, "updated": 0, "failed": 0}
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Claimed products not yet checked, released on stop
+        self._claimed: Set[int] = set()
+        self._queue: Optional["asyncio.PriorityQueue[QueueItem]"] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    # ---- lifecycle ----
+    
+    def start(self) -> None:
+        """Start the scheduler as a task on the running event loop"""
+        self._task = asyncio.create_task(self.run())
+    
+    async def stop(self) -> None:
+        """Stop the scheduler and wait for in-flight checks to be cancelled"""
+        if self._stopping is not None:
+            self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+    
+    async def run(self, once: bool = False) -> None:
+        """
+        Main loop: refill the queue from the database and let workers drain it
+        
+        With once=True, returns after every product that was due at start
+        has been checked.
+        """
+        self._queue = asyncio.PriorityQueue()
+        self._stopping = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Refresh scheduler started with {self.concurrency} workers")
+        
+        try:
+            while not self._stopping.is_set():
+                if self._queue.qsize() < self.batch_size:
+                    await self._refill()
+                if self.history is not None:
+                    await asyncio.to_thread(self.history.flush)
+                
+                if once:
+                    if self._queue.empty():
+                        break
+                    await self._queue.join()
+                    continue
+                
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._claimed:
+                await asyncio.to_thread(self._defer, list(self._claimed), 0)
+                self._claimed.clear()
+            if self.history is not None:
+                await asyncio.to_thread(self.history.flush)
+            logger.info(f"Refresh scheduler stopped: {self.stats}")
+    
+    # ---- queue ----
+    
+    async def _refill(self) -> None:
+        limit = self.batch_size - self._queue.qsize()
+        items = await asyncio.to_thread(self._claim_due, limit)
+        for item in items:
+            self._claimed.add(item[1])
+            self._queue.put_nowait(item)
+        if items:
+            logger.info(f"Queued {len(items)} products for refresh")
+    
+    def _claim_due(self, limit: int) -> List[QueueItem]:
+        """Claim the most overdue products (range scan on ix_products_next_check_at)"""
+        db = self.session_factory()
+        try:
+            return crud.claim_due_products(db, limit, self.claim_seconds)
+        finally:
+            db.close()
+    
+    def _defer(self, product_ids: List[int], seconds: float) -> None:
+        db = self.session_factory()
+        try:
+            crud.defer_product_checks(db, product_ids, seconds)
+        except Exception as e:
+            logger.error(f"Could not reschedule products {product_ids}: {str(e)}")
+        finally:
+            db.close()
+    
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+        return bucket
+    
+    # ---- workers ----
+    
+    async def _worker(self) -> None:
+        while True:
+            _, product_id, url = await self._queue.get()
+            try:
+                await self._check(product_id, url)
+                # A check cancelled by stop() stays claimed, to be released
+                self._claimed.discard(product_id)
+            finally:
+                self._queue.task_done()
+    
+    async def _check(self, product_id: int, url: str) -> None:
+        await self._bucket(url).acquire()
+        self.stats["checked"] += 1
+        try:
+            product_data = await self.scraper.scrape_async(url)
+            if not product_data:
+                raise ValueError("Could not extract product information")
+            await asyncio.to_thread(self._save, product_id, product_data)
+            self.stats["updated"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Refresh failed for product #{product_id}: {str(e)}")
+            await asyncio.to_thread(self._defer, [product_id], self.retry_after)
+    
+    def _save(self, product_id: int, product_data: dict) -> None:
+        db = self.session_factory()
+        try:
+            product = crud.get_product_by_id(db, product_id)
+            if product:
+                crud.update_product_price(
+                    db, product, product_data['price'], product_data['currency'], history=self.history
+                )
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the price refresh scheduler as a standalone worker")
+    parser.add_argument("--once", action="store_true", help="check every currently due product, then exit")
+    parser.add_argument("--concurrency", type=int, default=REFRESH_CONCURRENCY)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    async def _main():
+        try:
+            await RefreshScheduler(concurrency=args.concurrency).run(once=args.once)
+        finally:
+            await AmazonScraper.close_async_client()
+            shutdown_parse_pool()
+    
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
@@ -1,12 +1,29 @@
 # backend/schemas.py
-from pydantic import BaseModel, HttpUrl, ConfigDict
+from pydantic import BaseModel, HttpUrl, ConfigDict, Field, model_validator
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # Request schemas
 class TrackProductRequest(BaseModel):
     url: HttpUrl
 
+class TrackBatchRequest(BaseModel):
+    urls: List[HttpUrl] = Field(..., min_length=1)
+
+class AlertCreateRequest(BaseModel):
+    """Fires at or below target_price, or percent_off_high % below the product's highest price"""
+    product_id: int
+    target_price: Optional[float] = Field(None, gt=0)
+    percent_off_high: Optional[float] = Field(None, gt=0, lt=100)
+    # Defaults to ALERT_COOLDOWN_SECONDS
+    cooldown_seconds: Optional[int] = Field(None, ge=0)
+    
+    @model_validator(mode="after")
+    def require_condition(self):
+        if self.target_price is None and self.percent_off_high is None:
+            raise ValueError("Set target_price, percent_off_high or both")
+        return self
+
 # Response schemas
 class PriceHistoryResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -16,6 +33,19 @@ class PriceHistoryResponse(BaseModel):
     currency: str
     recorded_at: datetime
 
+class PriceBucketResponse(BaseModel):
+    """One hourly or daily bucket of price observations"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    recorded_at: datetime = Field(validation_alias="bucket_start")
+    currency: str
+    open: float
+    low: float
+    high: float
+    close: float
+    last_seen_at: datetime
+    samples: int
+
 class ProductResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
@@ -33,7 +63,9 @@ class ProductResponse(BaseModel):
 
 class ProductWithHistoryResponse(ProductResponse):
     # Config is inherited automatically, no need to redefine
+    # Most recent points only, oldest first; page the rest via /history
     price_history: List[PriceHistoryResponse]
+    history_truncated: bool = False
 
 # Legacy response for backward compatibility
 class ProductTrackResponse(BaseModel):
@@ -43,4 +75,69 @@ class ProductTrackResponse(BaseModel):
     url: str
     retailer: str
     tracked: bool = True
-    product_id: Optional[int] = None
\ No newline at end of file
+    product_id: Optional[int] = None
+
+class TrackBatchItemResult(BaseModel):
+    url: str
+    success: bool
+    created: Optional[bool] = None
+    product_id: Optional[int] = None
+    name: Optional[str] = None
+    price: Optional[float] = None
+    currency: Optional[str] = None
+    error: Optional[str] = None
+
+class TrackBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[TrackBatchItemResult]
+
+class AlertResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    product_id: int
+    target_price: Optional[float]
+    percent_off_high: Optional[float]
+    cooldown_seconds: Optional[int]
+    armed: bool
+    last_fired_at: Optional[datetime]
+    last_fired_price: Optional[float]
+    created_at: datetime
+
+class JobResponse(BaseModel):
+    """A queued scrape: queued, running, succeeded or failed"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    url: str
+    status: str
+    attempts: int
+    max_attempts: int
+    # Earliest next lease: the retry time when queued, lease expiry when running
+    available_at: datetime
+    product_id: Optional[int]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+class AnalyticsEntry(BaseModel):
+    product_id: int
+    currency: Optional[str]
+    current_price: Optional[float]
+    highest_price: Optional[float]
+    percent_off_high: Optional[float]
+    # Time-weighted standard deviation over volatility_days, percent of the mean
+    volatility: Optional[float]
+    # Time-weighted mean price, keyed by window in days
+    moving_averages: Dict[str, Optional[float]]
+    # Current price is the lowest seen in the window, keyed by window in days
+    lowest_in_days: Dict[str, bool]
+
+class AnalyticsResponse(BaseModel):
+    computed_at: datetime
+    volatility_days: int
+    total: int
+    items: List[AnalyticsEntry]
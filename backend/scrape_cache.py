@@ -0,0 +1,280 @@
+# backend/scrape_cache.py
+"""
+Short-TTL scrape cache with single-flight request coalescing
+
+When many users track the same product within seconds, only the first
+request fetches the page; requests that arrive while that fetch is in
+flight await the same result, and requests within the TTL afterwards are
+served from memory. Entries are keyed by canonical URL and bounded by
+an LRU size limit.
+
+Set SCRAPE_CACHE_REDIS_URL (requires the `redis` package) to share results
+and in-flight locks between API worker processes as well.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds a scrape result is reused, 0 disables caching (coalescing still applies)
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "60"))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "2048"))
+# Optional shared backend, e.g. redis://localhost:6379/0
+SCRAPE_CACHE_REDIS_URL = os.getenv("SCRAPE_CACHE_REDIS_URL", "")
+# How long another worker's in-flight fetch is waited for before fetching anyway
+SCRAPE_CACHE_LOCK_SECONDS = float(os.getenv("SCRAPE_CACHE_LOCK_SECONDS", "30"))
+
+Fetch = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def cache_key(url: str) -> str:
+    """Canonical product URL, or the URL lightly normalized if it has no ASIN"""
+    canonical = canonicalize(url)
+    if canonical:
+        return canonical.url
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+class LRUCache:
+    """Size-bounded mapping whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisScrapeBackend:
+    """Shared results and in-flight locks in Redis, so API workers coalesce too"""
+
+    def __init__(self, url: str, ttl: float, lock_seconds: float, poll_interval: float = 0.05):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.poll_interval = poll_interval
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(f"scrape:{key}")
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if self.ttl > 0:
+            await self.client.set(f"scrape:{key}", json.dumps(value), px=int(self.ttl * 1000))
+
+    async def acquire(self, key: str) -> bool:
+        """Claim the fetch for key; False if another worker already has it"""
+        return bool(await self.client.set(f"scrape-lock:{key}", "1", nx=True, px=int(self.lock_seconds * 1000)))
+
+    async def release(self, key: str) -> None:
+        await self.client.delete(f"scrape-lock:{key}")
+
+    async def wait(self, key: str) -> Optional[Dict[str, Any]]:
+        """Wait for another worker's fetch; None if it failed or timed out"""
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = await self.get(key)
+            if value is not None:
+                return value
+            if not await self.client.exists(f"scrape-lock:{key}"):
+                return await self.get(key)
+        return None
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class FetchAbandoned(Exception):
+    """The request that owned an in-flight fetch was cancelled before it finished"""
+
+
+class ScrapeCache:
+    """
+    Coalesces concurrent scrapes of the same URL and caches results briefly
+
+    Only successful scrapes are cached. A failed or empty fetch is handed to
+    the requests that were waiting on it, but the next request fetches again.
+    If the request that started a fetch is cancelled, one of its waiters
+    starts a new fetch and the rest wait on that instead.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SCRAPE_CACHE_TTL,
+        max_entries: int = SCRAPE_CACHE_MAX_ENTRIES,
+        backend: Optional[RedisScrapeBackend] = None,
+        enabled: bool = SCRAPE_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.entries = LRUCache(ttl, max_entries)
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "shared_hits": 0, "shared_coalesced": 0}
+
+    async def get_or_fetch(self, url: str, fetch: Fetch) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Return the scrape result for url, calling fetch at most once at a time
+
+        Returns:
+            Tuple of (result, status) where status is "hit", "miss" or "coalesced"
+        """
+        if not self.enabled:
+            self.stats["misses"] += 1
+            return await fetch(), "miss"
+
+        key = cache_key(url)
+
+        while True:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached, "hit"
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                # Shield so a cancelled waiter doesn't cancel the shared fetch
+                return await asyncio.shield(inflight), "coalesced"
+            except FetchAbandoned:
+                # The owning request was cancelled; the first waiter back fetches again
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, status = await self._fetch(key, fetch)
+            if result:
+                self.entries.set(key, result)
+            future.set_result(result)
+            return result, status
+        except asyncio.CancelledError:
+            # Only this request was cancelled, not the ones waiting on it
+            future.set_exception(FetchAbandoned(url))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody waited for isn't logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fetch(self, key: str, fetch: Fetch) -> Tuple[Optional[Dict[str, Any]], str]:
+        if self.backend is None:
+            self.stats["misses"] += 1
+            return await fetch(), "miss"
+
+        try:
+            shared = await self.backend.get(key)
+            if shared is not None:
+                self.stats["shared_hits"] += 1
+                return shared, "hit"
+            owner = await self.backend.acquire(key)
+            if not owner:
+                shared = await self.backend.wait(key)
+                if shared is not None:
+                    self.stats["shared_coalesced"] += 1
+                    return shared, "coalesced"
+        except Exception as e:
+            logger.warning(f"Shared scrape cache unavailable: {e}")
+            owner = False
+
+        self.stats["misses"] += 1
+        try:
+            result = await fetch()
+            if result and owner:
+                await self.backend.set(key, result)
+            return result, "miss"
+        finally:
+            if owner:
+                try:
+                    await self.backend.release(key)
+                except Exception as e:
+                    logger.warning(f"Could not release scrape lock for {key}: {e}")
+
+    def invalidate(self, url: str) -> None:
+        self.entries.pop(cache_key(url))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus current size, for the stats endpoint"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.entries.ttl,
+            "max_entries": self.entries.max_entries,
+            "shared_backend": self.backend is not None,
+        }
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+
+_shared_cache: Optional[ScrapeCache] = None
+
+
+def get_scrape_cache() -> ScrapeCache:
+    """Process-wide scrape cache configured from the environment"""
+    global _shared_cache
+    if _shared_cache is None:
+        backend = None
+        if SCRAPE_CACHE_ENABLED and SCRAPE_CACHE_REDIS_URL:
+            try:
+                backend = RedisScrapeBackend(SCRAPE_CACHE_REDIS_URL, SCRAPE_CACHE_TTL, SCRAPE_CACHE_LOCK_SECONDS)
+            except ImportError:
+                logger.warning("SCRAPE_CACHE_REDIS_URL is set but the redis package is not installed")
+        _shared_cache = ScrapeCache(backend=backend)
+    return _shared_cache
+
+
+async def close_scrape_cache() -> None:
+    global _shared_cache
+    if _shared_cache is not None:
+        await _shared_cache.close()
+        _shared_cache = None
@@ -1,12 +1,92 @@
 # backend/scraper.py
 import requests
+import httpx
+import asyncio
+import codecs
+import time
 from bs4 import BeautifulSoup
 import re
+import os
 import logging
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
+
+from metrics import METRICS_ENABLED, PRICE_STRATEGY_TOTAL, SCRAPE_STAGE_SECONDS, SCRAPES_TOTAL
+from prescan import prescan_fragment, StreamingPrescan
+from price_engine import PriceEngine
+
+if TYPE_CHECKING:
+    from parse_pool import ParsePool
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
 
 logger = logging.getLogger(__name__)
 
+# HTML parser backend: auto | prescan | lxml | html.parser
+#   html.parser  full BeautifulSoup tree with the pure-Python parser
+#   lxml         full BeautifulSoup tree with the lxml C parser
+#   prescan      parse only the sliced title/price elements, full-page fallback
+#   auto         prescan, with lxml for the fallback when installed
+SCRAPER_PARSER = os.getenv("SCRAPER_PARSER", "auto")
+PARSER_BACKENDS = ("auto", "prescan", "lxml", "html.parser")
+
+# Streaming fetch: read the page in chunks and stop once name and price are known
+SCRAPER_STREAMING = os.getenv("SCRAPER_STREAMING", "true").lower() in ("1", "true", "yes")
+SCRAPER_STREAM_CHUNK = int(os.getenv("SCRAPER_STREAM_CHUNK", "16384"))
+
+def _supports_brotli() -> bool:
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+# httpx only decodes br when a brotli package is installed
+STREAM_ACCEPT_ENCODING = "gzip, deflate, br" if _supports_brotli() else "gzip, deflate"
+
+# Shared async HTTP client settings (see AmazonScraper.get_async_client)
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "200"))
+SCRAPER_MAX_KEEPALIVE = int(os.getenv("SCRAPER_MAX_KEEPALIVE", "50"))
+SCRAPER_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPER_KEEPALIVE_EXPIRY", "30"))
+
+# httpcore trace events -> scrape stage (DNS resolution happens inside connect_tcp)
+TRACE_STAGES = {
+    'connect_tcp': 'connect',
+    'start_tls': 'tls',
+    'receive_response_headers': 'wait',
+    'receive_response_body': 'download',
+}
+
+
+class _StageTrace:
+    """httpx "trace" extension timing connection setup and response stages"""
+    
+    def __init__(self, download: bool = True):
+        # Streaming reads time the body themselves, and may stop early
+        self.download = download
+        self._started: Dict[str, float] = {}
+    
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        step, _, phase = event_name.rpartition('.')
+        stage = TRACE_STAGES.get(step.rpartition('.')[2])
+        if stage is None or (stage == 'download' and not self.download):
+            return
+        if phase == 'started':
+            self._started[stage] = time.perf_counter()
+        elif phase == 'complete' and stage in self._started:
+            SCRAPE_STAGE_SECONDS.observe(time.perf_counter() - self._started.pop(stage), stage)
+
+
+def _trace_extensions(download: bool = True) -> Optional[Dict[str, Any]]:
+    return {'trace': _StageTrace(download)} if METRICS_ENABLED else None
+
+
 class AmazonScraper:
     """Scrapes product information from Amazon"""
     
@@ -61,13 +141,70 @@ class AmazonScraper:
         'SAR': 'SAR',
     }
     
-    def __init__(self):
+    _NON_DIGIT_RE = re.compile(r'\D')
+    
+    # Compiled once at class load: symbol alternation and the Strategy 3 page scan
+    PRICE_ENGINE = PriceEngine(
+        CURRENCY_MAP,
+        scan_prefixes=['Rs.', 'Rs', 'රු.', 'රු', 'R$', 'A$', 'C$', 'S$', '$', '€', '£', '¥', '₹', '₱', '฿'],
+        scan_suffixes=['€', 'zł', 'kr', 'د.إ', '฿'],
+    )
+    
+    # One pooled keep-alive client per event loop, shared by all scraper instances
+    _async_client: Optional[httpx.AsyncClient] = None
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def __init__(
+        self,
+        parser: str = SCRAPER_PARSER,
+        parse_pool: Optional["ParsePool"] = None,
+        streaming: bool = SCRAPER_STREAMING
+    ):
+        if parser not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {parser}")
+        if parser == "lxml" and not HAS_LXML:
+            logger.warning("lxml is not installed, falling back to html.parser")
+            parser = "html.parser"
+        self.parser = parser
+        # Optional process pool; when set, parsing runs off the calling process
+        self.parse_pool = parse_pool
+        self.streaming = streaming
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept':  'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         }
     
+    @classmethod
+    def get_async_client(cls) -> httpx.AsyncClient:
+        """
+        Return the shared async HTTP client, creating it on first use
+        
+        The client is bound to the running event loop, so a new one is
+        created if the loop changed (e.g. a standalone worker process).
+        """
+        loop = asyncio.get_running_loop()
+        if cls._async_client is None or cls._async_client_loop is not loop:
+            cls._async_client = httpx.AsyncClient(
+                timeout=SCRAPER_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=SCRAPER_MAX_CONNECTIONS,
+                    max_keepalive_connections=SCRAPER_MAX_KEEPALIVE,
+                    keepalive_expiry=SCRAPER_KEEPALIVE_EXPIRY,
+                ),
+            )
+            cls._async_client_loop = loop
+        return cls._async_client
+    
+    @classmethod
+    async def close_async_client(cls) -> None:
+        """Close the shared async HTTP client (call on application shutdown)"""
+        if cls._async_client is not None:
+            await cls._async_client.aclose()
+            cls._async_client = None
+            cls._async_client_loop = None
+    
     def scrape(self, url: str) -> Optional[Dict[str, Any]]: 
         """
         Scrape product name and price from Amazon URL
@@ -79,31 +216,179 @@ class AmazonScraper:
         try:
             response = requests.get(url, headers=self.headers, timeout=10)
             response. raise_for_status()
+            if self.parse_pool is not None:
+                result = self.parse_pool.parse_sync(response.content, url)
+            else:
+                result = self.parse(response.content, url)
             
-            # Decode bytes to string for BeautifulSoup
-            soup = BeautifulSoup(response.content. decode('utf-8'), 'html.parser')
-            
-            # Extract product name
-            name = self._extract_name(soup)
-            
-            # Extract price AND currency
-            price, currency = self._extract_price_and_currency(soup)
-            
-            if not name or price is None:
-                logger.warning(f"Could not extract name or price from {url}")
-                return None
-            
-            return {
-                'name': name,
-                'price': price,
-                'currency': currency,
-                'url': url,
-                'retailer': 'Amazon'
-            }
+        except Exception as e:
+            SCRAPES_TOTAL.inc('error')
+            logger.error(f"Error scraping {url}: {str(e)}")
+            raise
+        SCRAPES_TOTAL.inc('ok' if result else 'no_data')
+        return result
+    
+    async def scrape_async(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Non-blocking variant of scrape() for use inside the event loop
+        
+        Uses the shared pooled client so connections to Amazon are kept
+        alive and reused across requests. In streaming mode the page is
+        read incrementally and the download stops as soon as the title
+        and buy-box price have been seen.
+        """
+        try:
+            if self.streaming:
+                result = await self.scrape_streaming(url)
+            else:
+                client = self.get_async_client()
+                response = await client.get(url, headers=self.headers, extensions=_trace_extensions())
+                response.raise_for_status()
+                if self.parse_pool is not None:
+                    result = await self.parse_pool.parse(response.content, url)
+                else:
+                    result = self.parse(response.content, url)
             
         except Exception as e:
+            SCRAPES_TOTAL.inc('error')
             logger.error(f"Error scraping {url}: {str(e)}")
             raise
+        SCRAPES_TOTAL.inc('ok' if result else 'no_data')
+        return result
+    
+    async def scrape_streaming(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch with compressed transfer, extracting while the page arrives
+        
+        Each chunk is fed to an incremental pre-scan. Once #productTitle
+        and a `.a-price .a-offscreen` price (Strategy 1) are complete, the
+        response is closed without reading the rest. Otherwise the whole
+        page is downloaded and goes through the regular parse() path,
+        including the Strategy 3 regex scan.
+        
+        The result carries a 'fetch' dict with bytes_transferred (on the
+        wire, compressed), bytes_read (decoded), elapsed_ms and early_exit.
+        """
+        started = time.perf_counter()
+        client = self.get_async_client()
+        headers = {**self.headers, 'Accept-Encoding': STREAM_ACCEPT_ENCODING}
+        
+        result = None
+        chunks = []
+        extensions = _trace_extensions(download=False)
+        async with client.stream('GET', url, headers=headers, extensions=extensions) as response:
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            scan = StreamingPrescan()
+            # Time spent waiting for chunks, excluding the scanning in between
+            download = 0.0
+            mark = time.perf_counter()
+            async for chunk in response.aiter_bytes(SCRAPER_STREAM_CHUNK):
+                download += time.perf_counter() - mark
+                chunks.append(chunk)
+                with SCRAPE_STAGE_SECONDS.time('prescan'):
+                    complete = scan.feed(decoder.decode(chunk))
+                if complete:
+                    result = self._extract_early(scan.fragment(), url)
+                    if result:
+                        break
+                mark = time.perf_counter()
+            else:
+                download += time.perf_counter() - mark
+            # Leaving the block before the body is drained closes the connection
+            bytes_transferred = response.num_bytes_downloaded
+        SCRAPE_STAGE_SECONDS.observe(download, 'download')
+        
+        early_exit = result is not None
+        content = b''.join(chunks)
+        if not early_exit:
+            if self.parse_pool is not None:
+                result = await self.parse_pool.parse(content, url)
+            else:
+                result = self.parse(content, url)
+        
+        if result is not None:
+            result['fetch'] = {
+                'bytes_transferred': bytes_transferred,
+                'bytes_read': len(content),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+                'early_exit': early_exit,
+            }
+        return result
+    
+    def _extract_early(self, fragment: Optional[str], url: str) -> Optional[Dict[str, Any]]:
+        """Name plus Strategy 1 price from a partial page, or None to keep reading"""
+        if fragment is None:
+            return None
+        with SCRAPE_STAGE_SECONDS.time('parse'):
+            soup = BeautifulSoup(fragment, 'html.parser')
+        with SCRAPE_STAGE_SECONDS.time('extract'):
+            name = self._extract_name(soup)
+            price, currency = self._extract_offscreen_price(soup)
+        if not name or price is None:
+            return None
+        PRICE_STRATEGY_TOTAL.inc('offscreen')
+        return {
+            'name': name,
+            'price': price,
+            'currency': currency,
+            'url': url,
+            'retailer': 'Amazon'
+        }
+    
+    def parse(self, content: bytes, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract product data from a downloaded page
+        
+        Returns:
+            dict with keys:  name, price, currency, url, retailer
+            None if name or price could not be found
+        """
+        # Decode bytes to string for BeautifulSoup
+        html = content.decode('utf-8')
+        name, price, currency, strategy = None, None, 'USD', 'none'
+        
+        # Fast path: parse only the title and price elements
+        if self.parser in ('auto', 'prescan'):
+            with SCRAPE_STAGE_SECONDS.time('prescan'):
+                fragment = prescan_fragment(html)
+            if fragment is not None:
+                with SCRAPE_STAGE_SECONDS.time('parse'):
+                    soup = BeautifulSoup(fragment, 'html.parser')
+                with SCRAPE_STAGE_SECONDS.time('extract'):
+                    name = self._extract_name(soup)
+                    price, currency, strategy = self._extract_price(soup, text_fallback=False)
+        
+        # Full page: always for lxml/html.parser, otherwise when the fast path came up short
+        if not name or price is None:
+            with SCRAPE_STAGE_SECONDS.time('parse'):
+                soup = BeautifulSoup(html, self._full_page_builder())
+            
+            with SCRAPE_STAGE_SECONDS.time('extract'):
+                # Extract product name
+                name = self._extract_name(soup)
+                
+                # Extract price AND currency
+                price, currency, strategy = self._extract_price(soup)
+        
+        PRICE_STRATEGY_TOTAL.inc(strategy)
+        if not name or price is None:
+            logger.warning(f"Could not extract name or price from {url}")
+            return None
+        
+        return {
+            'name': name,
+            'price': price,
+            'currency': currency,
+            'url': url,
+            'retailer': 'Amazon'
+        }
+    
+    def _full_page_builder(self) -> str:
+        """BeautifulSoup tree builder for whole-page parsing"""
+        if self.parser == 'lxml' or (self.parser == 'auto' and HAS_LXML):
+            return 'lxml'
+        return 'html.parser'
     
     def _extract_name(self, soup: BeautifulSoup) -> Optional[str]:
         """Extract product name from Amazon page"""
@@ -120,21 +405,41 @@ class AmazonScraper:
         
         return None
     
-    def _extract_price_and_currency(self, soup: BeautifulSoup) -> Tuple[Optional[float], str]:
+    def _extract_price_and_currency(
+        self,
+        soup: BeautifulSoup,
+        text_fallback: bool = True
+    ) -> Tuple[Optional[float], str]:
         """
         Extract price and currency from Amazon page
         
+        Args:
+            text_fallback: run the whole-page regex scan (Strategy 3) if the
+                price elements don't yield a price
+        
         Returns:
             Tuple of (price, currency_code)
         """
+        price, currency, _ = self._extract_price(soup, text_fallback)
+        return price, currency
+    
+    def _extract_price(
+        self,
+        soup: BeautifulSoup,
+        text_fallback: bool = True
+    ) -> Tuple[Optional[float], str, str]:
+        """
+        _extract_price_and_currency() plus the strategy that found the price
+        
+        Returns:
+            Tuple of (price, currency_code, strategy), strategy being one of
+            offscreen, whole_fraction, text_scan or none
+        """
         
         # Strategy 1: Try a-price with offscreen (most reliable)
-        price_offscreen = soup.select_one('.a-price .a-offscreen')
-        if price_offscreen:
-            text = price_offscreen.text. strip()
-            price, currency = self._parse_price_text(text)
-            if price is not None:
-                return price, currency
+        price, currency = self._extract_offscreen_price(soup)
+        if price is not None:
+            return price, currency, 'offscreen'
         
         # Strategy 2: Try whole + fraction with currency symbol
         price_symbol = soup.select_one('.a-price-symbol')
@@ -148,107 +453,59 @@ class AmazonScraper:
                 symbol = price_symbol.text.strip()
                 currency = self._get_currency_code(symbol)
             
-            # whole. text might be "249." or "2,164"
-            whole_text = whole.text.strip().replace(',', '')
-            
-            # Remove currency symbols that might be in the text
-            for symbol in ['$', 'Rs', 'රු', '€', '£', '¥', '₹']: 
-                whole_text = whole_text.replace(symbol, '')
+            # whole.text might be "249.", "2,164" or "1.234," - the separators are
+            # grouping/decimal marks in any locale, the fraction has its own element
+            whole_text = self._NON_DIGIT_RE.sub('', whole.text)
+            fraction_text = self._NON_DIGIT_RE.sub('', fraction.text) if fraction else ''
             
-            # Remove trailing dot if present
-            if whole_text.endswith('.'):
-                whole_text = whole_text[:-1]
-            
-            if fraction:
+            if fraction_text:
                 # Combine:  "249" + "." + "00" = "249.00"
-                price_str = whole_text + '.' + fraction.text.strip()
+                price_str = whole_text + '.' + fraction_text
             else:
                 # No fraction, use whole as-is
                 price_str = whole_text
             
             try: 
-                return float(price_str), currency
+                return float(price_str), currency, 'whole_fraction'
             except ValueError:
                 logger.warning(f"Could not parse price: {price_str}")
         
+        if not text_fallback:
+            return None, 'USD', 'none'
+        
         # Strategy 3: Look for any price pattern on page
         text = soup.get_text()
         
-        # Try to find price with various currency symbols
-        patterns = [
-            (r'(Rs\. ? )\s*([\d,]+\.?\d{0,2})', 'LKR'),  # Sri Lankan Rupee
-            (r'(රු\.?)\s*([\d,]+\.?\d{0,2})', 'LKR'),  # Sinhala Rupee
-            (r'\$\s*([\d,]+\.?\d{0,2})', 'USD'),  # USD
-            (r'€\s*([\d,]+\. ?\d{0,2})', 'EUR'),  # EUR
-            (r'£\s*([\d,]+\.?\d{0,2})', 'GBP'),  # GBP
-            (r'₹\s*([\d,]+\.?\d{0,2})', 'INR'),  # INR
-        ]
-        
-        for pattern, currency_code in patterns:
-            matches = re.findall(pattern, text)
-            if matches: 
-                try:
-                    if isinstance(matches[0], tuple):
-                        amount = matches[0][1]
-                    else:
-                        amount = matches[0]
-                    return float(amount. replace(',', '')), currency_code
-                except (ValueError, IndexError):
-                    continue
+        # Single pass, first symbol-adjacent amount in document order wins
+        price, currency = self.PRICE_ENGINE.scan(text)
+        if price is not None:
+            return price, currency, 'text_scan'
         
+        return None, 'USD', 'none'
+    
+    def _extract_offscreen_price(self, soup: BeautifulSoup) -> Tuple[Optional[float], str]:
+        """Strategy 1: first `.a-price .a-offscreen` element"""
+        price_offscreen = soup.select_one('.a-price .a-offscreen')
+        if price_offscreen:
+            text = price_offscreen.text. strip()
+            return self._parse_price_text(text)
         return None, 'USD'
     
     def _parse_price_text(self, text: str) -> Tuple[Optional[float], str]:
         """
-        Parse price text like "Rs. 2,164.45" or "$249.00"
+        Parse price text like "Rs. 2,164.45", "$249.00" or "1.234,56 €"
         
         Returns:
             Tuple of (price, currency_code)
         """
-        # Find currency symbol - check LONGEST matches first
-        currency = 'USD'  # default
-        
-        # Sort by length descending to check "Rs." before "Rs" before "R"
-        sorted_symbols = sorted(self.CURRENCY_MAP.keys(), key=len, reverse=True)
-        
-        for symbol in sorted_symbols: 
-            if symbol in text:
-                currency = self.CURRENCY_MAP[symbol]
-                text = text.replace(symbol, '').strip()
-                break
-        
-        # Extract numeric value
-        match = re.search(r'([\d,]+\.?\d{0,2})', text)
-        if match:
-            try: 
-                price = float(match.group(1).replace(',', ''))
-                return price, currency
-            except ValueError:
-                pass
-        
-        return None, currency
+        return self.PRICE_ENGINE.parse_price_text(text)
     
     def _get_currency_code(self, symbol: str) -> str:
         """Convert currency symbol to currency code"""
-        symbol = symbol.strip()
-        
-        # Sort by length descending to match longer symbols first
-        sorted_symbols = sorted(self. CURRENCY_MAP.keys(), key=len, reverse=True)
-        
-        # Try exact match first
-        if symbol in self.CURRENCY_MAP:
-            return self. CURRENCY_MAP[symbol]
-        
-        # Try partial match with longer symbols prioritized
-        for key in sorted_symbols:
-            if symbol == key:   # Exact match
-                return self.CURRENCY_MAP[key]
-        
-        # Then try startswith matching
-        for key in sorted_symbols:
-            if symbol. startswith(key):
-                return self.CURRENCY_MAP[key]
+        code = self.PRICE_ENGINE.currency_code(symbol)
+        if code is not None:
+            return code
         
         # Default to USD if unknown
-        logger.warning(f"Unknown currency symbol: {symbol}, defaulting to USD")
-        return 'USD'
\ No newline at end of file
+        logger.warning(f"Unknown currency symbol: {symbol.strip()}, defaulting to USD")
+        return 'USD'
@@ -0,0 +1,214 @@
+# backend/sql_metrics.py
+"""
+SQL timing instrumentation
+
+Engine event hooks time every statement and record it in a latency
+histogram per statement shape (the SQL text with IN-lists collapsed), so
+hot and slow queries are visible without logging each statement. A
+statement slower than SQL_SLOW_QUERY_MS is logged as a warning.
+
+The request middleware also counts statements per HTTP request: when one
+request runs the same statement shape SQL_N_PLUS_ONE_THRESHOLD times or
+more (a query per row, the classic N+1), it is logged and counted per
+route.
+
+Served as JSON at /api/metrics/sql.
+"""
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.requests import Request
+from starlette.responses import Response
+
+import metrics
+from metrics import Distribution
+
+logger = logging.getLogger(__name__)
+
+SQL_METRICS_ENABLED = os.getenv("SQL_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+# Distinct statement shapes tracked; further shapes are folded into "other"
+SQL_METRICS_MAX_STATEMENTS = int(os.getenv("SQL_METRICS_MAX_STATEMENTS", "500"))
+
+# "IN (?, ?, ?)" / "VALUES (...), (...)" vary with the number of values
+_PARAM = r"(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)"
+_PARAM_LIST_RE = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_REPEATED_TUPLES_RE = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL text with parameter lists collapsed, so IN-lists of any size match"""
+    shape = _PARAM_LIST_RE.sub("(...)", statement)
+    shape = _REPEATED_TUPLES_RE.sub("(...)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+class RequestQueries:
+    """Statements run while serving one HTTP request"""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.shapes: Counter = Counter()
+        self.seconds = 0.0
+        # Statements arrive from threadpool threads (sync endpoints and dependencies)
+        self._lock = threading.Lock()
+
+    def add(self, shape: str, seconds: float) -> None:
+        with self._lock:
+            self.shapes[shape] += 1
+            self.seconds += seconds
+
+    def counts(self) -> Dict[str, int]:
+        """Snapshot of statements run per shape"""
+        with self._lock:
+            return dict(self.shapes)
+
+
+_current_request: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar(
+    "sql_request_queries", default=None
+)
+
+
+class SQLMetrics:
+    """Per-statement latency histograms, slow queries and N+1 findings"""
+
+    def __init__(
+        self,
+        slow_query_ms: float = SQL_SLOW_QUERY_MS,
+        n_plus_one_threshold: int = SQL_N_PLUS_ONE_THRESHOLD,
+        max_statements: int = SQL_METRICS_MAX_STATEMENTS,
+    ):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_statements = max_statements
+        self.statements: Dict[str, Distribution] = {}
+        self.overall = Distribution()
+        self.slow_queries = 0
+        # (route, statement shape) -> requests that repeated it
+        self.n_plus_one: Counter = Counter()
+        self.request_queries = Distribution(buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            histogram = self.statements.get(shape)
+            if histogram is None:
+                if len(self.statements) >= self.max_statements:
+                    shape = "other"
+                    histogram = self.statements.setdefault(shape, Distribution())
+                else:
+                    histogram = self.statements[shape] = Distribution()
+            histogram.observe(seconds)
+            self.overall.observe(seconds)
+            if seconds >= self.slow_query_seconds:
+                self.slow_queries += 1
+        if seconds >= self.slow_query_seconds:
+            logger.warning(f"Slow query ({seconds * 1000:.0f} ms): {shape[:500]}")
+
+        queries = _current_request.get()
+        if queries is not None:
+            queries.add(shape, seconds)
+
+    def finish_request(self, queries: RequestQueries) -> None:
+        """Record a request's statement count and flag repeated statements"""
+        counts = queries.counts()
+        repeated = [
+            (shape, count) for shape, count in counts.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        with self._lock:
+            self.request_queries.observe(sum(counts.values()))
+            for shape, _ in repeated:
+                self.n_plus_one[(queries.route, shape)] += 1
+        for shape, count in repeated:
+            logger.warning(f"Possible N+1 in {queries.route}: {count} x {shape[:300]}")
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            slowest = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:top]
+            return {
+                "statements": self.overall.snapshot(),
+                "slow_queries": self.slow_queries,
+                "slow_query_ms": self.slow_query_seconds * 1000,
+                "queries_per_request": self.request_queries.snapshot(scale=1, suffix=""),
+                "top_statements": [
+                    {"statement": shape, **histogram.snapshot()} for shape, histogram in slowest
+                ],
+                "n_plus_one": [
+                    {"route": route, "statement": shape, "requests": count}
+                    for (route, shape), count in self.n_plus_one.most_common(top)
+                ],
+            }
+
+    def prometheus_lines(self) -> Iterator[str]:
+        """Statement latency, slow queries and N+1 findings for /metrics"""
+        # Snapshot under the lock, but don't hold it while the caller iterates
+        with self._lock:
+            histogram = list(self.overall.prometheus_lines("pricefighter_sql_statement_seconds", ""))
+            slow_queries = self.slow_queries
+            n_plus_one = sum(self.n_plus_one.values())
+        yield "# HELP pricefighter_sql_statement_seconds Latency of every SQL statement"
+        yield "# TYPE pricefighter_sql_statement_seconds histogram"
+        yield from histogram
+        yield "# HELP pricefighter_sql_slow_queries_total Statements slower than SQL_SLOW_QUERY_MS"
+        yield "# TYPE pricefighter_sql_slow_queries_total counter"
+        yield f"pricefighter_sql_slow_queries_total {slow_queries}"
+        yield "# HELP pricefighter_sql_n_plus_one_total Requests that repeated one statement shape"
+        yield "# TYPE pricefighter_sql_n_plus_one_total counter"
+        yield f"pricefighter_sql_n_plus_one_total {n_plus_one}"
+
+
+_metrics = SQLMetrics()
+metrics.register_collector(_metrics.prometheus_lines)
+
+
+def get_sql_metrics() -> SQLMetrics:
+    return _metrics
+
+
+def instrument_engine(engine: Engine, metrics: Optional[SQLMetrics] = None) -> None:
+    """Time every statement run on engine"""
+    metrics = metrics or _metrics
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sql_metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["sql_metrics_started"].pop()
+        metrics.record(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("sql_metrics_started"):
+            conn.info["sql_metrics_started"].pop()
+
+
+async def request_middleware(request: Request, call_next) -> Response:
+    """HTTP middleware counting the statements each request runs"""
+    if not SQL_METRICS_ENABLED:
+        return await call_next(request)
+    queries = RequestQueries(f"{request.method} {request.url.path}")
+    token = _current_request.set(queries)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_request.reset(token)
+    route = request.scope.get("route")
+    if route is not None:
+        queries.route = f"{request.method} {route.path}"
+    _metrics.finish_request(queries)
+    return response
@@ -0,0 +1,379 @@
+# backend/stream.py
+"""
+Server-sent events stream of product writes (GET /api/stream)
+
+Pushes the writes crud.py makes to subscribed clients, so dashboards
+don't have to poll /api/products. Events:
+
+- created / updated: the product, as one /api/products item
+- price: {id, price, previous_price, currency, changed_at} when the
+  current price differs from the last one the stream saw (prices are
+  loaded when the stream starts)
+- deleted: {id}
+- reset: the requested Last-Event-ID can't be resumed (too old, or from
+  before a restart); refetch /api/products
+
+A crud write listener hands written product ids to one publisher task on
+the event loop. It coalesces what was written since its last pass,
+loads those products in one query and encodes each event once, then
+appends it to every matching subscriber's buffer: all subscribers, or
+only those following that product (?product_id=). Fan-out costs no
+database reads or serialization per client.
+
+Buffers hold STREAM_CLIENT_BUFFER events. A client that falls that far
+behind is disconnected once its buffer is flushed; EventSource
+reconnects by itself with Last-Event-ID and is replayed what it missed
+from the last STREAM_REPLAY_SIZE events. Resume works the same way after
+a network drop.
+
+Events are only seen by the process that wrote them: run the API as a
+single process (or behind sticky routing to the writer) for complete
+streams; out-of-process writers such as worker.py aren't streamed.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, NamedTuple, Optional, Set
+
+import crud
+import fast_json
+import schemas
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STREAM_CLIENT_BUFFER = int(os.getenv("STREAM_CLIENT_BUFFER", "256"))
+STREAM_REPLAY_SIZE = int(os.getenv("STREAM_REPLAY_SIZE", "10000"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+# Comment line sent to idle clients so proxies keep the connection open
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+# Reconnect delay suggested to EventSource clients
+STREAM_RETRY_MS = int(os.getenv("STREAM_RETRY_MS", "3000"))
+
+PRODUCT_FIELDS = fast_json.schema_fields(schemas.ProductResponse)
+PRODUCT_COLUMNS = fast_json.schema_columns(schemas.ProductResponse, crud.Product)
+
+_HEARTBEAT = b": keep-alive\n\n"
+
+
+class StreamFull(Exception):
+    """STREAM_MAX_SUBSCRIBERS clients are already connected"""
+
+
+class StreamEvent(NamedTuple):
+    seq: int
+    product_id: int
+    # Complete SSE frame, shared by every subscriber
+    frame: bytes
+
+
+class Subscriber:
+    """One connected client: an optional product filter and a bounded buffer"""
+
+    def __init__(self, product_ids: Optional[Set[int]], limit: int):
+        self.product_ids = product_ids
+        self.limit = limit
+        # Encoded frames waiting to be sent, and how many events they hold
+        self.chunks: List[bytes] = []
+        self.buffered = 0
+        self.wakeup = asyncio.Event()
+        # Stop buffering and disconnect after the flush (overflow or shutdown)
+        self.closing = False
+
+    def push(self, frames: bytes, count: int) -> bool:
+        """Buffer `count` events' frames; False if they don't fit, which closes the stream"""
+        if self.buffered + count > self.limit:
+            self.closing = True
+            self.wakeup.set()
+            return False
+        self.chunks.append(frames)
+        self.buffered += count
+        self.wakeup.set()
+        return True
+
+
+class StreamHub:
+    """Publishes crud writes to subscribers, keeping recent events for resume"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        client_buffer: int = STREAM_CLIENT_BUFFER,
+        replay_size: int = STREAM_REPLAY_SIZE,
+        max_subscribers: int = STREAM_MAX_SUBSCRIBERS,
+        heartbeat: float = STREAM_HEARTBEAT_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.client_buffer = client_buffer
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        # Event ids are "<epoch>-<seq>"; a new epoch per hub tells clients
+        # resuming across a restart that their id is meaningless here
+        self.epoch = str(int(time.time() * 1000))
+        self._seq = 0
+        self.replay: Deque[StreamEvent] = deque(maxlen=replay_size)
+
+        self._everything: Set[Subscriber] = set()
+        self._by_product: Dict[int, Set[Subscriber]] = {}
+        self.subscribers = 0
+        # Last seen price per product, for price events
+        self._prices: Dict[int, float] = {}
+
+        # Writes waiting for the publisher: product id -> action
+        self._pending: Dict[int, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "delivered": 0, "lagged": 0, "resumed": 0, "reset": 0, "rejected": 0}
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        """Start publishing on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+        crud.add_write_listener(self.on_write)
+
+    async def stop(self) -> None:
+        crud.remove_write_listener(self.on_write)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Wake every client so its stream ends
+        for subscriber in self._all_subscribers():
+            subscriber.closing = True
+            subscriber.wakeup.set()
+
+    # ---- publishing ----
+
+    def on_write(self, action: str, product_ids: List[int]) -> None:
+        """crud write listener; called on the writing thread"""
+        if action == "history" or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, action, product_ids)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+    def _enqueue(self, action: str, product_ids: List[int]) -> None:
+        for product_id in product_ids:
+            previous = self._pending.get(product_id)
+            # An unpublished create stays a create; a delete supersedes anything
+            if action == "updated" and previous == "created":
+                continue
+            self._pending[product_id] = action
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        try:
+            self._prices = await asyncio.to_thread(self._load_prices)
+        except Exception as e:
+            logger.error(f"Loading prices for the stream failed, price events start after the next write: {str(e)}")
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            try:
+                await self._publish(pending)
+            except Exception as e:
+                logger.error(f"Publishing {len(pending)} product writes to the stream failed: {str(e)}")
+
+    async def _publish(self, pending: Dict[int, str]) -> None:
+        written = [product_id for product_id, action in pending.items() if action != "deleted"]
+        rows = await asyncio.to_thread(self._load, written) if written else {}
+        events: List[StreamEvent] = []
+        for product_id, action in pending.items():
+            if action == "deleted":
+                self._prices.pop(product_id, None)
+                events.append(self._event(product_id, "deleted", {"id": product_id}))
+                continue
+            row = rows.get(product_id)
+            if row is None:
+                # Deleted since the write; its delete event follows
+                continue
+            product = dict(zip(PRODUCT_FIELDS, row))
+            events.append(self._event(product_id, action, product))
+            price = product["current_price"]
+            previous = self._prices.get(product_id)
+            self._prices[product_id] = price
+            if previous is not None and previous != price:
+                events.append(self._event(product_id, "price", {
+                    "id": product_id,
+                    "price": price,
+                    "previous_price": previous,
+                    "currency": product["currency"],
+                    "changed_at": product["updated_at"],
+                }))
+        if events:
+            self._fan_out(events)
+
+    def _load_prices(self) -> Dict[int, float]:
+        db = self.session_factory()
+        try:
+            return {product_id: price for product_id, price in crud.iter_product_prices(db)}
+        finally:
+            db.close()
+
+    def _load(self, product_ids: List[int]) -> Dict[int, tuple]:
+        db = self.session_factory()
+        try:
+            return {row[0]: tuple(row) for row in crud.get_product_rows(db, product_ids, PRODUCT_COLUMNS)}
+        finally:
+            db.close()
+
+    def _event(self, product_id: int, name: str, data: dict) -> StreamEvent:
+        """Encode the next event and keep it for replay"""
+        self._seq += 1
+        frame = b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (
+            self.epoch.encode(), self._seq, name.encode(), fast_json.dumps(data)
+        )
+        event = StreamEvent(self._seq, product_id, frame)
+        self.replay.append(event)
+        return event
+
+    def _fan_out(self, events: List[StreamEvent]) -> None:
+        """Buffer one pass's events for every subscriber they match, in event order"""
+        self.stats["published"] += len(events)
+        # Subscribers to everything share one joined chunk
+        if self._everything:
+            frames = b"".join(event.frame for event in events)
+            for subscriber in self._everything:
+                self._push(subscriber, frames, len(events))
+        if self._by_product:
+            matched: Dict[Subscriber, List[bytes]] = {}
+            for event in events:
+                for subscriber in self._by_product.get(event.product_id, ()):
+                    matched.setdefault(subscriber, []).append(event.frame)
+            for subscriber, subscriber_frames in matched.items():
+                self._push(subscriber, b"".join(subscriber_frames), len(subscriber_frames))
+
+    def _push(self, subscriber: Subscriber, frames: bytes, count: int) -> None:
+        if subscriber.closing:
+            return
+        if subscriber.push(frames, count):
+            self.stats["delivered"] += count
+        else:
+            self.stats["lagged"] += 1
+
+    # ---- subscribers ----
+
+    def _all_subscribers(self) -> Set[Subscriber]:
+        subscribers = set(self._everything)
+        for followers in self._by_product.values():
+            subscribers |= followers
+        return subscribers
+
+    def subscribe(self, product_ids: Optional[Iterable[int]] = None, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Return a client's SSE byte stream, registered once iteration starts
+
+        The slot check happens here, so a burst of connections can briefly
+        exceed STREAM_MAX_SUBSCRIBERS by the number not yet streaming.
+
+        Args:
+            product_ids: Only stream events for these products; None for all
+            last_event_id: Resume after this event (Last-Event-ID)
+
+        Raises:
+            StreamFull: STREAM_MAX_SUBSCRIBERS clients are connected
+        """
+        if self.subscribers >= self.max_subscribers:
+            self.stats["rejected"] += 1
+            raise StreamFull()
+        product_ids = set(product_ids) if product_ids else None
+        return self._stream(Subscriber(product_ids, self.client_buffer), last_event_id)
+
+    def _register(self, subscriber: Subscriber) -> None:
+        if subscriber.product_ids is None:
+            self._everything.add(subscriber)
+        else:
+            for product_id in subscriber.product_ids:
+                self._by_product.setdefault(product_id, set()).add(subscriber)
+        self.subscribers += 1
+
+    def _unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber.product_ids is None:
+            self._everything.discard(subscriber)
+        else:
+            for product_id in subscriber.product_ids:
+                followers = self._by_product.get(product_id)
+                if followers is not None:
+                    followers.discard(subscriber)
+                    if not followers:
+                        del self._by_product[product_id]
+        self.subscribers -= 1
+
+    def _replay(self, subscriber: Subscriber, last_event_id: Optional[str]) -> bytes:
+        """Frames missed since last_event_id, or a reset event if they're gone"""
+        if not last_event_id:
+            return b""
+        epoch, _, seq = last_event_id.partition("-")
+        oldest = self.replay[0].seq if self.replay else self._seq + 1
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq or int(seq) < oldest - 1:
+            self.stats["reset"] += 1
+            return b"id: %s-%d\nevent: reset\ndata: {}\n\n" % (self.epoch.encode(), self._seq)
+        self.stats["resumed"] += 1
+        start = int(seq) - oldest + 1
+        return b"".join(
+            event.frame for event in itertools.islice(self.replay, start, None)
+            if subscriber.product_ids is None or event.product_id in subscriber.product_ids
+        )
+
+    async def _stream(self, subscriber: Subscriber, last_event_id: Optional[str]) -> AsyncIterator[bytes]:
+        # Registered once streaming starts, so a response dropped before then
+        # holds no slot; replay and register without an await in between, so
+        # no event falls in between
+        replay = self._replay(subscriber, last_event_id)
+        self._register(subscriber)
+        try:
+            yield b"retry: %d\n\n" % STREAM_RETRY_MS + replay
+            while True:
+                subscriber.wakeup.clear()
+                if subscriber.chunks:
+                    frames = b"".join(subscriber.chunks)
+                    subscriber.chunks.clear()
+                    subscriber.buffered = 0
+                    yield frames
+                    continue
+                if subscriber.closing:
+                    # Buffer flushed; the client reconnects and replays the rest
+                    return
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield _HEARTBEAT
+        finally:
+            self._unsubscribe(subscriber)
+
+    def snapshot(self) -> dict:
+        """Counters plus subscriber and replay sizes, for the stats endpoint"""
+        return {
+            **self.stats,
+            "subscribers": self.subscribers,
+            "followed_products": len(self._by_product),
+            "replay": len(self.replay),
+            "last_event_id": f"{self.epoch}-{self._seq}",
+        }
+
+
+_hub: Optional[StreamHub] = None
+
+
+def get_stream_hub() -> StreamHub:
+    global _hub
+    if _hub is None:
+        _hub = StreamHub()
+    return _hub
+
+
+async def close_stream_hub() -> None:
+    global _hub
+    if _hub is not None:
+        await _hub.stop()
+        _hub = None
@@ -0,0 +1,275 @@
+# backend/worker.py
+"""
+Scrape job worker
+
+Leases scrape jobs queued by POST /api/track?queue=true from the
+scrape_jobs table, scrapes and saves each product the way /api/track
+does, and records the outcome on the job (GET /api/jobs/{id}). Workers
+coordinate only through the database, so scrape capacity scales
+separately from the API: run any number of them, on any number of
+machines.
+
+Leases (see crud.lease_jobs): a leased job is hidden for
+JOB_VISIBILITY_TIMEOUT seconds, and the worker extends the lease while
+it is still scraping. If the worker dies, the lease runs out and another
+worker picks the job up. A failed scrape is retried after
+JOB_RETRY_BASE_SECONDS, doubling each attempt, until JOB_MAX_ATTEMPTS.
+
+    python worker.py                  # one process
+    python worker.py --processes 4    # four processes on this machine
+    python worker.py --drain          # exit once no job is leasable
+
+Or in the API process with JOB_WORKER_ENABLED=true.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+from parse_pool import get_parse_pool, shutdown_parse_pool
+from scraper import AmazonScraper
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER_ENABLED", "false").lower() in ("1", "true", "yes")
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "10"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+# Idle wait between lease attempts when the queue is empty
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+
+def retry_delay(attempts: int, base: float = JOB_RETRY_BASE_SECONDS) -> float:
+    """Seconds before the next try after `attempts` failed ones"""
+    return base * 2 ** (attempts - 1)
+
+
+class JobWorker:
+    """Leases jobs from the queue and scrapes up to `concurrency` at a time"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        scraper: Optional[AmazonScraper] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        retry_base: float = JOB_RETRY_BASE_SECONDS,
+        poll_interval: float = JOB_POLL_SECONDS,
+        name: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.scraper = scraper or AmazonScraper(parse_pool=get_parse_pool())
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self.stats = {"leased": 0, "succeeded": 0, "retried": 0, "failed": 0, "lost": 0}
+        # In-flight job id -> lease id
+        self._leases: Dict[int, str] = {}
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        """Start the worker as a task on the running event loop"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop leasing, and wait for in-flight jobs to finish"""
+        if self._stopping is not None:
+            self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self, drain: bool = False) -> None:
+        """
+        Main loop: lease jobs while there is capacity, run each as a task
+
+        With drain=True, returns once nothing is in flight and no job is
+        leasable (jobs waiting for a retry are left queued).
+        """
+        self._stopping = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        tasks: Set[asyncio.Task] = set()
+        logger.info(f"Job worker {self.name} started with concurrency {self.concurrency}")
+
+        try:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(tasks)
+                jobs = await asyncio.to_thread(self._lease, free) if free else []
+                for job in jobs:
+                    task = asyncio.create_task(self._run_job(job))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                if drain and not jobs and not tasks:
+                    break
+                if jobs and len(tasks) < self.concurrency:
+                    # The queue had work; take more before waiting
+                    continue
+                if tasks:
+                    # Wait for a free slot, or the poll interval to look for work again
+                    await asyncio.wait(tasks, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            logger.info(f"Job worker {self.name} stopped: {self.stats}")
+
+    # ---- leases ----
+
+    def _lease(self, limit: int) -> List[crud.LeasedJob]:
+        db = self.session_factory()
+        try:
+            jobs = crud.lease_jobs(db, self.name, limit, self.visibility_timeout)
+        finally:
+            db.close()
+        self.stats["leased"] += len(jobs)
+        return jobs
+
+    async def _heartbeat(self) -> None:
+        """Extend the leases of in-flight jobs well before they expire"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            leases = list(self._leases.items())
+            if not leases:
+                continue
+            try:
+                extended = await asyncio.to_thread(self._extend, leases)
+            except Exception as e:
+                logger.warning(f"Extending {len(leases)} job leases failed: {str(e)}")
+                continue
+            if extended < len(leases):
+                logger.warning(f"{len(leases) - extended} job leases expired before they were extended")
+
+    def _extend(self, leases: List[tuple]) -> int:
+        db = self.session_factory()
+        try:
+            return crud.extend_leases(db, leases, self.visibility_timeout)
+        finally:
+            db.close()
+
+    # ---- jobs ----
+
+    async def _run_job(self, job: crud.LeasedJob) -> None:
+        job_id, url, lease_id, attempts, max_attempts = job
+        self._leases[job_id] = lease_id
+        try:
+            try:
+                product_data = await self.scraper.scrape_async(url)
+                if not product_data:
+                    raise ValueError("Could not extract product information")
+                product_id = await asyncio.to_thread(self._save, url, product_data)
+            except Exception as e:
+                retry_at = None
+                if attempts < max_attempts:
+                    retry_at = datetime.utcnow() + timedelta(seconds=retry_delay(attempts, self.retry_base))
+                held = await asyncio.to_thread(self._finish, job_id, lease_id, None, str(e) or type(e).__name__, retry_at)
+                if held:
+                    self.stats["retried" if retry_at else "failed"] += 1
+                logger.warning(
+                    f"Job #{job_id} attempt {attempts}/{max_attempts} failed for {url}: {str(e)}"
+                    + (f", retrying at {retry_at:%H:%M:%S}" if retry_at else "")
+                )
+                return
+            if await asyncio.to_thread(self._finish, job_id, lease_id, product_id, None, None):
+                self.stats["succeeded"] += 1
+        except Exception as e:
+            # Recording the outcome failed; the lease runs out and the job is retried
+            logger.error(f"Job #{job_id} could not be finished: {str(e)}")
+        finally:
+            self._leases.pop(job_id, None)
+
+    def _save(self, url: str, product_data: dict) -> int:
+        db = self.session_factory()
+        try:
+            product, _ = crud.save_scraped_product(db, url, product_data)
+            return product.id
+        finally:
+            db.close()
+
+    def _finish(
+        self,
+        job_id: int,
+        lease_id: str,
+        product_id: Optional[int],
+        error: Optional[str],
+        retry_at: Optional[datetime]
+    ) -> bool:
+        db = self.session_factory()
+        try:
+            held = crud.finish_job(db, job_id, lease_id, product_id=product_id, error=error, retry_at=retry_at)
+        finally:
+            db.close()
+        if not held:
+            self.stats["lost"] += 1
+            logger.warning(f"Lease on job #{job_id} was lost; another worker owns it now")
+        return held
+
+
+def run_worker(concurrency: int = JOB_WORKER_CONCURRENCY, drain: bool = False) -> None:
+    """Run one worker in this process until SIGTERM/SIGINT (or until drained)"""
+    async def _main():
+        worker = JobWorker(concurrency=concurrency)
+        loop = asyncio.get_running_loop()
+        task = asyncio.create_task(worker.run(drain=drain))
+        worker._task = task
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, lambda: asyncio.ensure_future(worker.stop()))
+        try:
+            await task
+        finally:
+            await AmazonScraper.close_async_client()
+            shutdown_parse_pool()
+
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run scrape job workers")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start on this machine")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="jobs in flight per process")
+    parser.add_argument("--drain", action="store_true", help="exit once no job is leasable")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.processes <= 1:
+        run_worker(args.concurrency, args.drain)
+    else:
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=run_worker, args=(args.concurrency, args.drain), name=f"job-worker-{i}")
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Children got the SIGINT too and finish their in-flight jobs
+            for process in processes:
+                process.join()
@@ -1,7 +1,9 @@
 // frontend/components/ProductTracker. tsx
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
+
+const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
 
 interface ProductData {
   name: string;
@@ -9,6 +11,7 @@ interface ProductData {
   currency: string;
   url: string;
   retailer: string;
+  product_id?: number;
 }
 
 export default function ProductTracker() {
@@ -17,6 +20,24 @@ export default function ProductTracker() {
   const [product, setProduct] = useState<ProductData | null>(null);
   const [error, setError] = useState('');
 
+  // Live price updates for the tracked product, pushed by /api/stream
+  const productId = product?.product_id;
+  useEffect(() => {
+    if (productId === undefined) return;
+    const events = new EventSource(`${BACKEND_URL}/api/stream?product_id=${productId}`);
+    const onUpdate = (event: MessageEvent) => {
+      const data = JSON.parse(event.data);
+      setProduct((current) => current && {
+        ...current,
+        name: data.name,
+        price: data.current_price,
+        currency: data.currency,
+      });
+    };
+    events.addEventListener('updated', onUpdate);
+    return () => events.close();
+  }, [productId]);
+
   const formatPrice = (price: number, currency: string) => {
     const formatted = price.toLocaleString('en-US', {
       minimumFractionDigits: 2,
@@ -49,8 +70,6 @@ export default function ProductTracker() {
     setProduct(null);
 
     try {
-      const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
-      
       const response = await fetch(`${BACKEND_URL}/api/track`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },